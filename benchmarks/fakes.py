@@ -0,0 +1,252 @@
+"""
+Local stand-ins for Polly, Translate and Transcribe streaming.
+
+Each fake answers the same calls the demos make on the real clients, with
+configurable latency, jitter, throttling and payload sizes, so the scripts can
+be exercised end to end without AWS credentials or network access.
+"""
+
+import asyncio
+import io
+import json
+import random
+import re
+import threading
+import time
+from collections import deque
+from types import SimpleNamespace
+
+from botocore.exceptions import ClientError
+
+from common.latency import Histogram
+
+
+# bytes of audio per input character, roughly 15 characters per second of speech
+BYTES_PER_CHAR = {'mp3': 400, 'ogg_vorbis': 300, 'pcm': 2000, 'json': 40}
+
+
+class ServiceModel:
+    """Latency and throttling behaviour shared by the fake clients
+
+    ``latency`` is the mean time to the response headers, ``jitter`` the
+    relative spread around it. Calls above ``max_tps`` in any one-second window,
+    plus a random ``throttle_rate`` fraction, fail with ThrottlingException.
+    Completed calls are timed into ``latencies``.
+    """
+
+    def __init__(self, latency=0.05, jitter=0.2, max_tps=None, throttle_rate=0.0, seed=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.max_tps = max_tps
+        self.throttle_rate = throttle_rate
+        self.calls = 0
+        self.throttled = 0
+        self.latencies = Histogram()
+        self._recent = deque()
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def admit(self, operation):
+        now = time.monotonic()
+        with self._lock:
+            self.calls += 1
+            while self._recent and now - self._recent[0] > 1.0:
+                self._recent.popleft()
+            over_limit = self.max_tps is not None and len(self._recent) >= self.max_tps
+            if over_limit or self._random.random() < self.throttle_rate:
+                self.throttled += 1
+                raise ClientError({'Error': {'Code': 'ThrottlingException', 'Message': 'Rate exceeded'}},
+                                  operation)
+            self._recent.append(now)
+            delay = max(0.0, self._random.gauss(self.latency, self.latency * self.jitter))
+        time.sleep(delay)
+        return now
+
+
+class FakeAudioStream(io.RawIOBase):
+    """Streaming body that delivers size bytes at ``bandwidth`` bytes/s (0 for unlimited)"""
+
+    def __init__(self, size, bandwidth=0, on_done=None):
+        self.remaining = size
+        self.bandwidth = bandwidth
+        self.on_done = on_done
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        n = min(len(buffer), self.remaining)
+        if n and self.bandwidth:
+            time.sleep(n / self.bandwidth)
+        buffer[:n] = b'\0' * n
+        self.remaining -= n
+        if not n and self.on_done is not None:
+            self.on_done()
+            self.on_done = None
+        return n
+
+
+class FakePolly:
+    meta = SimpleNamespace(region_name='us-east-1')
+
+    def __init__(self, languages=(), engines=('standard', 'neural', 'generative', 'long-form'),
+                 voices_per_language=2, page_size=50, bandwidth=0, bytes_per_char=None, **model):
+        self.model = ServiceModel(**model)
+        self.bandwidth = bandwidth
+        self.bytes_per_char = dict(BYTES_PER_CHAR, **(bytes_per_char or {}))
+        self.page_size = page_size
+        self.voices = []
+        for i, language in enumerate(languages):
+            for j in range(voices_per_language):
+                self.voices.append({
+                    'Id': f'{language.replace(" ", "")}{j}',
+                    'Name': f'{language} {j}',
+                    'Gender': 'Female' if j % 2 == 0 else 'Male',
+                    'LanguageCode': f'x{i:02d}-{j}',
+                    'LanguageName': language,
+                    # later voices support fewer engines, as in the real catalog
+                    'SupportedEngines': list(engines[:max(1, len(engines) - j)]),
+                })
+
+    def describe_voices(self, NextToken=None, **kwargs):
+        self.model.admit('DescribeVoices')
+        start = int(NextToken or 0)
+        response = {'Voices': self.voices[start:start + self.page_size]}
+        if start + self.page_size < len(self.voices):
+            response['NextToken'] = str(start + self.page_size)
+        return response
+
+    def synthesize_speech(self, **params):
+        started = self.model.admit('SynthesizeSpeech')
+        size = len(params['Text']) * self.bytes_per_char[params.get('OutputFormat', 'mp3')]
+        # timed until the caller has read the whole body
+        done = lambda: self.model.latencies.observe(time.monotonic() - started)
+        return {'AudioStream': FakeAudioStream(size, self.bandwidth, done),
+                'ContentType': 'audio/mpeg', 'RequestCharacters': len(params['Text'])}
+
+
+class FakeTranslate:
+    def __init__(self, per_char=0.0002, **model):
+        self.model = ServiceModel(**model)
+        self.per_char = per_char
+
+    def translate_text(self, Text, SourceLanguageCode, TargetLanguageCode, **kwargs):
+        started = self.model.admit('TranslateText')
+        time.sleep(len(Text) * self.per_char)
+        self.model.latencies.observe(time.monotonic() - started)
+        return {'TranslatedText': f'[{TargetLanguageCode}] {Text}',
+                'SourceLanguageCode': SourceLanguageCode, 'TargetLanguageCode': TargetLanguageCode}
+
+
+def load_events(path):
+    """Recorded transcript events, one JSON object per line:
+
+    ``{"at": 1.2, "result_id": "r1", "start": 0.4, "end": 1.1, "partial": true,
+    "transcript": "...", "stable": true}`` where ``at`` is seconds into the stream.
+    Instead of ``stable``, ``stable_chars`` marks only the items within that many
+    characters from the start stable.
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def _transcript_event(event):
+    from amazon_transcribe.model import Alternative, Item, Result, Transcript, TranscriptEvent
+
+    transcript = event['transcript']
+    stable = event.get('stable', not event['partial'])
+    items = []
+    # words and punctuation marks are separate items, as Transcribe returns them
+    for match in re.finditer(r'[^\s.,!?。，！？]+|[.,!?。，！？]', transcript):
+        if 'stable_chars' in event:
+            stable = match.end() <= event['stable_chars']
+        items.append(Item(start_time=event['start'], end_time=event['end'],
+                          item_type='punctuation' if match.group() in '.,!?。，！？' else 'pronunciation',
+                          content=match.group(), stable=stable))
+    if not items:
+        items = [Item(start_time=event['start'], end_time=event['end'], item_type='pronunciation',
+                      content=transcript, stable=stable)]
+    result = Result(result_id=event['result_id'], start_time=event['start'], end_time=event['end'],
+                    is_partial=event['partial'],
+                    alternatives=[Alternative(transcript=event['transcript'], items=items, entities=None)])
+    return TranscriptEvent(transcript=Transcript(results=[result]))
+
+
+class FakeTranscribeStream:
+    """Replays recorded events on output_stream, paced against the audio sent on input_stream
+
+    An event at ``at`` seconds is only released once that much audio has been
+    sent, so results never run ahead of the (possibly accelerated) microphone.
+    """
+
+    def __init__(self, events, sample_rate=16000, bytes_per_sample=2):
+        self.events = events
+        self.bytes_per_second = sample_rate * bytes_per_sample
+        self.sent = 0
+        self.ended = False
+        self.finished = False
+        self._progress = asyncio.Condition()
+        self.input_stream = SimpleNamespace(send_audio_event=self._send_audio_event, end_stream=self._end_stream)
+        self.output_stream = self._output()
+
+    async def _send_audio_event(self, audio_chunk):
+        async with self._progress:
+            self.sent += len(audio_chunk)
+            self._progress.notify_all()
+
+    async def _end_stream(self):
+        async with self._progress:
+            self.ended = True
+            self._progress.notify_all()
+
+    async def _output(self):
+        for event in self.events:
+            due = event['at'] * self.bytes_per_second
+            async with self._progress:
+                await self._progress.wait_for(lambda: self.sent >= due or self.ended)
+            yield _transcript_event(event)
+        self.finished = True
+
+    @property
+    def duration(self):
+        return max((e['at'] for e in self.events), default=0.0)
+
+
+class FakeTranscribeClient:
+    """Drop-in for TranscribeStreamingClient, every stream replays the same events"""
+
+    def __init__(self, events, region=None):
+        self.events = events
+        self.streams = []
+
+    async def start_stream_transcription(self, media_sample_rate_hz=16000, **kwargs):
+        stream = FakeTranscribeStream(self.events, sample_rate=media_sample_rate_hz)
+        self.streams.append(stream)
+        return stream
+
+
+class FakeOutputStream:
+    """sounddevice.RawOutputStream that takes as long as the audio would to play, divided by speed"""
+
+    speed = 1.0
+
+    def __init__(self, samplerate=16000, channels=1, dtype='int16', device=None, **kwargs):
+        self.bytes_per_second = samplerate * channels * 2
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def write(self, data):
+        time.sleep(len(data) / self.bytes_per_second / self.speed)
+
+    def abort(self):
+        pass
+
+
+def fake_sounddevice(speed=1.0):
+    """Module object to put in sys.modules['sounddevice'] on machines without an audio device"""
+    FakeOutputStream.speed = speed
+    return SimpleNamespace(RawOutputStream=FakeOutputStream, CallbackFlags=object)
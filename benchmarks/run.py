@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Offline benchmarks for the demos, run against local fakes of Polly, Translate and Transcribe.
+
+    python benchmarks/run.py                      # every scenario, compared with the baseline
+    python benchmarks/run.py interpreter --speed 8
+    python benchmarks/run.py --save-baseline      # make this run the new reference
+
+Each scenario runs in its own process with a throwaway cache directory, so
+runs don't warm each other up and peak memory is measured per scenario.
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+HERE = Path(__file__).resolve().parent
+# shared helpers live in the repository-level `common` package
+sys.path.append(str(HERE.parent))
+
+RESULTS_DIR = HERE / 'results'
+BASELINE = RESULTS_DIR / 'baseline.json'
+LATEST = RESULTS_DIR / 'latest.json'
+SCENARIO_NAMES = ('generate_samples', 'polly_demo', 'interpreter')
+# changes smaller than this (in the metric's own unit) are noise, e.g. 0.1ms -> 0.2ms
+NOISE_FLOOR = 1.0
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the demos against local service fakes')
+    parser.add_argument('scenarios', nargs='*', metavar='scenario',
+                        help=f"scenarios to run: {', '.join(SCENARIO_NAMES)} (default: all)")
+    parser.add_argument('--polly-latency', type=float, default=0.08, help='mean Polly response time in seconds')
+    parser.add_argument('--translate-latency', type=float, default=0.06, help='mean Translate response time in seconds')
+    parser.add_argument('--polly-tps', type=float, default=None, help='Polly requests per second before throttling')
+    parser.add_argument('--throttle-rate', type=float, default=0.0, help='fraction of calls throttled at random')
+    parser.add_argument('--bandwidth', type=int, default=2_000_000, help='audio download speed in bytes/s, 0 for unlimited')
+    parser.add_argument('--speed', type=float, default=4.0, help='how much faster than real time to replay speech and playback')
+    parser.add_argument('--targets', type=int, default=1, help='languages the interpreter speaks at once (up to 6)')
+    parser.add_argument('--batch-window', type=float, default=0.0, help='interpreter translate batching window in seconds')
+    parser.add_argument('--requests', type=int, default=40, help='synthesize_speech calls per polly_demo phase')
+    parser.add_argument('--events', default=str(HERE / 'data' / 'transcript_events.jsonl'),
+                        help='recorded transcript events to replay through the interpreter')
+    parser.add_argument('--no-cache', dest='cache', action='store_false', help='run generate_samples without the synthesis cache')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--baseline', default=str(BASELINE), help='results to compare against')
+    parser.add_argument('--save-baseline', action='store_true', help='store this run as the baseline')
+    parser.add_argument('--threshold', type=float, default=0.10, help='relative change reported as a regression')
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    opts = parser.parse_args(argv)
+    unknown = set(opts.scenarios) - set(SCENARIO_NAMES)
+    if unknown:
+        parser.error(f"unknown scenario: {', '.join(sorted(unknown))}")
+    return opts
+
+
+def run_child(name, argv):
+    """Run one scenario in a fresh interpreter and return its metrics"""
+    env = dict(os.environ, AWS_AI_DEMO_CACHE=tempfile.mkdtemp(prefix='bench-cache-'))
+    result = subprocess.run([sys.executable, __file__, '--child', name, *argv],
+                            env=env, capture_output=True, text=True)
+    if result.returncode != 0:
+        print(result.stderr, file=sys.stderr)
+        raise RuntimeError(f'{name} failed with exit code {result.returncode}')
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def _direction(metric):
+    """+1 if a higher value is better, -1 if lower is better, 0 if it is not a performance number"""
+    if metric.endswith('_per_s'):
+        return 1
+    if metric.endswith(('_ms', '_mb', '_s')):
+        return -1
+    return 0
+
+
+def compare(results, baseline, threshold):
+    """Print each metric next to the baseline and return the regressions"""
+    regressions = []
+    for name, metrics in results.items():
+        print(f'\n📊 {name}')
+        before = baseline.get(name, {})
+        for metric, value in metrics.items():
+            old = before.get(metric)
+            line = f'   {metric:<28} {value!s:>10}'
+            if isinstance(value, (int, float)) and isinstance(old, (int, float)) and old:
+                change = (value - old) / abs(old)
+                line += f'   {old!s:>10}  {change:+7.1%}'
+                if _direction(metric) * change < -threshold and abs(value - old) >= NOISE_FLOOR:
+                    line += '  ⚠️'
+                    regressions.append((name, metric, old, value))
+            print(line)
+    return regressions
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    opts = parse_args(argv)
+
+    if opts.child:
+        sys.path.insert(0, str(HERE))
+        from scenarios import run_scenario
+        print(json.dumps(run_scenario(opts.child, opts)))
+        return 0
+
+    forwarded = [a for a in argv if a not in SCENARIO_NAMES and a != '--save-baseline']
+    results = {}
+    for name in opts.scenarios or SCENARIO_NAMES:
+        print(f'⏱️  running {name} ...')
+        results[name] = run_child(name, forwarded)
+
+    baseline_path = Path(opts.baseline)
+    baseline = json.loads(baseline_path.read_text()) if baseline_path.exists() else {}
+    if baseline:
+        print(f'\ncompared with {baseline_path} (current, baseline, change)')
+    regressions = compare(results, baseline, opts.threshold)
+
+    from common.fileio import atomic_write_json
+    atomic_write_json(LATEST, results)
+    if opts.save_baseline:
+        atomic_write_json(baseline_path, {**baseline, **results})
+        print(f'\n💾 saved baseline to {baseline_path}')
+    if regressions:
+        print(f'\n⚠️  {len(regressions)} metrics regressed by more than {opts.threshold:.0%}')
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,224 @@
+"""
+End-to-end benchmark scenarios, each driving one demo against the local fakes.
+
+Every scenario returns a flat dict of metrics. Keys ending in ``_per_s`` are
+throughput (higher is better). Every other numeric key that ends in ``_ms``,
+``_mb`` or ``_s`` is a cost (lower is better).
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from common.latency import Histogram
+from fakes import FakePolly, FakeTranscribeClient, FakeTranslate, fake_sounddevice, load_events
+
+
+ROOT = Path(__file__).resolve().parent.parent
+# target language -> a neural Polly voice that speaks it
+TARGET_VOICES = {'en-US': 'Joanna', 'ja-JP': 'Kazuha', 'fr-FR': 'Lea', 'de-DE': 'Vicki',
+                 'es-ES': 'Lucia', 'ko-KR': 'Seoyeon'}
+TARGET_LANGUAGES = tuple(TARGET_VOICES)
+
+
+def _ms(value):
+    return None if value is None else round(value * 1000, 1)
+
+
+def _percentiles(prefix, hist):
+    return {f'{prefix}_{p}_ms': _ms(hist.percentile(q)) for p, q in (('p50', 0.5), ('p95', 0.95), ('p99', 0.99))}
+
+
+def _languages(project):
+    return sorted(p.stem for p in (ROOT / project / 'languages').glob('*.txt'))
+
+
+def generate_samples(opts):
+    """polly-sample-audio: a full batch run over every language, voice and engine"""
+    sys.path.insert(0, str(ROOT / 'polly-sample-audio'))
+    import generate_samples as gs
+    from common.synth_cache import SynthesisCache
+    from run_manifest import DONE, FAILED, RunManifest
+
+    polly = FakePolly(_languages('polly-sample-audio'), latency=opts.polly_latency,
+                      max_tps=opts.polly_tps, throttle_rate=opts.throttle_rate,
+                      bandwidth=opts.bandwidth, seed=opts.seed)
+    workdir = Path(tempfile.mkdtemp(prefix='bench-samples-'))
+    inputs = {
+        'gen_data': True,
+        'languages_file_ext': '.txt',
+        'languages_path': str(ROOT / 'polly-sample-audio' / 'languages'),
+        'engines': gs.ENGINES,
+        'audio_dest': str(workdir / 'audio'),
+        'manifest_path': str(workdir / 'manifest.json'),
+        'OutputFormat': 'mp3',
+        'TextType': 'ssml',
+        'workers': gs.MAX_WORKERS,
+        'engine_concurrency': gs.ENGINE_CONCURRENCY,
+        'cache': SynthesisCache(workdir / 'cache') if opts.cache else None,
+    }
+    gs.ensure_required_path(inputs)
+
+    started = time.perf_counter()
+    gs.run(polly, inputs)
+    elapsed = time.perf_counter() - started
+
+    counts = RunManifest(inputs['manifest_path']).counts()
+    done = counts[DONE]
+    return {
+        'files': done,
+        'failed': counts[FAILED],
+        'elapsed_s': round(elapsed, 3),
+        'files_per_s': round(done / elapsed, 2),
+        'requests': polly.model.calls,
+        'throttled': polly.model.throttled,
+        **_percentiles('request', polly.model.latencies),
+    }
+
+
+def polly_demo(opts):
+    """polly-interactive-demo: repeated synthesize_speech calls, first uncached then from the cache"""
+    sys.path.insert(0, str(ROOT / 'polly-interactive-demo'))
+    from common.voice_catalog import VoiceCatalog
+    from polly_demo import PollyDemo
+
+    polly = FakePolly(_languages('polly-interactive-demo'), latency=opts.polly_latency,
+                      max_tps=opts.polly_tps, throttle_rate=opts.throttle_rate,
+                      bandwidth=opts.bandwidth, seed=opts.seed)
+    demo = PollyDemo()
+    demo.client = polly
+    demo.catalog = VoiceCatalog(polly)
+    demo.languages_dir = ROOT / 'polly-interactive-demo' / 'languages'
+    demo.temp_dir = Path(tempfile.mkdtemp(prefix='bench-demo-'))
+
+    started = time.perf_counter()
+    demo.load_voices()
+    load_voices = time.perf_counter() - started
+
+    samples = demo.get_sample_texts()
+    requests = []
+    for engine in demo.get_available_engines():
+        for language, voices in demo.get_voices_for_engine(engine).items():
+            if language in samples:
+                requests += [(samples[language], voice, engine) for voice in voices]
+    requests = requests[:opts.requests]
+
+    metrics = {'requests': len(requests), 'load_voices_ms': _ms(load_voices)}
+    for phase in ('cold', 'warm'):
+        latencies = Histogram()
+        failed = 0
+        started = time.perf_counter()
+        for text, voice, engine in requests:
+            call_started = time.perf_counter()
+            if demo.synthesize_speech(text, voice.id, voice.language_code, engine) is None:
+                failed += 1
+            latencies.observe(time.perf_counter() - call_started)
+        elapsed = time.perf_counter() - started
+        metrics.update({
+            f'{phase}_failed': failed,
+            f'{phase}_requests_per_s': round(len(requests) / elapsed, 2),
+            **_percentiles(phase, latencies),
+        })
+    demo.cleanup_temp_files()
+    metrics['throttled'] = polly.model.throttled
+    return metrics
+
+
+def interpreter(opts):
+    """text-translate-speech: recorded transcript events through translation and playback in --targets languages"""
+    # no sound card needed, playback takes as long as the audio would (divided by speed)
+    sys.modules['sounddevice'] = fake_sounddevice(opts.speed)
+    sys.path.insert(0, str(ROOT / 'text-translate-speech'))
+    import app
+    from common.clients import set_client
+    from modules.metrics import LatencyRecorder
+    from modules.pipeline import InterpretationPipeline, Target
+
+    polly = FakePolly(latency=opts.polly_latency, max_tps=opts.polly_tps,
+                      throttle_rate=opts.throttle_rate, bandwidth=opts.bandwidth, seed=opts.seed)
+    translate = FakeTranslate(latency=opts.translate_latency, throttle_rate=opts.throttle_rate, seed=opts.seed)
+    set_client('polly', app.DEMO_REGION, polly)
+    set_client('translate', app.DEMO_REGION, translate)
+
+    events = load_events(opts.events)
+    transcribe = FakeTranscribeClient(events)
+    app.TranscribeStreamingClient = lambda region: transcribe
+    chunk_seconds = app.CHUNK_SIZE / (app.SAMPLE_RATE * app.BYTES_PER_SAMPLE)
+
+    async def microphone():
+        # silence at the microphone's pace, just long enough to release every event
+        silence = bytes(app.CHUNK_SIZE)
+        for _ in range(int(max(e['at'] for e in events) / chunk_seconds) + 2):
+            await asyncio.sleep(chunk_seconds / opts.speed)
+            yield silence, time.perf_counter()
+
+    async def main():
+        recorder = LatencyRecorder()
+        # extra targets each play on their own (fake) device
+        targets = [Target(language, TARGET_VOICES[language], device=i)
+                   for i, language in enumerate(TARGET_LANGUAGES[:opts.targets])]
+        pipeline = InterpretationPipeline(app.DEMO_REGION, app.SOURCE_LANGCODE, app.TARGET_LANGCODE,
+                                          playback_policy=app.PLAYBACK_POLICY, recorder=recorder, targets=targets,
+                                          batch_window=opts.batch_window)
+        started = time.perf_counter()
+        task = asyncio.create_task(app.transcribe_n_translate(pipeline, microphone(), recorder))
+        while not (transcribe.streams and transcribe.streams[0].finished):
+            await asyncio.sleep(0.05)
+        await pipeline.drain()
+        elapsed = time.perf_counter() - started
+        task.cancel()
+        pipeline.close()
+        return recorder, pipeline.metrics(), elapsed
+
+    recorder, pipeline_metrics, elapsed = asyncio.run(main())
+    metrics = {
+        'utterances': recorder.finished,
+        'utterances_per_s': round(recorder.finished / elapsed, 2),
+        'elapsed_s': round(elapsed, 3),
+        'dropped': pipeline_metrics['dropped'] + pipeline_metrics['playback_dropped'],
+        'merged': pipeline_metrics['playback_merged'],
+        'targets': opts.targets,
+        'translate_calls': translate.model.calls,
+        'polly_calls': polly.model.calls,
+    }
+    for stage in ('end_to_end', 'translate', 'synthesis_first_byte', 'playback_wait'):
+        metrics.update(_percentiles(stage, recorder.histograms[stage]))
+    return metrics
+
+
+SCENARIOS = {
+    'generate_samples': generate_samples,
+    'polly_demo': polly_demo,
+    'interpreter': interpreter,
+}
+
+
+def max_rss_mb():
+    try:
+        import resource
+    except ImportError:     # Windows
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return round(rss / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def run_scenario(name, opts):
+    """Run one scenario with its output silenced, adding peak memory to its metrics"""
+    devnull = os.open(os.devnull, os.O_WRONLY)
+    saved = os.dup(1), os.dup(2)
+    sys.stdout.flush()
+    os.dup2(devnull, 1)
+    os.dup2(devnull, 2)
+    try:
+        metrics = SCENARIOS[name](opts)
+    finally:
+        sys.stdout.flush()
+        os.dup2(saved[0], 1)
+        os.dup2(saved[1], 2)
+        os.close(devnull)
+    metrics['max_rss_mb'] = max_rss_mb()
+    return metrics
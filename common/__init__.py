@@ -0,0 +1,13 @@
+"""
+Helpers shared by the demo scripts in this repository.
+
+Every demo is run from its own directory, so scripts add the repository root
+to ``sys.path`` before importing from this package.
+"""
+
+import os
+from pathlib import Path
+
+
+# Persistent local state (voice catalog, audio cache, ...) lives here
+CACHE_ROOT = Path(os.environ.get('AWS_AI_DEMO_CACHE', Path.home() / '.cache' / 'aws-ai-demos'))
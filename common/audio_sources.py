@@ -0,0 +1,173 @@
+"""
+Audio inputs for the streaming transcription demos.
+
+Every source is an async iterator of ``(chunk, captured_at)`` pairs, where
+chunk is 16-bit little-endian PCM and captured_at a ``time.perf_counter()``
+value. The sources are:
+
+- ``MicSource``: the microphone, through sounddevice into a preallocated ring buffer.
+- ``FileSource``: a WAV or raw PCM file, memory-mapped and cut into fixed-size
+  chunks that are memoryview slices of the mapping, so even hour-long
+  recordings are never read into memory.
+- ``StreamSource``: WAV or raw PCM from a pipe such as stdin.
+
+Recorded audio is paced by a ``Pacer``: real time, N times real time, or
+unpaced (as fast as the consumer takes it).
+"""
+
+import asyncio
+import mmap
+import sys
+import time
+import wave
+from pathlib import Path
+from typing import AsyncIterator, Optional, Tuple, Union
+
+from common.capture import CAPACITY, DROP_OLDEST, capture_microphone, ring_for
+
+
+SAMPLE_RATE = 16000
+CHANNELS = 1
+SAMPLE_WIDTH = 2
+CHUNK_FRAMES = 1024 * 4     # samples per chunk, 256ms at 16kHz
+
+Chunk = Tuple[Union[bytes, memoryview], float]
+
+
+class Pacer:
+    """Holds audio back to ``speed`` times real time, 0 or None releases it unpaced
+
+    Deadlines are measured from the first chunk, so the timing errors of
+    individual sleeps don't add up over a long recording.
+    """
+
+    def __init__(self, bytes_per_second: int, speed: Optional[float] = 1.0):
+        self.bytes_per_second = bytes_per_second
+        self.speed = speed
+        self.sent = 0
+        self.started = None
+
+    async def wait(self, nbytes: int) -> None:
+        if not self.speed:
+            # unpaced, but give the rest of the loop a turn between chunks
+            await asyncio.sleep(0)
+            return
+        if self.started is None:
+            self.started = time.monotonic()
+        self.sent += nbytes
+        # a chunk is released once that much audio would have been captured
+        delay = self.started + self.sent / self.bytes_per_second / self.speed - time.monotonic()
+        await asyncio.sleep(max(delay, 0))
+
+
+def _check_wav(params, sample_rate: int, channels: int, source) -> None:
+    if (params.framerate, params.nchannels, params.sampwidth) != (sample_rate, channels, SAMPLE_WIDTH):
+        raise ValueError(
+            f'{source}: expected {sample_rate}Hz, {channels} channel(s), 16-bit PCM, got '
+            f'{params.framerate}Hz, {params.nchannels} channel(s), {params.sampwidth * 8}-bit')
+
+
+class FileSource:
+    """A .wav file (format checked against sample_rate/channels) or headerless 16-bit PCM"""
+
+    def __init__(self, path: Union[str, Path], sample_rate: int = SAMPLE_RATE, channels: int = CHANNELS,
+                 chunk_frames: int = CHUNK_FRAMES, speed: Optional[float] = 1.0):
+        self.path = Path(path)
+        self.chunk_bytes = chunk_frames * channels * SAMPLE_WIDTH
+        self.pacer = Pacer(sample_rate * channels * SAMPLE_WIDTH, speed)
+        self.offset, self.length = 0, self.path.stat().st_size
+        with open(self.path, 'rb') as f:
+            if f.read(4) == b'RIFF':
+                f.seek(0)
+                with wave.open(f) as w:
+                    _check_wav(w.getparams(), sample_rate, channels, self.path)
+                    # wave stops right after the data chunk header
+                    self.offset, self.length = f.tell(), w.getnframes() * w.getsampwidth() * w.getnchannels()
+
+    @property
+    def duration(self) -> float:
+        return self.length / self.pacer.bytes_per_second
+
+    async def __aiter__(self) -> AsyncIterator[Chunk]:
+        if not self.length:
+            return
+        with open(self.path, 'rb') as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(mapped)[self.offset:self.offset + self.length]
+        try:
+            for start in range(0, self.length, self.chunk_bytes):
+                chunk = view[start:start + self.chunk_bytes]
+                await self.pacer.wait(len(chunk))
+                yield chunk, time.perf_counter()
+        finally:
+            view.release()
+            try:
+                mapped.close()
+            except BufferError:
+                pass    # a consumer still holds a chunk, the mapping goes away with it
+
+
+class StreamSource:
+    """WAV or raw PCM from a binary stream (stdin by default), read into one reused buffer
+
+    A chunk is only valid until the next one is requested.
+    """
+
+    def __init__(self, stream=None, sample_rate: int = SAMPLE_RATE, channels: int = CHANNELS,
+                 chunk_frames: int = CHUNK_FRAMES, speed: Optional[float] = None):
+        self.stream = stream or sys.stdin.buffer
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.chunk_bytes = chunk_frames * channels * SAMPLE_WIDTH
+        self.pacer = Pacer(sample_rate * channels * SAMPLE_WIDTH, speed)
+
+    def _skip_header(self) -> None:
+        peek = getattr(self.stream, 'peek', None)
+        if peek is not None and peek(4)[:4] == b'RIFF':
+            # wave reads up to the start of the samples, a pipe needs no seeking for that
+            params = wave.open(self.stream).getparams()
+            _check_wav(params, self.sample_rate, self.channels, 'input stream')
+
+    async def __aiter__(self) -> AsyncIterator[Chunk]:
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self._skip_header)
+        buffer = bytearray(self.chunk_bytes)
+        view = memoryview(buffer)
+        while True:
+            # blocking reads stay off the event loop
+            n = await loop.run_in_executor(None, self.stream.readinto, view)
+            if not n:
+                return
+            await self.pacer.wait(n)
+            yield view[:n], time.perf_counter()
+
+
+class MicSource:
+    """Live microphone input, captured into a fixed-size ring (see ``common.capture``)
+
+    Chunks are memoryviews into the ring, valid until the next one is requested.
+    ``stats()`` reports captured, dropped and late chunks.
+    """
+
+    def __init__(self, sample_rate: int = SAMPLE_RATE, channels: int = CHANNELS, chunk_frames: int = CHUNK_FRAMES,
+                 capacity: float = CAPACITY, policy: str = DROP_OLDEST, device=None):
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.chunk_frames = chunk_frames
+        self.device = device
+        self.ring = ring_for(sample_rate, channels, chunk_frames, capacity, SAMPLE_WIDTH, policy=policy)
+
+    def __aiter__(self) -> AsyncIterator[Chunk]:
+        return capture_microphone(self.ring, self.sample_rate, self.channels, self.chunk_frames, self.device)
+
+    def stats(self) -> dict:
+        return self.ring.stats()
+
+
+def open_source(spec: Optional[str] = None, speed: Optional[float] = 1.0, **kwargs):
+    """Source for spec: None or 'mic' for the microphone, '-' for stdin, otherwise a file path"""
+    if spec in (None, 'mic'):
+        return MicSource(**kwargs)
+    if spec == '-':
+        return StreamSource(speed=speed, **kwargs)
+    return FileSource(spec, speed=speed, **kwargs)
@@ -0,0 +1,54 @@
+"""
+Copy a Polly ``AudioStream`` to its destination in fixed-size chunks.
+
+Reading the whole StreamingBody holds the complete audio in memory before
+anything is written; here it is read and written one chunk at a time, so
+memory stays flat however long the audio is. Reads go through
+``StreamingBody.read``, which checks the content length and raises botocore
+errors (``ReadTimeoutError``, ``ResponseStreamingError``) for broken streams.
+"""
+
+import time
+from contextlib import closing
+from dataclasses import dataclass
+from typing import Optional
+
+
+CHUNK_SIZE = 64 * 1024
+
+
+@dataclass
+class StreamStats:
+    bytes: int = 0
+    first_byte: Optional[float] = None  # seconds from start to the first chunk
+    elapsed: float = 0.0
+    cached: bool = False
+
+
+def copy_stream(body, out, chunk_size: int = CHUNK_SIZE, started: Optional[float] = None) -> StreamStats:
+    """Copy body to the writable out chunk by chunk, closing body when done
+
+    ``started`` is a ``time.perf_counter()`` value taken before the request, so
+    first_byte includes the service latency; it defaults to now.
+    """
+    started = time.perf_counter() if started is None else started
+    stats = StreamStats()
+
+    with closing(body):
+        while True:
+            chunk = body.read(chunk_size)
+            if not chunk:
+                break
+            if stats.first_byte is None:
+                stats.first_byte = time.perf_counter() - started
+            out.write(chunk)
+            stats.bytes += len(chunk)
+
+    stats.elapsed = time.perf_counter() - started
+    return stats
+
+
+def stream_to_file(body, path, chunk_size: int = CHUNK_SIZE, started: Optional[float] = None) -> StreamStats:
+    """Write body to path in chunks"""
+    with open(path, 'wb') as f:
+        return copy_stream(body, f, chunk_size, started)
@@ -0,0 +1,189 @@
+"""
+Fixed-memory microphone capture.
+
+The sounddevice callback runs on the audio thread and must never block or
+allocate much. ``CaptureRing`` preallocates ``slots`` chunks in one bytearray;
+the callback copies each block into a free slot and the asyncio consumer gets
+memoryview slices of the ring, so chunks are neither allocated nor copied again
+and memory stays fixed however far the consumer falls behind. When every slot is taken,
+the overflow policy decides which audio is lost:
+
+- ``drop_oldest``: the oldest unread chunk is overwritten, the consumer stays current
+- ``drop_newest``: the incoming chunk is discarded, what was captured is kept
+
+Dropped chunks, chunks the consumer took later than ``late_after`` seconds and
+overflows reported by the audio device are counted in ``stats()``.
+"""
+
+import asyncio
+import math
+import threading
+import time
+from collections import deque
+from typing import AsyncIterator, Optional, Tuple
+
+
+DROP_OLDEST = 'drop_oldest'
+DROP_NEWEST = 'drop_newest'
+POLICIES = (DROP_OLDEST, DROP_NEWEST)
+
+CAPACITY = 5.0          # seconds of audio the ring holds
+LATE_AFTER = 1.0        # seconds between capture and hand-off before a chunk counts as late
+
+
+class CaptureRing:
+    """Preallocated ring of ``slots`` chunks of up to ``chunk_bytes`` each
+
+    ``write()`` is called from the audio thread, ``get()`` from the event loop.
+    The view returned by ``get()`` stays valid until the next ``get()``.
+    """
+
+    def __init__(self, chunk_bytes: int, slots: int, policy: str = DROP_OLDEST,
+                 late_after: Optional[float] = LATE_AFTER, loop: asyncio.AbstractEventLoop = None):
+        if policy not in POLICIES:
+            raise ValueError(f"unknown overflow policy {policy!r}, expected one of {', '.join(POLICIES)}")
+        if slots < 2:
+            raise ValueError('a capture ring needs at least 2 slots')
+        self.chunk_bytes = chunk_bytes
+        self.slots = slots
+        self.policy = policy
+        self.late_after = late_after
+        self.loop = loop
+
+        self._buffer = bytearray(chunk_bytes * slots)
+        self._view = memoryview(self._buffer)
+        self._lengths = [0] * slots
+        self._times = [0.0] * slots
+        # slot numbers waiting to be read, and slots free for the callback
+        self._pending = deque(maxlen=slots)
+        self._free = deque(range(slots), maxlen=slots)
+        self._held = None       # the slot the consumer is reading
+        self._lock = threading.Lock()
+        self._ready = asyncio.Event()
+        self._waiting = False
+        self._closed = False
+
+        self.captured = 0
+        self.dropped = 0
+        self.late = 0
+        self.device_overflows = 0
+        self.max_depth_seen = 0
+
+    def write(self, data, captured_at: Optional[float] = None, overflow: bool = False) -> None:
+        """Copy one block from the audio callback into the ring"""
+        captured_at = time.perf_counter() if captured_at is None else captured_at
+        n = min(len(data), self.chunk_bytes)
+        with self._lock:
+            self.captured += 1
+            if overflow:
+                self.device_overflows += 1
+            if self._free:
+                slot = self._free.popleft()
+            elif self.policy == DROP_OLDEST and self._pending:
+                slot = self._pending.popleft()
+                self.dropped += 1
+            else:
+                self.dropped += 1
+                return
+            start = slot * self.chunk_bytes
+            self._view[start:start + n] = memoryview(data)[:n]
+            self._lengths[slot] = n
+            self._times[slot] = captured_at
+            self._pending.append(slot)
+            self.max_depth_seen = max(self.max_depth_seen, len(self._pending))
+            wake = self._waiting
+            self._waiting = False
+        if wake:
+            # only when the consumer is asleep, so a busy consumer costs no callbacks
+            self._wake()
+
+    def _wake(self) -> None:
+        if self.loop is None:
+            self._ready.set()       # writer runs on the event loop itself
+        else:
+            self.loop.call_soon_threadsafe(self._ready.set)
+
+    def _take(self) -> Optional[Tuple[memoryview, float]]:
+        with self._lock:
+            if self._held is not None:
+                self._free.append(self._held)
+                self._held = None
+            if not self._pending:
+                self._waiting = True
+                return None
+            slot = self._held = self._pending.popleft()
+        captured_at = self._times[slot]
+        if self.late_after is not None and time.perf_counter() - captured_at > self.late_after:
+            self.late += 1
+        start = slot * self.chunk_bytes
+        return self._view[start:start + self._lengths[slot]], captured_at
+
+    async def get(self) -> Optional[Tuple[memoryview, float]]:
+        """Next ``(chunk, captured_at)``, waiting for the callback; None once closed"""
+        while True:
+            item = self._take()
+            if item is not None:
+                return item
+            if self._closed:
+                return None
+            await self._ready.wait()
+            self._ready.clear()
+
+    def close(self) -> None:
+        """Let get() return None once the pending chunks are read"""
+        with self._lock:
+            self._closed = True
+            self._waiting = False
+        self._wake()
+
+    @property
+    def depth(self) -> int:
+        return len(self._pending)
+
+    def stats(self) -> dict:
+        return {
+            'captured': self.captured,
+            'dropped': self.dropped,
+            'late': self.late,
+            'device_overflows': self.device_overflows,
+            'depth': self.depth,
+            'max_depth_seen': self.max_depth_seen,
+            'slots': self.slots,
+        }
+
+
+def ring_for(sample_rate: int, channels: int, chunk_frames: int, capacity: float = CAPACITY,
+             sample_width: int = 2, **kwargs) -> CaptureRing:
+    """A ring holding ``capacity`` seconds of audio in chunks of chunk_frames"""
+    chunk_seconds = chunk_frames / sample_rate
+    slots = max(2, math.ceil(capacity / chunk_seconds))
+    return CaptureRing(chunk_frames * channels * sample_width, slots, **kwargs)
+
+
+async def capture_microphone(ring: CaptureRing, sample_rate: int, channels: int,
+                             chunk_frames: int, device=None) -> AsyncIterator[Tuple[memoryview, float]]:
+    """Record from the microphone into ring and yield its chunks"""
+    import sounddevice
+
+    ring.loop = asyncio.get_running_loop()
+
+    def callback(indata, frame_count, time_info, status):
+        ring.write(indata, time.perf_counter(), bool(status.input_overflow))
+
+    stream = sounddevice.RawInputStream(
+        channels=channels,
+        samplerate=sample_rate,
+        blocksize=chunk_frames,
+        callback=callback,
+        dtype='int16',
+        device=device,
+    )
+    with stream:
+        try:
+            while True:
+                item = await ring.get()
+                if item is None:
+                    return
+                yield item
+        finally:
+            ring.close()
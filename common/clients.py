@@ -0,0 +1,66 @@
+"""
+Long-lived boto3 clients, one per (service, region).
+
+Creating a client resolves endpoints and loads service models, and a new client
+starts with an empty connection pool, so the first call pays for a TLS
+handshake too. Reusing one client keeps warm, kept-alive connections between
+calls. boto3 clients are thread-safe once created; sessions are not, so all
+clients are built from one session under a lock.
+
+Calls go through the shared rate controller (``common.throttle``), which
+retries throttling and transient errors itself, so botocore's own retries are
+turned off.
+"""
+
+import threading
+from typing import Iterable
+
+import boto3
+from botocore.config import Config
+
+from .throttle import throttled
+
+
+MAX_POOL_CONNECTIONS = 16
+
+CLIENT_CONFIG = Config(
+    max_pool_connections=MAX_POOL_CONNECTIONS,
+    tcp_keepalive=True,
+    connect_timeout=5,
+    read_timeout=30,
+    retries={'mode': 'standard', 'total_max_attempts': 1},
+)
+
+_session = None
+_clients = {}
+_lock = threading.Lock()
+
+
+def get_client(service: str, region: str):
+    """Return the shared client for service in region, creating it on first use"""
+    key = (service, region)
+    client = _clients.get(key)
+    if client is not None:
+        return client
+
+    global _session
+    with _lock:
+        client = _clients.get(key)
+        if client is None:
+            if _session is None:
+                _session = boto3.Session()
+            client = throttled(_session.client(service, region_name=region, config=CLIENT_CONFIG), service)
+            _clients[key] = client
+        return client
+
+
+def set_client(service: str, region: str, client) -> None:
+    """Register a ready-made client (e.g. a local stand-in) for service in region"""
+    with _lock:
+        _clients[(service, region)] = throttled(client, service)
+
+
+def warm_up(region: str, services: Iterable[str]) -> None:
+    """Create clients up front so the first request doesn't pay for it"""
+    for service in services:
+        get_client(service, region)
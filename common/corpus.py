@@ -0,0 +1,106 @@
+"""
+Sample texts of the demos, one file per language, loaded once.
+
+``LanguageCorpus`` reads every ``<language>.txt`` of a directory once and keeps
+its text, its SSML form and that form's length. Later lookups only compare
+each file's mtime and size with what was loaded, and reread the files that
+changed. Batch runs therefore read each file once, and menus can list the
+samples without touching their contents.
+"""
+
+import os
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Optional, Union
+from xml.etree import ElementTree
+from xml.sax.saxutils import escape
+
+
+@dataclass(frozen=True)
+class CorpusEntry:
+    name: str           # file name without the extension, e.g. 'Chinese Mandarin'
+    path: Path
+    text: str           # file content, stripped
+    ssml: str           # ready for TextType='ssml'
+    chars: int          # len(ssml), what request size limits are checked against
+    mtime_ns: int
+    size: int
+
+
+def wrap_ssml(text: str) -> str:
+    return f'<speak>\n\t{text}\n</speak>'
+
+
+def to_ssml(text: str) -> str:
+    """text inside <speak>, escaped if it doesn't parse as SSML (e.g. a stray '&')"""
+    ssml = wrap_ssml(text)
+    try:
+        ElementTree.fromstring(ssml)
+        return ssml
+    except ElementTree.ParseError:
+        return wrap_ssml(escape(text))
+
+
+class LanguageCorpus:
+    """Every sample text in directory, reloaded only when its file changes"""
+
+    def __init__(self, directory: Union[str, Path], ext: str = '.txt'):
+        self.directory = Path(directory)
+        self.ext = ext
+        self.loads = 0
+        self._entries: Dict[str, CorpusEntry] = {}
+        self._lock = threading.Lock()
+
+    def entries(self) -> Dict[str, CorpusEntry]:
+        """All samples by name, after rereading new and changed files"""
+        with self._lock:
+            seen = {}
+            try:
+                with os.scandir(self.directory) as it:
+                    files = [e for e in it if e.name.endswith(self.ext) and e.is_file()]
+            except OSError:
+                files = []
+            for file in sorted(files, key=lambda e: e.name):
+                name = file.name[:-len(self.ext)] if self.ext else file.name
+                try:
+                    stat = file.stat()
+                except OSError:
+                    continue    # removed since the scan
+                entry = self._fresh(name, Path(file.path), stat)
+                if entry is not None:
+                    seen[name] = entry
+            self._entries = seen
+            return dict(seen)
+
+    def get(self, name: str) -> Optional[CorpusEntry]:
+        """The sample for one language, or None if there is none"""
+        path = self.directory / f'{name}{self.ext}'
+        with self._lock:
+            try:
+                stat = path.stat()
+            except OSError:
+                self._entries.pop(name, None)
+                return None
+            entry = self._fresh(name, path, stat)
+            if entry is None:
+                self._entries.pop(name, None)
+            else:
+                self._entries[name] = entry
+            return entry
+
+    def _fresh(self, name: str, path: Path, stat: os.stat_result) -> Optional[CorpusEntry]:
+        entry = self._entries.get(name)
+        if entry is not None and (entry.mtime_ns, entry.size) == (stat.st_mtime_ns, stat.st_size):
+            return entry
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = f.read()
+        except (OSError, UnicodeDecodeError) as e:
+            print(f"⚠️  Warning: Could not read {path}: {e}")
+            return None
+        self.loads += 1
+        # the raw content is wrapped, as generate_samples always did, so cache keys stay the same
+        ssml = to_ssml(data)
+        return CorpusEntry(name=name, path=path, text=data.strip(), ssml=ssml, chars=len(ssml),
+                           mtime_ns=stat.st_mtime_ns, size=stat.st_size)
@@ -0,0 +1,35 @@
+"""File helpers that never leave a half-written file behind"""
+
+import json
+import os
+import tempfile
+from pathlib import Path
+from typing import Any, Union
+
+
+def atomic_write_bytes(path: Union[str, Path], data: bytes) -> None:
+    """Write data to a temp file next to path, then rename it into place"""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f'.{path.name}.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def atomic_write_json(path: Union[str, Path], obj: Any) -> None:
+    """Serialize obj as JSON and write it atomically"""
+    atomic_write_bytes(path, json.dumps(obj, ensure_ascii=False, indent=2).encode('utf-8'))
+
+
+def read_json(path: Union[str, Path], default: Any = None) -> Any:
+    """Load JSON from path, returning default if it is missing or corrupt"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return default
@@ -0,0 +1,88 @@
+"""
+Latency histograms with percentiles and a Prometheus text export.
+
+Each histogram keeps cumulative counts in fixed buckets (for the Prometheus
+``_bucket``/``_sum``/``_count`` series) plus a bounded window of the most recent
+samples, from which p50/p95/p99 are computed exactly.
+"""
+
+import math
+import threading
+from collections import deque
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Union
+
+from .fileio import atomic_write_bytes
+
+
+# seconds, roughly doubling from 5ms to 30s
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+WINDOW = 4096
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+class Histogram:
+    """Thread-safe latency histogram, values in seconds"""
+
+    def __init__(self, buckets: Iterable[float] = BUCKETS, window: int = WINDOW):
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * len(self.buckets)
+        self.count = 0
+        self.sum = 0.0
+        self._recent = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        with self._lock:
+            self.count += 1
+            self.sum += value
+            self._recent.append(value)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    self.counts[i] += 1
+                    break
+
+    def percentile(self, q: float) -> Optional[float]:
+        """Nearest-rank percentile over the recent window, None when empty"""
+        with self._lock:
+            values = sorted(self._recent)
+        if not values:
+            return None
+        return values[max(0, math.ceil(q * len(values)) - 1)]
+
+    def summary(self) -> Dict:
+        summary = {'count': self.count, 'mean': self.sum / self.count if self.count else None}
+        for q in QUANTILES:
+            summary[f'p{round(q * 100)}'] = self.percentile(q)
+        return summary
+
+
+def _fmt(value: float) -> str:
+    return '+Inf' if value == math.inf else repr(float(value))
+
+
+def prometheus_text(name: str, histograms: Dict[str, Histogram], label: str = 'stage',
+                    help_text: str = 'Latency in seconds') -> str:
+    """Render histograms as one Prometheus histogram (plus a quantile gauge), labelled by key"""
+    lines = [f'# HELP {name} {help_text}', f'# TYPE {name} histogram']
+    for key, hist in histograms.items():
+        cumulative = 0
+        for bound, n in zip(hist.buckets + (math.inf,), hist.counts + [hist.count - sum(hist.counts)]):
+            cumulative += n
+            lines.append(f'{name}_bucket{{{label}="{key}",le="{_fmt(bound)}"}} {cumulative}')
+        lines.append(f'{name}_sum{{{label}="{key}"}} {hist.sum!r}')
+        lines.append(f'{name}_count{{{label}="{key}"}} {hist.count}')
+
+    quantile_name = f'{name}_quantile'
+    lines += [f'# HELP {quantile_name} Recent-window percentiles of {name}', f'# TYPE {quantile_name} gauge']
+    for key, hist in histograms.items():
+        for q in QUANTILES:
+            value = hist.percentile(q)
+            if value is not None:
+                lines.append(f'{quantile_name}{{{label}="{key}",quantile="{q}"}} {value!r}')
+    return '\n'.join(lines) + '\n'
+
+
+def write_prometheus(path: Union[str, Path], name: str, histograms: Dict[str, Histogram], **kwargs) -> None:
+    """Atomically replace path with the Prometheus text rendering, e.g. for node_exporter's textfile collector"""
+    atomic_write_bytes(path, prometheus_text(name, histograms, **kwargs).encode('utf-8'))
@@ -0,0 +1,182 @@
+"""
+Synthesis of inputs longer than a single SynthesizeSpeech request allows.
+
+The text is split at sentence boundaries (or paragraph/sentence/break tags) into
+chunks below ``MAX_CHUNK_CHARS``. Elements still open at a split point are
+closed at the end of the chunk and reopened at the start of the next one, so
+every chunk is balanced SSML. Chunks are synthesized concurrently and the audio
+is joined back together in the original order.
+"""
+
+import os
+import re
+import shutil
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from .audio_stream import StreamStats, stream_to_file
+
+
+# SynthesizeSpeech accepts 3000 billed characters; counting tags as well keeps us safely below
+MAX_CHUNK_CHARS = 3000
+MAX_WORKERS = 4
+
+TAG_RE = re.compile(r'(<[^>]+>)')
+SENTENCE_RE = re.compile(r'[^.!?。！？]*[.!?。！？]+[\'"”’)\]]*\s*|[^.!?。！？]+$', re.S)
+SPEAK_RE = re.compile(r'^\s*(<speak\b[^>]*>)(.*)</speak>\s*$', re.S)
+# a chunk may end right after these elements even without sentence punctuation
+BOUNDARY_TAGS = ('p', 's', 'break')
+
+
+def _tag_name(tag: str) -> str:
+    return re.match(r'</?\s*([\w:-]+)', tag).group(1)
+
+
+def _units(body: str, ssml: bool) -> List[Tuple[str, str, bool]]:
+    """Split body into (kind, text, boundary_after) units; kind is open, close, empty or text"""
+    units = []
+    for token in (TAG_RE.split(body) if ssml else [body]):
+        if not token:
+            continue
+        if ssml and token.startswith('<'):
+            name = _tag_name(token)
+            if token.startswith('</'):
+                units.append(('close', token, name in BOUNDARY_TAGS))
+            elif token.endswith('/>'):
+                units.append(('empty', token, name in BOUNDARY_TAGS))
+            else:
+                units.append(('open', token, False))
+            continue
+        for sentence in SENTENCE_RE.findall(token):
+            units.append(('text', sentence, bool(re.search(r'[.!?。！？]\S*\s*$', sentence))))
+    return units
+
+
+def _split_oversized(text: str, limit: int) -> List[str]:
+    """Break a single sentence longer than limit at whitespace (or hard-cut if it has none)"""
+    pieces = []
+    while len(text) > limit:
+        cut = text.rfind(' ', 0, limit)
+        cut = cut + 1 if cut > 0 else limit
+        pieces.append(text[:cut])
+        text = text[cut:]
+    if text:
+        pieces.append(text)
+    return pieces
+
+
+def split_text(text: str, max_chars: int = MAX_CHUNK_CHARS, ssml: bool = True) -> List[str]:
+    """Split text into request-sized chunks, each one valid on its own"""
+    if len(text) <= max_chars:
+        return [text]
+
+    prefix, suffix, body = '', '', text
+    if ssml:
+        match = SPEAK_RE.match(text)
+        prefix, body = (match.group(1), match.group(2)) if match else ('<speak>', text)
+        suffix = '</speak>'
+
+    chunks = []    # (content, closing tags) of each chunk
+    stack = []     # opening tags still open at the current position
+    current = []   # pieces of the chunk being built
+    reopened = 0   # leading pieces of current that reopen the tags open at the last split
+    size = 0
+
+    def closing(open_tags):
+        return ''.join(f'</{_tag_name(t)}>' for t in reversed(open_tags))
+
+    def flush(final=False):
+        nonlocal current, size, reopened
+        content = ''.join(current)
+        if not TAG_RE.sub('', content).strip():
+            # markup only, e.g. a <break/> at a chunk edge: it stays for the next chunk, or at
+            # the very end goes to the last one, so the pause it makes is not lost
+            extra = ''.join(current[reopened:])
+            if final and chunks and extra.strip():
+                body, _ = chunks[-1]
+                if len(prefix) + len(body) + len(extra) + len(closing(stack)) + len(suffix) <= max_chars:
+                    chunks[-1] = (body + extra, closing(stack))
+            return
+        chunks.append((content, closing(stack)))
+        current = list(stack)
+        reopened = len(current)
+        size = sum(map(len, current))
+
+    budget = max_chars - len(prefix) - len(suffix)
+    for kind, piece, boundary in _units(body, ssml):
+        overhead = len(closing(stack)) + (len(f'</{_tag_name(piece)}>') if kind == 'open' else 0)
+        if kind == 'text' and size + len(piece) + overhead > budget:
+            flush()
+            room = budget - size - len(closing(stack))
+            if len(piece) > room:
+                *full, piece = _split_oversized(piece, max(room, 1))
+                for part in full:
+                    current.append(part)
+                    flush()
+        current.append(piece)
+        size += len(piece)
+        if kind == 'open':
+            stack.append(piece)
+        elif kind == 'close' and stack:
+            stack.pop()
+        # prefer to end chunks on a sentence or paragraph boundary once they are reasonably full
+        if boundary and size > budget * 0.8:
+            flush()
+    flush(final=True)
+    return [f'{prefix}{content}{closed}{suffix}' for content, closed in chunks]
+
+
+def _join(paths: List[str], dest) -> int:
+    total = 0
+    with open(dest, 'wb') as out:
+        for path in paths:
+            with open(path, 'rb') as f:
+                shutil.copyfileobj(f, out)
+            total += os.path.getsize(path)
+    return total
+
+
+def synthesize_long(client, params: Dict, dest, cache=None, max_chars: int = MAX_CHUNK_CHARS,
+                    max_workers: int = MAX_WORKERS) -> StreamStats:
+    """Synthesize params['Text'] of any length into one audio file at dest
+
+    Chunks run concurrently, so the wall time is close to that of the slowest
+    chunk. MP3, OGG and PCM output concatenate into a continuous stream.
+    Raises ValueError when the text holds nothing to speak.
+    """
+    started = time.perf_counter()
+    chunks = split_text(params['Text'], max_chars, ssml=params.get('TextType') == 'ssml')
+    if not chunks:
+        raise ValueError('nothing to synthesize, the text is empty or holds only markup')
+    workdir = tempfile.mkdtemp(prefix='polly-long-')
+    paths = [os.path.join(workdir, f'{i:04d}.part') for i in range(len(chunks))]
+    offsets = [0.0] * len(chunks)     # when each chunk started, from the start of the call
+
+    def synthesize_chunk(i: int) -> StreamStats:
+        offsets[i] = time.perf_counter() - started
+        chunk_params = dict(params, Text=chunks[i])
+        if cache is not None:
+            return cache.synthesize_to_file(client, chunk_params, paths[i])
+        chunk_started = time.perf_counter()
+        response = client.synthesize_speech(**chunk_params)
+        return stream_to_file(response['AudioStream'], paths[i], started=chunk_started)
+
+    try:
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(chunks))) as executor:
+            results = list(executor.map(synthesize_chunk, range(len(chunks))))
+        total = _join(paths, dest)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    # the file starts with the first chunk's audio; its first byte is timed from that chunk's own start
+    first: Optional[float] = None
+    if results[0].first_byte is not None:
+        first = offsets[0] + results[0].first_byte
+    return StreamStats(
+        bytes=total,
+        first_byte=first,
+        elapsed=time.perf_counter() - started,
+        cached=all(r.cached for r in results),
+    )
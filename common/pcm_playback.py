@@ -0,0 +1,74 @@
+"""
+Play Polly PCM output while it is still downloading.
+
+Polly returns raw 16-bit little-endian mono samples for ``OutputFormat='pcm'``,
+which can go straight to a sounddevice output stream chunk by chunk: no temp
+file, no MP3 decode and no ffmpeg. Playback starts with the first chunk instead
+of after the whole response has arrived.
+"""
+
+import threading
+import time
+from contextlib import closing
+from dataclasses import dataclass
+from typing import Optional
+
+
+SAMPLE_RATE = 16000     # Polly PCM supports 8000 and 16000 Hz
+CHUNK_SIZE = 4096       # bytes per write, 128ms of audio at 16kHz
+SAMPLE_WIDTH = 2
+
+
+@dataclass
+class PlaybackStats:
+    bytes: int = 0
+    first_byte: Optional[float] = None   # seconds from start until the first bytes arrived
+    first_audio: Optional[float] = None  # seconds from start until the first samples were queued
+    elapsed: float = 0.0
+    stopped: bool = False
+
+
+def play_pcm_stream(body, sample_rate: int = SAMPLE_RATE, chunk_size: int = CHUNK_SIZE,
+                    started: Optional[float] = None, tee=None, device=None,
+                    stop: Optional[threading.Event] = None, log=print) -> PlaybackStats:
+    """Write PCM from body to the output device as it arrives
+
+    ``started`` is a ``time.perf_counter()`` value taken before the request so
+    time-to-first-audio includes the service latency. Every chunk is also
+    written to ``tee`` when given (e.g. a synthesis cache writer). Setting
+    ``stop`` cuts playback off after the current chunk. Status lines go to ``log``.
+    """
+    import sounddevice
+
+    started = time.perf_counter() if started is None else started
+    stats = PlaybackStats()
+    carry = b''
+
+    with closing(body), sounddevice.RawOutputStream(
+            samplerate=sample_rate, channels=1, dtype='int16', device=device) as stream:
+        while True:
+            if stop is not None and stop.is_set():
+                stream.abort()
+                stats.stopped = True
+                break
+            chunk = body.read(chunk_size)
+            if not chunk:
+                break
+            if stats.first_byte is None:
+                stats.first_byte = time.perf_counter() - started
+            if tee is not None:
+                tee.write(chunk)
+            stats.bytes += len(chunk)
+            # a chunk boundary can split a sample, hold the odd byte back for the next write
+            chunk = carry + chunk
+            usable = len(chunk) - len(chunk) % SAMPLE_WIDTH
+            carry = chunk[usable:]
+            if not usable:
+                continue
+            if stats.first_audio is None:
+                stats.first_audio = time.perf_counter() - started
+                log(f'📢 first audio after {stats.first_audio * 1000:.0f}ms')
+            stream.write(chunk[:usable])
+
+    stats.elapsed = time.perf_counter() - started
+    return stats
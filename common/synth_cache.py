@@ -0,0 +1,190 @@
+"""
+Content-addressed cache of synthesized audio.
+
+Blobs are keyed by a hash of every request field that affects the audio, so a
+repeated request is served from disk without calling Polly. The cache is
+bounded in bytes and evicts the least recently used blobs first (file mtime is
+bumped on every hit).
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional
+
+from . import CACHE_ROOT
+from .audio_stream import StreamStats, copy_stream
+
+
+AUDIO_CACHE_DIR = CACHE_ROOT / 'audio'
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+# Request fields that change the synthesized audio
+KEY_FIELDS = ('Text', 'TextType', 'VoiceId', 'LanguageCode', 'Engine', 'OutputFormat', 'SampleRate')
+
+
+def request_key(params: Dict) -> str:
+    """Stable hash of the audio-relevant fields of a synthesize_speech request"""
+    fields = {k: params.get(k) for k in KEY_FIELDS}
+    raw = json.dumps(fields, sort_keys=True, ensure_ascii=False).encode('utf-8')
+    return hashlib.sha256(raw).hexdigest()
+
+
+class SynthesisCache:
+    """Size-bounded LRU store of audio blobs with hit/miss counters"""
+
+    def __init__(self, cache_dir: Path = AUDIO_CACHE_DIR, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._size = sum(p.stat().st_size for p in self._blobs())
+
+    def _blobs(self):
+        return (p for p in self.cache_dir.iterdir() if p.is_file() and not p.name.startswith('.'))
+
+    def path_for(self, params: Dict) -> Path:
+        return self.cache_dir / f"{request_key(params)}.{params.get('OutputFormat', 'mp3')}"
+
+    def lookup(self, params: Dict) -> Optional[Path]:
+        """Return the cached blob for params, or None on a miss"""
+        path = self.path_for(params)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return path
+
+    def lost(self) -> None:
+        """Count the last lookup() hit as a miss, its blob was evicted before it could be read"""
+        with self._lock:
+            self.hits -= 1
+            self.misses += 1
+
+    def store(self, params: Dict, data: bytes) -> Path:
+        """Add a blob for params and evict old entries if over budget"""
+        with self.writer(params) as f:
+            f.write(data)
+        return self.path_for(params)
+
+    def writer(self, params: Dict) -> '_BlobWriter':
+        """File-like context manager, the blob appears only if the block succeeds"""
+        return _BlobWriter(self, self.path_for(params))
+
+    def synthesize_to_file(self, client, params: Dict, dest) -> StreamStats:
+        """Write audio for params to dest, calling Polly only on a miss
+
+        The returned stats have ``cached`` set on a hit.
+        """
+        cached = self.lookup(params)
+        if cached is not None:
+            try:
+                shutil.copyfile(cached, dest)
+                return StreamStats(bytes=os.path.getsize(dest), first_byte=0.0, cached=True)
+            except FileNotFoundError:
+                self.lost()     # evicted by another writer since the lookup
+
+        started = time.perf_counter()
+        response = client.synthesize_speech(**params)
+        # dest is written along with the blob, not copied from it afterwards: another
+        # writer may evict the blob as soon as it is committed
+        with open(dest, 'wb') as out, self.writer(params) as blob:
+            stats = copy_stream(response['AudioStream'], _Tee(out, blob), started=started)
+        return stats
+
+    def _committed(self, path: Path, size: int) -> None:
+        with self._lock:
+            self._size += size
+            if self._size > self.max_bytes:
+                self._evict(keep=path)
+
+    def _evict(self, keep: Path) -> None:
+        blobs = []
+        for p in self._blobs():
+            try:
+                st = p.stat()
+            except FileNotFoundError:
+                continue
+            blobs.append((st.st_mtime, st.st_size, p))
+        blobs.sort()
+        self._size = sum(size for _, size, _ in blobs)
+        for _, size, p in blobs:
+            if self._size <= self.max_bytes:
+                break
+            if p == keep:
+                continue
+            try:
+                p.unlink()
+            except FileNotFoundError:
+                pass
+            self._size -= size
+            self.evictions += 1
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def stats(self) -> Dict:
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': round(self.hit_rate, 3),
+            'bytes': self._size,
+        }
+
+
+class _Tee:
+    """Writes every chunk to several files"""
+
+    def __init__(self, *files):
+        self.files = files
+
+    def write(self, data) -> int:
+        for f in self.files:
+            f.write(data)
+        return len(data)
+
+
+class _BlobWriter:
+    def __init__(self, cache: SynthesisCache, path: Path):
+        self.cache = cache
+        self.path = path
+        self.size = 0
+        self.discarded = False
+
+    def __enter__(self):
+        fd, self.tmp = tempfile.mkstemp(dir=self.cache.cache_dir, prefix='.', suffix='.tmp')
+        self.file = os.fdopen(fd, 'wb')
+        return self
+
+    def write(self, data) -> int:
+        n = self.file.write(data)
+        self.size += n
+        return n
+
+    def discard(self) -> None:
+        """Drop the blob on exit, e.g. when the stream was cut short"""
+        self.discarded = True
+
+    def __exit__(self, exc_type, exc, tb):
+        self.file.close()
+        if exc_type is not None or self.discarded:
+            os.unlink(self.tmp)
+            return False
+        os.replace(self.tmp, self.path)
+        self.cache._committed(self.path, self.size)
+        return False
@@ -0,0 +1,312 @@
+"""
+Adaptive rate limiting and retries for Polly and Translate calls.
+
+Every (service, engine) pair gets an ``AdaptiveLimiter``: a token bucket for
+requests per second and a window of requests in flight. Both adjust
+themselves with AIMD (additive increase, multiplicative decrease):
+
+- a ThrottlingException halves the window and cuts the rate
+- a response much slower than the fastest seen recently shrinks the window a little
+- while callers are held back by the limiter, each success raises both, quickly
+  until the first throttle and slowly after it
+
+Throttled and transient 5xx errors, and dropped or timed-out connections, are retried with full-jitter exponential
+backoff. A batch run therefore settles just under the account's quota, and
+slows down on its own when it is exceeded instead of failing.
+
+``throttled(client, service)`` wraps a boto3 client so that every call goes
+through the shared controller, page requests of its paginators included.
+Clients from ``common.clients`` are already wrapped.
+"""
+
+import random
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Callable, Dict, Optional, Tuple
+
+from botocore.exceptions import (
+    ClientError, ConnectionClosedError, ConnectTimeoutError, EndpointConnectionError, ReadTimeoutError,
+)
+
+
+THROTTLING_CODES = {
+    'ThrottlingException', 'Throttling', 'TooManyRequestsException',
+    'RequestLimitExceeded', 'LimitExceededException', 'ProvisionedThroughputExceededException',
+}
+TRANSIENT_CODES = {
+    'ServiceUnavailable', 'ServiceUnavailableException', 'ServiceFailureException',
+    'InternalFailure', 'InternalServerException', 'InternalServerError',
+}
+TRANSIENT_STATUS = {500, 502, 503, 504}
+# transport failures botocore would retry itself, its retries are turned off (common.clients)
+TRANSIENT_ERRORS = (EndpointConnectionError, ConnectTimeoutError, ConnectionClosedError, ReadTimeoutError)
+
+MAX_ATTEMPTS = 6
+BASE_DELAY = 0.2        # seconds, doubled on every attempt
+MAX_DELAY = 10.0
+MIN_RATE = 0.2          # requests per second the rate never drops below
+DECREASE = 0.5          # window and rate factor on throttling
+LATENCY_DECREASE = 0.9  # window factor on a slow response
+LATENCY_FACTOR = 3.0    # slower than this many times the fastest recent response counts as slow
+COOLDOWN = 1.0          # seconds between two decreases, one burst of errors counts once
+
+
+@dataclass
+class Limit:
+    """Starting rate (requests/s), burst and concurrency for one service and engine"""
+    rate: float
+    burst: Optional[float] = None
+    concurrency: int = 8
+    max_concurrency: int = 64
+
+
+# Starting points only, the limiters settle on what the account's quotas allow.
+# engine None covers every other call of the service (describe_voices, task status, ...)
+LIMITS: Dict[Tuple[str, Optional[str]], Limit] = {
+    ('polly', 'standard'): Limit(rate=80, burst=100),
+    ('polly', 'neural'): Limit(rate=30, burst=40),
+    ('polly', 'generative'): Limit(rate=8, burst=10, concurrency=4),
+    ('polly', 'long-form'): Limit(rate=4, burst=5, concurrency=2),
+    ('polly', None): Limit(rate=10, concurrency=4),
+    ('translate', None): Limit(rate=20, burst=25),
+}
+DEFAULT_LIMIT = Limit(rate=10)
+
+
+def error_code(error: BaseException) -> Optional[str]:
+    if isinstance(error, ClientError):
+        return error.response.get('Error', {}).get('Code')
+    return None
+
+
+def is_transient(error: BaseException) -> bool:
+    """A server-side or transport failure that is worth retrying"""
+    if isinstance(error, TRANSIENT_ERRORS):
+        return True
+    if isinstance(error, ClientError):
+        status = error.response.get('ResponseMetadata', {}).get('HTTPStatusCode')
+        return error_code(error) in TRANSIENT_CODES or status in TRANSIENT_STATUS
+    return False
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        self.min_burst = burst or max(rate, 1.0)
+        self.burst = self.min_burst
+        self.tokens = self.burst
+        self.set_rate(rate)
+        self.updated = time.monotonic()
+        self.saturated = False      # a caller had to wait since the last check
+        self._lock = threading.Lock()
+
+    def set_rate(self, rate: float) -> None:
+        # the bucket holds about a second of requests, a grown rate can burst as far
+        self.rate = rate
+        self.burst = max(self.min_burst, rate)
+
+    def take(self) -> float:
+        """Reserve a token, returning how long to sleep before using it"""
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            if self.tokens >= 0:
+                return 0.0
+            self.saturated = True
+            return -self.tokens / self.rate
+
+
+class AdaptiveLimiter:
+    """Token bucket plus an AIMD window of requests in flight"""
+
+    def __init__(self, limit: Limit):
+        self.bucket = TokenBucket(limit.rate, limit.burst)
+        self.max_rate = None
+        self.window = float(limit.concurrency)
+        self.max_window = limit.max_concurrency
+        self.in_flight = 0
+        self.fastest = None         # recent best latency, creeps up so it can recover
+        self.calls = 0
+        self.throttled = 0
+        self.retried = 0
+        self.waited = 0.0
+        self._window_full = False
+        self._decreased_at = 0.0
+        self._cond = threading.Condition()
+
+    @contextmanager
+    def slot(self):
+        """Hold one request slot; the block's duration is its latency"""
+        started = time.monotonic()
+        with self._cond:
+            while self.in_flight >= max(1, int(self.window)):
+                self._window_full = True
+                self._cond.wait()
+            self.in_flight += 1
+        delay = self.bucket.take()
+        if delay:
+            time.sleep(delay)
+        sent = time.monotonic()
+        ok = False
+        try:
+            yield
+            ok = True
+        finally:
+            with self._cond:
+                self.in_flight -= 1
+                self.calls += 1
+                self.waited += sent - started
+                self._cond.notify()
+            if ok:
+                # errors come back fast, they would make every success look slow
+                self._observe(time.monotonic() - sent)
+
+    def _decrease(self, factor: float, rate: bool) -> None:
+        now = time.monotonic()
+        if now - self._decreased_at < COOLDOWN:
+            return
+        self._decreased_at = now
+        self.window = max(1.0, self.window * factor)
+        if rate:
+            # remember where throttling started, increases slow down near it
+            self.max_rate = self.bucket.rate
+            self.bucket.set_rate(max(MIN_RATE, self.bucket.rate * factor))
+
+    def _observe(self, latency: float) -> None:
+        with self._cond:
+            self.fastest = latency if self.fastest is None else min(latency, self.fastest * 1.01)
+            if latency > self.fastest * LATENCY_FACTOR and latency > 0.05:
+                self._decrease(LATENCY_DECREASE, rate=False)
+                return
+            # grow only what held callers back. Until the first throttle (slow start) every
+            # success adds one, which doubles the limit about every round; after it, one
+            # per window or per second of requests, and ten times slower past the last ceiling
+            slow_start = self.max_rate is None
+            if self._window_full:
+                self.window = min(self.max_window, self.window + (1 if slow_start else 1 / self.window))
+                self._window_full = False
+            if self.bucket.saturated:
+                rate = self.bucket.rate
+                step = 1 if slow_start else 1 / rate if rate < self.max_rate else 0.1 / rate
+                self.bucket.set_rate(rate + step)
+                self.bucket.saturated = False
+
+    def on_throttled(self) -> None:
+        with self._cond:
+            self.throttled += 1
+            self._decrease(DECREASE, rate=True)
+
+    def on_retry(self) -> None:
+        with self._cond:
+            self.retried += 1
+
+    def stats(self) -> Dict:
+        return {
+            'calls': self.calls,
+            'throttled': self.throttled,
+            'retried': self.retried,
+            'rate': round(self.bucket.rate, 2),
+            'concurrency': round(self.window, 2),
+            'waited_s': round(self.waited, 3),
+        }
+
+
+class RateController:
+    """Limiters for every service and engine, and the retry loop around calls"""
+
+    def __init__(self, limits: Dict = None, attempts: int = MAX_ATTEMPTS,
+                 base_delay: float = BASE_DELAY, max_delay: float = MAX_DELAY):
+        self.limits = LIMITS if limits is None else limits
+        self.attempts = attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._limiters = {}
+        self._lock = threading.Lock()
+        self._random = random.Random()
+
+    def limiter(self, service: str, engine: Optional[str] = None) -> AdaptiveLimiter:
+        key = (service, engine)
+        limiter = self._limiters.get(key)
+        if limiter is None:
+            with self._lock:
+                limiter = self._limiters.get(key)
+                if limiter is None:
+                    limit = self.limits.get(key) or self.limits.get((service, None)) or DEFAULT_LIMIT
+                    limiter = self._limiters[key] = AdaptiveLimiter(limit)
+        return limiter
+
+    def call(self, service: str, engine: Optional[str], fn: Callable, *args, **kwargs):
+        """fn(*args, **kwargs) within the limits, retrying throttled and transient errors"""
+        limiter = self.limiter(service, engine)
+        for attempt in range(self.attempts):
+            try:
+                with limiter.slot():
+                    return fn(*args, **kwargs)
+            except (ClientError,) + TRANSIENT_ERRORS as error:
+                if error_code(error) in THROTTLING_CODES:
+                    limiter.on_throttled()
+                elif not is_transient(error):
+                    raise
+                if attempt == self.attempts - 1:
+                    raise
+                limiter.on_retry()
+                # full jitter: spreads retries out so they don't come back in one wave
+                time.sleep(self._random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt)))
+
+    def stats(self) -> Dict[str, Dict]:
+        return {f'{service}/{engine or "*"}': limiter.stats()
+                for (service, engine), limiter in sorted(self._limiters.items(), key=lambda kv: str(kv[0]))}
+
+
+class ThrottledClient:
+    """A boto3 client whose calls go through a RateController, keyed by their Engine parameter"""
+
+    def __init__(self, client, service: str, controller: RateController = None):
+        self.client = client
+        self.service = service
+        self.controller = controller or default_controller()
+
+    def __getattr__(self, name):
+        attr = getattr(self.client, name)
+        if name == 'get_paginator':
+            return self._get_paginator
+        if not callable(attr) or name.startswith(('can_paginate', 'get_waiter')):
+            return attr
+        return self._throttled(attr)
+
+    def _throttled(self, fn):
+        def call(*args, **kwargs):
+            engine = kwargs.get('Engine')
+            if engine is None and self.service == 'polly' and 'Text' in kwargs:
+                engine = 'standard'     # Polly's default engine
+            return self.controller.call(self.service, engine, fn, *args, **kwargs)
+        return call
+
+    def _get_paginator(self, operation_name):
+        paginator = self.client.get_paginator(operation_name)
+        # a botocore paginator requests every page through _method, send those through the controller too
+        paginator._method = self._throttled(paginator._method)
+        return paginator
+
+
+_controller = None
+_controller_lock = threading.Lock()
+
+
+def default_controller() -> RateController:
+    """The controller shared by every client in the process"""
+    global _controller
+    with _controller_lock:
+        if _controller is None:
+            _controller = RateController()
+        return _controller
+
+
+def throttled(client, service: str, controller: RateController = None):
+    """client wrapped in the shared (or the given) controller, unless it already is"""
+    if isinstance(client, ThrottledClient):
+        return client
+    return ThrottledClient(client, service, controller)
@@ -0,0 +1,293 @@
+"""
+Live transcript display without clearing the screen.
+
+Partial results arrive several times a second and mostly extend the previous
+one. The renderer drops partials that repeat the text on screen, holds back
+those that arrive faster than ``min_interval`` until it has passed, and hands
+the rest to its sinks. The terminal sink
+rewrites only the part of the line that changed, using ANSI cursor codes, so a
+partial costs one small write instead of a shell process. Other sinks log
+results to JSON lines or write finals as SRT/WebVTT captions.
+
+Anything else printed while a partial is on screen would break the in-place
+redraw, so other threads print status lines through ``message()``.
+"""
+
+import asyncio
+import json
+import os
+import shutil
+import sys
+import threading
+import time
+import unicodedata
+from pathlib import Path
+from typing import Iterable, Optional, TextIO, Union
+
+
+MIN_INTERVAL = 0.1      # seconds between partial redraws
+
+ERASE_LINE = '\x1b[K'
+ERASE_DOWN = '\x1b[J'
+
+
+def display_width(text: str) -> int:
+    """Terminal cells needed for text, wide (e.g. CJK) characters take two"""
+    return sum(2 if unicodedata.east_asian_width(c) in ('W', 'F') else 0 if unicodedata.combining(c) else 1
+               for c in text)
+
+
+def _common_prefix(a: str, b: str) -> int:
+    n = min(len(a), len(b))
+    i = 0
+    while i < n and a[i] == b[i]:
+        i += 1
+    return i
+
+
+def _enable_windows_ansi() -> bool:
+    """Turn on escape code processing in the Windows console (Windows 10 and later)"""
+    try:
+        import ctypes
+        kernel32 = ctypes.windll.kernel32
+        handle = kernel32.GetStdHandle(-11)
+        mode = ctypes.c_uint32()
+        if not kernel32.GetConsoleMode(handle, ctypes.byref(mode)):
+            return False
+        # ENABLE_VIRTUAL_TERMINAL_PROCESSING
+        return bool(kernel32.SetConsoleMode(handle, mode.value | 0x0004))
+    except Exception:
+        return False
+
+
+class TerminalSink:
+    """Keeps the current partial on one (possibly wrapped) line and rewrites it in place
+
+    When the output is not a terminal only final results are written, so logs
+    and pipes don't fill up with escape codes.
+    """
+
+    def __init__(self, stream: TextIO = None, final_suffix: str = ''):
+        self.stream = stream or sys.stdout
+        self.final_suffix = final_suffix
+        self.interactive = self.stream.isatty() and (os.name != 'nt' or _enable_windows_ansi())
+        self.shown = ''
+
+    def _columns(self) -> int:
+        return max(shutil.get_terminal_size().columns, 1)
+
+    def _rows(self, text: str) -> int:
+        return max(1, -(-display_width(text) // self._columns()))
+
+    def _redraw(self, text: str) -> str:
+        """Escape codes and text that turn the line on screen into text"""
+        keep = _common_prefix(self.shown, text)
+        if display_width(self.shown) < self._columns():
+            # one screen row: step back over the changed tail and rewrite it
+            back = display_width(self.shown[keep:])
+            codes = f'\x1b[{back}D' if back else ''
+            return f'{codes}{text[keep:]}{ERASE_LINE if back else ""}'
+        # wrapped: return to the first row of the line and draw it again
+        up = self._rows(self.shown) - 1
+        codes = f'\x1b[{up}A' if up else ''
+        return f'\r{codes}{ERASE_DOWN}{text}'
+
+    def partial(self, text: str, **info) -> None:
+        if not self.interactive:
+            return
+        self.stream.write(self._redraw(text))
+        self.stream.flush()
+        self.shown = text
+
+    def message(self, text: str) -> None:
+        if self.interactive and self.shown:
+            # clear the live line, print above it, then draw it again in full
+            up = self._rows(self.shown) - 1
+            codes = f'\x1b[{up}A' if up else ''
+            self.stream.write(f'\r{codes}{ERASE_DOWN}{text}\n{self.shown}')
+        else:
+            self.stream.write(f'{text}\n')
+        self.stream.flush()
+
+    def final(self, text: str, **info) -> None:
+        out = self._redraw(text) if self.interactive else text
+        self.stream.write(f'{out}{self.final_suffix}\n')
+        self.stream.flush()
+        self.shown = ''
+
+    def close(self) -> None:
+        if self.shown:
+            self.stream.write('\n')
+            self.stream.flush()
+            self.shown = ''
+
+
+class JsonlSink:
+    """Appends results as JSON lines, partials included unless ``partials=False``"""
+
+    def __init__(self, path: Union[str, Path], partials: bool = True):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.file = open(path, 'a', encoding='utf-8', buffering=1)
+        self.partials = partials
+
+    def _write(self, text: str, partial: bool, info: dict) -> None:
+        self.file.write(json.dumps({'time': time.time(), 'partial': partial, 'text': text, **info},
+                                   ensure_ascii=False) + '\n')
+
+    def partial(self, text: str, **info) -> None:
+        if self.partials:
+            self._write(text, True, info)
+
+    def final(self, text: str, **info) -> None:
+        self._write(text, False, info)
+
+    def message(self, text: str) -> None:
+        pass
+
+    def close(self) -> None:
+        self.file.close()
+
+
+def _timestamp(seconds: float, separator: str) -> str:
+    ms = int(round(seconds * 1000))
+    return f'{ms // 3600000:02d}:{ms // 60000 % 60:02d}:{ms // 1000 % 60:02d}{separator}{ms % 1000:03d}'
+
+
+class CaptionSink:
+    """Writes each final result as a subtitle cue, ``fmt`` is 'srt' or 'vtt'
+
+    Cue times are the result's offsets in the audio stream, so the file lines up
+    with a recording of the same session.
+    """
+
+    def __init__(self, path: Union[str, Path], fmt: Optional[str] = None):
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.fmt = fmt or ('vtt' if path.suffix == '.vtt' else 'srt')
+        self.file = open(path, 'w', encoding='utf-8', buffering=1)
+        self.cues = 0
+        if self.fmt == 'vtt':
+            self.file.write('WEBVTT\n\n')
+
+    def partial(self, text: str, **info) -> None:
+        pass
+
+    def message(self, text: str) -> None:
+        pass
+
+    def final(self, text: str, start: Optional[float] = None, end: Optional[float] = None, **info) -> None:
+        if start is None or end is None or not text.strip():
+            return
+        self.cues += 1
+        separator = '.' if self.fmt == 'vtt' else ','
+        number = '' if self.fmt == 'vtt' else f'{self.cues}\n'
+        self.file.write(f'{number}{_timestamp(start, separator)} --> {_timestamp(end, separator)}\n{text}\n\n')
+
+    def close(self) -> None:
+        self.file.close()
+
+
+class TranscriptRenderer:
+    """Fans transcript updates out to sinks, skipping redundant and too frequent partials
+
+    A partial that comes too soon is held back and drawn once ``min_interval``
+    has passed, unless a newer partial or the final replaces it first, so the
+    screen never stays behind when the speaker pauses. The delayed draw needs a
+    running asyncio loop, as in the demo scripts. ``message`` may be called
+    from any thread.
+    """
+
+    def __init__(self, sinks: Iterable = None, min_interval: float = MIN_INTERVAL):
+        self.sinks = list(sinks) if sinks is not None else [TerminalSink()]
+        self.min_interval = min_interval
+        self.last_text = None
+        self.last_render = 0.0
+        self.rendered = 0
+        self.skipped = 0
+        self._held = None       # (text, info) of the partial waiting for the interval to pass
+        self._timer = None
+        self._lock = threading.Lock()   # sinks are written from the loop and from message()
+
+    def partial(self, text: str, **info) -> None:
+        """Show a partial result (extra keywords such as result_id go to the sinks)"""
+        if text == self.last_text:
+            self._drop_held()
+            self.skipped += 1
+            return
+        now = time.monotonic()
+        wait = self.last_render + self.min_interval - now
+        if wait > 0:
+            # too soon, draw it when the interval is over unless something newer comes first
+            self._drop_held()
+            self._held = (text, info)
+            self._schedule(wait)
+            return
+        self._drop_held()
+        self._draw(text, info, now)
+
+    def _draw(self, text: str, info: dict, now: float) -> None:
+        self.last_text = text
+        self.last_render = now
+        self.rendered += 1
+        with self._lock:
+            for sink in self.sinks:
+                sink.partial(text, **info)
+
+    def _schedule(self, wait: float) -> None:
+        if self._timer is not None:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return      # no loop, the next partial or final catches up instead
+        self._timer = loop.call_later(wait, self._flush)
+
+    def _flush(self) -> None:
+        self._timer = None
+        if self._held is not None:
+            text, info = self._held
+            self._held = None
+            self._draw(text, info, time.monotonic())
+
+    def _drop_held(self) -> None:
+        if self._held is not None:
+            self._held = None
+            self.skipped += 1
+
+    def _cancel_timer(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+    def final(self, text: str, **info) -> None:
+        """Show a final result; pass start and end (seconds into the audio) for captions"""
+        self._drop_held()
+        self._cancel_timer()
+        self.last_text = None
+        self.rendered += 1
+        with self._lock:
+            for sink in self.sinks:
+                sink.final(text, **info)
+
+    def message(self, text: str) -> None:
+        """Print a status line above the live partial, which is then redrawn below it"""
+        with self._lock:
+            for sink in self.sinks:
+                sink.message(text)
+
+    def close(self) -> None:
+        self._cancel_timer()
+        with self._lock:
+            for sink in self.sinks:
+                sink.close()
+
+
+def build_renderer(jsonl_path=None, caption_path=None, final_suffix: str = '',
+                   min_interval: float = MIN_INTERVAL) -> TranscriptRenderer:
+    """Terminal output plus the optional JSON-lines log and caption file"""
+    sinks = [TerminalSink(final_suffix=final_suffix)]
+    if jsonl_path:
+        sinks.append(JsonlSink(jsonl_path))
+    if caption_path:
+        sinks.append(CaptionSink(caption_path))
+    return TranscriptRenderer(sinks, min_interval)
@@ -0,0 +1,200 @@
+"""
+Voice-activity gating for audio streamed to Transcribe.
+
+Each chunk is cut into short frames. Energy (dBFS) and zero-crossing rate are
+computed for all frames at once with NumPy. A frame counts as speech when it
+is well above the tracked noise floor. Quieter frames with many zero crossings,
+the hiss of consonants such as s or f, also count. The gate stays open for
+``hangover`` seconds after the last speech frame so word endings and the pause
+Transcribe needs to finish a sentence still get through. The last ``pre_roll``
+seconds before an onset are sent along with it, so the first syllable is not
+clipped.
+
+Audio outside speech is handled according to ``silence``:
+
+- ``compress``: only every ``compress_ratio``-th silent frame is sent, so pauses
+  reach the service shortened
+- ``suppress``: nothing is sent, apart from a short frame of digital silence
+  every ``keepalive`` seconds, because Transcribe closes a stream that has had
+  no audio for 15 seconds
+
+Either way the audio timeline Transcribe sees is shorter than the real one, so
+result offsets no longer match a recording of the session.
+"""
+
+import math
+from typing import AsyncIterable, AsyncIterator, Optional, Tuple, Union
+
+import numpy as np
+
+
+COMPRESS = 'compress'
+SUPPRESS = 'suppress'
+MODES = (COMPRESS, SUPPRESS)
+
+FRAME_MS = 16           # 256 samples at 16kHz, so 4096-sample chunks split evenly
+HANGOVER = 0.6          # seconds the gate stays open after speech
+PRE_ROLL = 0.3          # seconds sent ahead of a speech onset
+MARGIN_DB = 12.0        # speech is this far above the noise floor
+MIN_SPEECH_DB = -50.0   # never speech below this level, whatever the floor
+UNVOICED_ZCR = 0.25     # zero crossings per sample of fricatives
+COMPRESS_RATIO = 8
+KEEPALIVE = 5.0
+FLOOR_ADAPT = 0.1       # how fast the noise floor follows quieter chunks
+
+Audio = Union[bytes, memoryview]
+
+
+class VoiceGate:
+    """Frame-level speech detection over 16-bit PCM chunks, with hangover and pre-roll
+
+    ``process(chunk)`` returns the audio to send for that chunk (possibly
+    empty). When the whole chunk passes it is returned as is, without a copy.
+    """
+
+    def __init__(self, sample_rate: int = 16000, channels: int = 1, silence: str = COMPRESS,
+                 frame_ms: int = FRAME_MS, hangover: float = HANGOVER, pre_roll: float = PRE_ROLL,
+                 margin_db: float = MARGIN_DB, min_speech_db: float = MIN_SPEECH_DB,
+                 compress_ratio: int = COMPRESS_RATIO, keepalive: float = KEEPALIVE):
+        if silence not in MODES:
+            raise ValueError(f"unknown silence mode {silence!r}, expected one of {', '.join(MODES)}")
+        self.channels = channels
+        self.silence = silence
+        self.frame_samples = sample_rate * frame_ms // 1000
+        self.frame_bytes = self.frame_samples * channels * 2
+        frame_seconds = frame_ms / 1000
+        self.hangover_frames = math.ceil(hangover / frame_seconds)
+        self.pre_roll_bytes = math.ceil(pre_roll / frame_seconds) * self.frame_bytes
+        self.keepalive_frames = math.ceil(keepalive / frame_seconds)
+        self.margin_db = margin_db
+        self.min_speech_db = min_speech_db
+        self.compress_ratio = compress_ratio
+
+        self.noise_floor = None
+        self._since_speech = self.hangover_frames + 1   # frames since the last speech frame
+        self._since_sent = 0                            # frames since anything was sent
+        self._silent_run = 0                            # closed frames in a row, for compression
+        self._was_open = False                          # whether the last frame got through
+        self._pre = bytearray()                         # recent audio that was held back
+        self._tail = bytearray()                        # bytes short of a whole frame
+
+        self.frames = 0
+        self.speech_frames = 0
+        self.sent_frames = 0
+        self.onsets = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    def features(self, frames: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Energy in dBFS and zero-crossing rate of each row of 16-bit samples"""
+        x = frames.astype(np.float32) / 32768.0
+        energy = 10 * np.log10(np.mean(x * x, axis=1) + 1e-10)
+        signs = np.signbit(frames)
+        zcr = np.count_nonzero(signs[:, 1:] != signs[:, :-1], axis=1) / (frames.shape[1] - 1)
+        return energy, zcr
+
+    def _speech(self, energy: np.ndarray, zcr: np.ndarray) -> np.ndarray:
+        quiet = float(np.percentile(energy, 10))
+        if self.noise_floor is None:
+            self.noise_floor = quiet
+        elif quiet < self.noise_floor:
+            self.noise_floor = quiet    # drop right away, rise slowly
+        else:
+            # a chunk whose quietest frames are speech-loud barely moves the floor,
+            # so it can follow louder background noise without learning a long talk
+            rate = FLOOR_ADAPT if quiet < self.noise_floor + self.margin_db else FLOOR_ADAPT / 10
+            self.noise_floor += rate * (quiet - self.noise_floor)
+        threshold = max(self.noise_floor + self.margin_db, self.min_speech_db)
+        voiced = energy > threshold
+        unvoiced = (energy > threshold - self.margin_db / 2) & (zcr > UNVOICED_ZCR)
+        return voiced | unvoiced
+
+    def _open(self, speech: np.ndarray) -> np.ndarray:
+        """Frames the gate lets through: speech plus the hangover after it"""
+        index = np.arange(len(speech))
+        # position of the latest speech frame at or before each frame, carried over from the last chunk
+        last = np.maximum.accumulate(np.where(speech, index, -self._since_speech - 1))
+        since = index - last
+        self._since_speech = int(since[-1]) + 1
+        return since <= self.hangover_frames
+
+    def process(self, chunk: Audio) -> Audio:
+        """The part of chunk to send to the service"""
+        self.bytes_in += len(chunk)
+        # a partial frame left from the last chunk costs one copy, aligned chunks none
+        data = bytes(self._tail) + bytes(chunk) if self._tail else chunk
+        whole = len(data) // self.frame_bytes * self.frame_bytes
+        self._tail[:] = memoryview(data)[whole:]
+        if not whole:
+            return b''
+        frames = np.frombuffer(data, dtype=np.int16, count=whole // 2).reshape(-1, self.frame_samples * self.channels)
+        if self.channels > 1:
+            frames = frames.reshape(len(frames), self.frame_samples, self.channels).mean(axis=2)
+        is_open = self._open(self._speech(*self.features(frames)))
+        self.frames += len(is_open)
+        self.speech_frames += int(np.count_nonzero(is_open))
+
+        if self._was_open and is_open.all() and whole == len(data):
+            out = data
+            self._since_sent = self._silent_run = 0
+        else:
+            out = self._select(memoryview(data), is_open)
+        self._was_open = bool(is_open[-1])
+        self.sent_frames += len(out) // self.frame_bytes
+        self.bytes_out += len(out)
+        return out
+
+    def _select(self, view: memoryview, is_open: np.ndarray) -> bytes:
+        """Open frames with the pre-roll ahead of each onset, plus what the silence mode keeps"""
+        fb = self.frame_bytes
+        out = bytearray()
+        was_open = self._was_open
+        for i, frame_open in enumerate(is_open.tolist()):
+            frame = view[i * fb:(i + 1) * fb]
+            if frame_open:
+                if not was_open:
+                    self.onsets += 1
+                    out += self._pre
+                    self._pre.clear()
+                out += frame
+                self._silent_run = 0
+                self._since_sent = 0
+            else:
+                self._silent_run += 1
+                self._since_sent += 1
+                if self.silence == COMPRESS and self._silent_run % self.compress_ratio == 0:
+                    # what was held back is older than this frame, it must not follow it
+                    out += frame
+                    self._pre.clear()
+                    self._since_sent = 0
+                elif self.silence == SUPPRESS and self._since_sent >= self.keepalive_frames:
+                    out += bytes(fb)
+                    self._since_sent = 0
+                else:
+                    self._pre += frame
+                    if len(self._pre) > self.pre_roll_bytes:
+                        del self._pre[:len(self._pre) - self.pre_roll_bytes]
+            was_open = frame_open
+        return bytes(out)
+
+    def stats(self) -> dict:
+        return {
+            'frames': self.frames,
+            'speech_frames': self.speech_frames,
+            'sent_frames': self.sent_frames,
+            'onsets': self.onsets,
+            'bytes_in': self.bytes_in,
+            'bytes_out': self.bytes_out,
+            'saved': 1 - self.bytes_out / self.bytes_in if self.bytes_in else 0.0,
+        }
+
+
+async def gate_audio(source: AsyncIterable[Tuple[Audio, float]],
+                     gate: Optional[VoiceGate]) -> AsyncIterator[Tuple[Audio, float]]:
+    """The ``(chunk, captured_at)`` pairs of source, with silence gated out (unchanged when gate is None)"""
+    async for chunk, captured_at in source:
+        if gate is not None:
+            chunk = gate.process(chunk)
+            if not chunk:
+                continue
+        yield chunk, captured_at
@@ -0,0 +1,77 @@
+"""
+Amazon Polly voice catalog cached on disk.
+
+``describe_voices`` is paginated; the catalog follows ``NextToken`` until the
+last page and stores the complete list per region, so later runs (of any demo
+script) start without a catalog round trip until the TTL expires.
+"""
+
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from . import CACHE_ROOT
+from .fileio import atomic_write_json, read_json
+
+
+DEFAULT_TTL = 24 * 60 * 60  # seconds
+CATALOG_DIR = CACHE_ROOT / 'voices'
+
+
+class VoiceCatalog:
+    """Complete Polly voice list for one region, served from a local copy"""
+
+    def __init__(self, client, region: Optional[str] = None, ttl: float = DEFAULT_TTL,
+                 cache_dir: Path = CATALOG_DIR):
+        self.client = client
+        self.region = region or client.meta.region_name
+        self.ttl = ttl
+        self.path = Path(cache_dir) / f'{self.region}.json'
+        self.from_cache = False
+        self._voices = None
+        self._lock = threading.Lock()
+
+    def voices(self, refresh: bool = False) -> List[Dict]:
+        """Return every voice in the region, fetching only when the cache is stale"""
+        with self._lock:
+            if self._voices is not None and not refresh:
+                return self._voices
+
+            cached = None if refresh else self._load()
+            if cached is not None:
+                self._voices, self.from_cache = cached, True
+            else:
+                self._voices, self.from_cache = self._fetch(), False
+                self._save(self._voices)
+            return self._voices
+
+    def _fetch(self) -> List[Dict]:
+        voices = []
+        kwargs = {}
+        while True:
+            response = self.client.describe_voices(**kwargs)
+            voices.extend(response['Voices'])
+            token = response.get('NextToken')
+            if not token:
+                return voices
+            kwargs['NextToken'] = token
+
+    def _load(self) -> Optional[List[Dict]]:
+        data = read_json(self.path)
+        if not data or data.get('region') != self.region:
+            return None
+        if time.time() - data.get('fetched_at', 0) > self.ttl:
+            return None
+        return data.get('voices')
+
+    def _save(self, voices: List[Dict]) -> None:
+        try:
+            atomic_write_json(self.path, {
+                'region': self.region,
+                'fetched_at': time.time(),
+                'voices': voices,
+            })
+        except OSError as e:
+            # the catalog still works in memory, it just won't survive the process
+            print(f"⚠️  Warning: Could not save voice catalog to {self.path}: {e}")
@@ -0,0 +1,100 @@
+"""
+In-memory index over the Polly voice catalog.
+
+``VoiceIndex`` turns the ``describe_voices`` list into one small record per
+voice and builds every lookup once: by engine, language name, language code,
+gender and any combination of them. ``find`` is then a single dict access
+instead of a scan of the whole catalog, however often a menu or a batch run
+asks. Results keep the catalog's order.
+"""
+
+from dataclasses import dataclass
+from itertools import product
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+@dataclass(frozen=True, slots=True)
+class Voice:
+    id: str
+    name: str
+    gender: str
+    language_code: str
+    language_name: str
+    engines: Tuple[str, ...]
+
+
+# language family of each Polly language code prefix, the part before the first '-'
+FAMILIES = {
+    'arb': 'Arabic', 'ar': 'Arabic', 'ca': 'Catalan', 'cmn': 'Chinese Mandarin', 'yue': 'Cantonese',
+    'cs': 'Czech', 'cy': 'Welsh', 'da': 'Danish', 'de': 'German', 'en': 'English', 'es': 'Spanish',
+    'fi': 'Finnish', 'fr': 'French', 'hi': 'Hindi', 'is': 'Icelandic', 'it': 'Italian', 'ja': 'Japanese',
+    'ko': 'Korean', 'nb': 'Norwegian', 'nl': 'Dutch', 'pl': 'Polish', 'pt': 'Portuguese', 'ro': 'Romanian',
+    'ru': 'Russian', 'sv': 'Swedish', 'tr': 'Turkish',
+}
+
+
+def language_family(voice: Voice) -> str:
+    """The language voice speaks a variant of: en-GB-WLS 'Welsh English' -> 'English', cy-GB 'Welsh' -> 'Welsh'
+
+    Languages missing from FAMILIES are their own family.
+    """
+    return FAMILIES.get(voice.language_code.split('-')[0], voice.language_name)
+
+
+Key = Tuple[Optional[str], Optional[str], Optional[str], Optional[str]]
+
+
+class VoiceIndex:
+    """Every voice of a catalog, with precomputed lookups for exact matches"""
+
+    def __init__(self, voices: Iterable[Dict]):
+        self.voices: Tuple[Voice, ...] = tuple(
+            Voice(id=v['Id'], name=v['Name'], gender=v['Gender'], language_code=v['LanguageCode'],
+                  language_name=v['LanguageName'], engines=tuple(v['SupportedEngines']))
+            for v in voices)
+        lookup: Dict[Key, List[Voice]] = {}
+        for voice in self.voices:
+            # None stands for "any", each voice is filed under every combination it matches
+            for key in product((None,) + voice.engines, (None, voice.language_name),
+                               (None, voice.language_code), (None, voice.gender)):
+                lookup.setdefault(key, []).append(voice)
+        self._lookup: Dict[Key, Tuple[Voice, ...]] = {key: tuple(v) for key, v in lookup.items()}
+        self._by_id = {voice.id: voice for voice in self.voices}
+        self._engines = sorted({engine for voice in self.voices for engine in voice.engines})
+        self._languages: Dict[Optional[str], Dict[str, Tuple[Voice, ...]]] = {}
+        for engine in [None] + self._engines:
+            names = dict.fromkeys(v.language_name for v in self._lookup.get((engine, None, None, None), ()))
+            self._languages[engine] = {name: self._lookup[(engine, name, None, None)] for name in names}
+        self._families: Dict[Tuple[Optional[str], str], Tuple[Voice, ...]] = {}
+
+    def __len__(self) -> int:
+        return len(self.voices)
+
+    def get(self, voice_id: str) -> Optional[Voice]:
+        return self._by_id.get(voice_id)
+
+    def engines(self) -> List[str]:
+        return list(self._engines)
+
+    def find(self, engine: Optional[str] = None, language_name: Optional[str] = None,
+             language_code: Optional[str] = None, gender: Optional[str] = None) -> Tuple[Voice, ...]:
+        """Voices matching every given field exactly, in catalog order"""
+        return self._lookup.get((engine, language_name, language_code, gender), ())
+
+    def by_language(self, engine: Optional[str] = None) -> Dict[str, Tuple[Voice, ...]]:
+        """Voices supporting engine (any engine if None) grouped by language name, in catalog order"""
+        return self._languages.get(engine, {})
+
+    def family(self, language: str, engine: Optional[str] = None) -> Tuple[Voice, ...]:
+        """Voices of language and its regional variants, e.g. 'English' covers 'US English' and 'British English'
+
+        A voice matches when its language name is language or its language code
+        belongs to that family (FAMILIES), so 'Welsh' does not pick up 'Welsh
+        English'. Resolved once per language, later calls are a dict access.
+        """
+        key = (engine, language)
+        voices = self._families.get(key)
+        if voices is None:
+            voices = tuple(v for v in self.find(engine) if language in (v.language_name, language_family(v)))
+            self._families[key] = voices
+        return voices
@@ -13,25 +13,53 @@ import os
 import sys
 import tempfile
 import subprocess
+from concurrent.futures import Future, ThreadPoolExecutor
 from pathlib import Path
 from typing import Dict, List, Optional, Tuple
 import boto3
 from botocore.exceptions import ClientError, NoCredentialsError
 
+# shared helpers live in the repository-level `common` package
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from common.audio_stream import StreamStats
+from common.clients import CLIENT_CONFIG
+from common.corpus import LanguageCorpus, to_ssml
+from common.long_text import MAX_CHUNK_CHARS, synthesize_long
+from common.synth_cache import SynthesisCache, request_key
+from common.throttle import THROTTLING_CODES, throttled
+from common.voice_catalog import VoiceCatalog
+from common.voice_index import Voice, VoiceIndex
+
+
+# Start synthesizing as soon as voice and text are chosen, while the summary is read.
+# Declined requests still cost Polly characters, set to False to synthesize only on 'y'
+PRESYNTHESIZE = True
+
 
 class PollyDemo:
     def __init__(self):
         self.client = None
-        self.voices_data = {}
+        self.catalog = None
+        self.index = VoiceIndex([])
         self.languages_dir = Path("./languages")
+        self.corpus = None
         self.temp_dir = Path(tempfile.gettempdir())
+        self.cache = SynthesisCache()
+        # one background synthesis at a time, only the latest selection matters
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='presynthesize')
+        self.pending: Optional[Tuple[str, Future]] = None   # (request key, future)
         
     def initialize_client(self) -> bool:
         """Initialize AWS Polly client"""
         try:
-            self.client = boto3.Session(region_name='us-east-1').client('polly')
-            # Test connection with a simple call
-            self.client.describe_voices()
+            session = boto3.Session(region_name='us-east-1')
+            # Check credentials locally, the voice catalog may not need a network call
+            if session.get_credentials() is None:
+                raise NoCredentialsError()
+            # throttled and transient calls are retried with backoff instead of failing
+            # straight away, botocore's own retries are off (CLIENT_CONFIG) so they don't nest
+            self.client = throttled(session.client('polly', config=CLIENT_CONFIG), 'polly')
+            self.catalog = VoiceCatalog(self.client)
             return True
         except NoCredentialsError:
             print("❌ AWS credentials not found. Please configure your AWS credentials.")
@@ -44,22 +72,12 @@ class PollyDemo:
         """Load available voices from AWS Polly"""
         try:
             print("🔄 Loading available voices...")
-            response = self.client.describe_voices()
-            
-            for voice in response['Voices']:
-                lang_name = voice['LanguageName']
-                if lang_name not in self.voices_data:
-                    self.voices_data[lang_name] = []
-                
-                self.voices_data[lang_name].append({
-                    'id': voice['Id'],
-                    'name': voice['Name'],
-                    'gender': voice['Gender'],
-                    'engines': voice['SupportedEngines'],
-                    'language_code': voice['LanguageCode']
-                })
+            voices = self.catalog.voices()
+            # every menu below is a lookup in this index, built once
+            self.index = VoiceIndex(voices)
             
-            print(f"✅ Loaded {len(response['Voices'])} voices in {len(self.voices_data)} languages")
+            source = " (cached)" if self.catalog.from_cache else ""
+            print(f"✅ Loaded {len(voices)} voices in {len(self.index.by_language())} languages{source}")
             return True
         except Exception as e:
             print(f"❌ Failed to load voices: {e}")
@@ -67,11 +85,7 @@ class PollyDemo:
     
     def get_available_engines(self) -> List[str]:
         """Get all available engines from loaded voices"""
-        engines = set()
-        for voices in self.voices_data.values():
-            for voice in voices:
-                engines.update(voice['engines'])
-        return sorted(list(engines))
+        return self.index.engines()
     
     def select_engine(self) -> Optional[str]:
         """Let user select voice engine"""
@@ -102,16 +116,11 @@ class PollyDemo:
             except ValueError:
                 print("❌ Please enter a valid number")
     
-    def get_voices_for_engine(self, engine: str) -> Dict[str, List]:
+    def get_voices_for_engine(self, engine: str) -> Dict[str, Tuple[Voice, ...]]:
         """Get voices that support the selected engine"""
-        filtered_voices = {}
-        for lang_name, voices in self.voices_data.items():
-            lang_voices = [v for v in voices if engine in v['engines']]
-            if lang_voices:
-                filtered_voices[lang_name] = lang_voices
-        return filtered_voices
+        return self.index.by_language(engine)
     
-    def select_language_and_voice(self, engine: str) -> Optional[Tuple[str, Dict]]:
+    def select_language_and_voice(self, engine: str) -> Optional[Tuple[str, Voice]]:
         """Let user select language and voice"""
         available_voices = self.get_voices_for_engine(engine)
         
@@ -146,7 +155,7 @@ class PollyDemo:
         voices = available_voices[selected_lang]
         print(f"\n🎤 Available Voices for {selected_lang}:")
         for i, voice in enumerate(voices, 1):
-            print(f"  {i}. {voice['name']} ({voice['gender']}) - {voice['id']}")
+            print(f"  {i}. {voice.name} ({voice.gender}) - {voice.id}")
         
         # Select voice
         while True:
@@ -164,22 +173,10 @@ class PollyDemo:
                 print("❌ Please enter a valid number")
     
     def get_sample_texts(self) -> Dict[str, str]:
-        """Load sample texts from languages directory"""
-        samples = {}
-        if not self.languages_dir.exists():
-            return samples
-        
-        for file_path in self.languages_dir.glob("*.txt"):
-            try:
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    content = f.read().strip()
-                    if content:
-                        lang_name = file_path.stem
-                        samples[lang_name] = content
-            except Exception as e:
-                print(f"⚠️  Warning: Could not read {file_path}: {e}")
-        
-        return samples
+        """Sample texts from the languages directory, files are only reread when they change"""
+        if self.corpus is None or self.corpus.directory != self.languages_dir:
+            self.corpus = LanguageCorpus(self.languages_dir)
+        return {name: entry.text for name, entry in self.corpus.entries().items() if entry.text}
     
     def select_text_content(self, language: str) -> Optional[str]:
         """Let user select text content"""
@@ -236,30 +233,75 @@ class PollyDemo:
             else:
                 print("❌ Please select a valid option")
     
+    def speech_request(self, text: str, voice_id: str, language_code: str, engine: str) -> Dict:
+        """Polly parameters for text spoken by voice_id"""
+        # Wrap text in SSML if it's not already, escaping characters SSML would reject
+        if not text.strip().startswith('<speak>'):
+            ssml_text = to_ssml(text)
+        else:
+            ssml_text = text
+        
+        return {
+            'VoiceId': voice_id,
+            'LanguageCode': language_code,
+            'OutputFormat': 'mp3',
+            'Text': ssml_text,
+            'TextType': 'ssml',
+            'Engine': engine
+        }
+    
+    def render(self, params: Dict) -> Tuple[Path, StreamStats]:
+        """Synthesize params into a temporary file, returning its path and the StreamStats"""
+        # Named after the request, a background job for another text never writes the same file
+        temp_file = self.temp_dir / f"polly_demo_{params['VoiceId']}_{params['Engine']}_{request_key(params)[:12]}.mp3"
+        if len(params['Text']) > MAX_CHUNK_CHARS:
+            # Split long text at sentence boundaries and synthesize the parts in parallel
+            stats = synthesize_long(self.client, params, temp_file, self.cache)
+        else:
+            # repeated requests come from the local cache
+            stats = self.cache.synthesize_to_file(self.client, params, temp_file)
+        return temp_file, stats
+    
+    def presynthesize(self, text: str, voice_id: str, language_code: str, engine: str) -> None:
+        """Start synthesizing in the background, replacing any earlier selection"""
+        self.discard_pending()
+        params = self.speech_request(text, voice_id, language_code, engine)
+        self.pending = (request_key(params), self.executor.submit(self.render, params))
+    
+    def discard_pending(self) -> None:
+        if self.pending is not None:
+            # a job that already started finishes into the synthesis cache unused
+            self.pending[1].cancel()
+            self.pending = None
+    
     def synthesize_speech(self, text: str, voice_id: str, language_code: str, engine: str) -> Optional[str]:
         """Synthesize speech and return path to audio file"""
         try:
             print("🔄 Generating speech...")
+            params = self.speech_request(text, voice_id, language_code, engine)
             
-            # Wrap text in SSML if it's not already
-            if not text.strip().startswith('<speak>'):
-                ssml_text = f'<speak>\n\t{text}\n</speak>'
+            # Use the background synthesis of this request, if there is one
+            future = None
+            if self.pending is not None and self.pending[0] == request_key(params):
+                future = self.pending[1]
+                self.pending = None
             else:
-                ssml_text = text
-            
-            response = self.client.synthesize_speech(
-                VoiceId=voice_id,
-                LanguageCode=language_code,
-                OutputFormat='mp3',
-                Text=ssml_text,
-                TextType='ssml',
-                Engine=engine
-            )
-            
-            # Save to temporary file
-            temp_file = self.temp_dir / f"polly_demo_{voice_id}_{engine}.mp3"
-            with open(temp_file, 'wb') as f:
-                f.write(response['AudioStream'].read())
+                self.discard_pending()
+            if future is not None and future.cancel():
+                # still queued behind a stale job that is rendering, don't wait for that one
+                future = None
+            if len(params['Text']) > MAX_CHUNK_CHARS:
+                print("✂️  Long text, synthesizing in parts...")
+            if future is not None and future.done():
+                print("⚡ Ready before you confirmed")
+            if future is not None:
+                temp_file, stats = future.result()
+            else:
+                temp_file, stats = self.render(params)
+            if stats.cached:
+                print("💾 Using cached audio")
+            else:
+                print(f"📦 {stats.bytes / 1024:.0f}KB, first byte after {(stats.first_byte or 0) * 1000:.0f}ms")
             
             print("✅ Speech generated successfully!")
             return str(temp_file)
@@ -270,6 +312,8 @@ class PollyDemo:
                 print("❌ Invalid parameter. Please check your text content.")
             elif error_code == 'TextLengthExceededException':
                 print("❌ Text is too long. Please use shorter text.")
+            elif error_code in THROTTLING_CODES:
+                print("❌ Polly is still throttling after several retries, please try again in a moment.")
             else:
                 print(f"❌ AWS Error: {e}")
             return None
@@ -367,6 +411,8 @@ class PollyDemo:
         
         if not self.load_voices():
             return
+        # read the sample texts now, the text menu then lists them without file reads
+        self.get_sample_texts()
         
         try:
             while True:
@@ -389,20 +435,25 @@ class PollyDemo:
                 if text is None:
                     continue
                 
+                if PRESYNTHESIZE:
+                    # voice and text are known, the audio is usually ready by the time it's confirmed
+                    self.presynthesize(text, voice.id, voice.language_code, engine)
+                
                 # Show summary
                 print(f"\n📋 Summary:")
                 print(f"   Engine: {engine}")
                 print(f"   Language: {language}")
-                print(f"   Voice: {voice['name']} ({voice['gender']})")
+                print(f"   Voice: {voice.name} ({voice.gender})")
                 print(f"   Text: {text[:100]}{'...' if len(text) > 100 else ''}")
                 
                 confirm = input("\n🎯 Generate and play? (y/n): ").strip().lower()
                 if confirm != 'y':
+                    self.discard_pending()
                     continue
                 
                 # Generate speech
                 audio_file = self.synthesize_speech(
-                    text, voice['id'], voice['language_code'], engine
+                    text, voice.id, voice.language_code, engine
                 )
                 
                 if audio_file:
@@ -418,6 +469,9 @@ class PollyDemo:
         except KeyboardInterrupt:
             print("\n\n👋 Demo interrupted by user")
         finally:
+            # let a running background synthesis finish, so its file is cleaned up too
+            self.discard_pending()
+            self.executor.shutdown(wait=True, cancel_futures=True)
             self.cleanup_temp_files()
             print("🧹 Cleaned up temporary files")
             print("👋 Thanks for using Amazon Polly Demo!")
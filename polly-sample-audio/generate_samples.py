@@ -1,7 +1,24 @@
-from os import listdir
-from os.path import isfile, join
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from itertools import chain, zip_longest
 from pathlib import Path
 import boto3
+from botocore.config import Config
+
+# shared helpers live in the repository-level `common` package
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from common.audio_stream import StreamStats, stream_to_file
+from common.corpus import LanguageCorpus
+from common.long_text import MAX_CHUNK_CHARS, synthesize_long
+from common.synth_cache import SynthesisCache, request_key
+from common.throttle import default_controller, throttled
+from common.voice_catalog import VoiceCatalog
+from common.voice_index import VoiceIndex
+from run_manifest import DONE, FAILED, RunManifest
+from synthesis_tasks import S3TaskBackend, TaskScheduler
 
 
 DEMO_REGION = 'us-east-1'
@@ -22,6 +39,22 @@ ENGINES = ['standard', 'neural', 'generative', 'long-form']
 # us-east-1, eu-central-1, us-west-2: ENGINES = ['standard', 'neural', 'generative']
 # Only us-east-1: ENGINES = ['standard', 'neural', 'generative', 'long-form']
 
+# Size of the synthesis worker pool (set to 1 for the old serial behaviour)
+MAX_WORKERS = 8
+
+# Per-engine cap on in-flight requests, premium engines have lower TPS quotas
+ENGINE_CONCURRENCY = {
+    'standard': 8,
+    'neural': 8,
+    'generative': 4,
+    'long-form': 2,
+}
+
+# Asynchronous synthesis tasks render server-side and write to S3, set a bucket in
+# DEMO_REGION to send these engines (and any text over the request limit) that way
+TASK_BUCKET = None
+TASK_ENGINES = ['long-form']
+
 
 def print_engine_info():
     """Print information about the engines being used"""
@@ -56,81 +89,186 @@ def ensure_required_path(inputs):
     for engine in ENGINES:
         Path(f"{required_path}/{engine}").mkdir(parents=True, exist_ok=True)
 
-def define_data(client, inputs, engine, data):
+def define_data(index, languages, engine, data):
     data[engine] = {}
-    lang_path = inputs['languages_path']
-    lang = [f for f in listdir(lang_path) if isfile(join(lang_path, f))]
-
-    larr = []
-    [larr.append(l.replace(inputs['languages_file_ext'], '')) for l in lang]
-
-    voices = client.describe_voices()
-    for voice in larr:
-        for vdata in voices['Voices']:
-            if engine in vdata['SupportedEngines'] and voice in vdata['LanguageName']:
-
-                vd = data[engine].get(voice)
-                if vd:
-                    vd.append({
-                        'LanguageCode': vdata['LanguageCode'],
-                        'VoiceId': vdata['Id']
-                    })
-                else:
-                    data[engine][voice] = [{
-                        'LanguageCode': vdata['LanguageCode'],
-                        'VoiceId': vdata['Id']
-                    }]
-
-
-def synthesize_speech_mp3(client, inputs):
-    kwargs = inputs['kwargs']
-    response = client.synthesize_speech(**kwargs)
+    for lan in languages:
+        # a sample file serves every variant of its language, 'English' covers 'US English',
+        # 'British English', ...; the index resolves that once and then looks up exactly
+        voices = index.family(lan, engine)
+        if voices:
+            data[engine][lan] = [{'LanguageCode': v.language_code, 'VoiceId': v.id} for v in voices]
+
 
+def synthesize_speech_mp3(client, inputs, cache=None):
+    kwargs = inputs['kwargs']
     file_path = inputs['mp3_file_path']
-    file = open(file_path, 'wb')
-    file.write(response['AudioStream'].read())
-    file.close()
+    # write next to the target and rename, an interrupted run never leaves a truncated file
+    part_path = f'{file_path}.part'
+
+    try:
+        if len(kwargs['Text']) > MAX_CHUNK_CHARS:
+            # long samples are split, synthesized in parallel and joined
+            stats = synthesize_long(client, kwargs, part_path, cache)
+        elif cache is not None:
+            # identical requests from earlier runs are copied from the local cache
+            stats = cache.synthesize_to_file(client, kwargs, part_path)
+        else:
+            started = time.perf_counter()
+            response = client.synthesize_speech(**kwargs)
+            stats = stream_to_file(response['AudioStream'], part_path, started=started)
+    except BaseException:
+        if os.path.exists(part_path):
+            os.remove(part_path)
+        raise
 
+    os.replace(part_path, file_path)
+    return stats
+
+
+def plan_jobs(inputs, data, samples):
+    jobs = []
+    for engine in inputs['engines']:
+        for lan in data[engine]:
+            if lan not in samples:
+                continue
+            text = samples[lan].ssml
+            for voice in data[engine][lan]:
+                path = f'{inputs["audio_dest"]}/{engine}/{lan}-{voice["LanguageCode"]}-{voice["VoiceId"]}.{inputs["OutputFormat"]}'
+                kwargs = {
+                    'VoiceId': voice["VoiceId"],
+                    'LanguageCode': voice["LanguageCode"],
+                    'OutputFormat': inputs["OutputFormat"],
+                    'Text': text,
+                    'TextType': inputs['TextType'],
+                    'Engine': engine,
+                }
+                jobs.append({
+                    'engine': engine,
+                    'mp3_file_path': path,
+                    'kwargs': kwargs,
+                    'hash': request_key(kwargs),
+                })
+    return jobs
 
-def read_file_to_xml(file_path):
-    with open(file_path, 'r', encoding='utf-8') as file:
-        data = file.read()
-        file.close()
 
-    return f'<speak>\n\t{data}\n</speak>'
+def interleave_engines(jobs):
+    # round-robin across engines so workers don't all queue on one capped engine
+    by_engine = {}
+    for job in jobs:
+        by_engine.setdefault(job['engine'], []).append(job)
+    return [job for job in chain.from_iterable(zip_longest(*by_engine.values())) if job]
 
 
 def run(client, inputs):
+    # every request waits for its engine's adaptive rate limit and throttled ones are
+    # retried, so the batch runs close to the account's quota without failing jobs
+    client = throttled(client, 'polly')
+    # every sample file is read once, not once per engine
+    samples = LanguageCorpus(inputs['languages_path'], inputs['languages_file_ext']).entries()
     data = {}
 
-    for engine in inputs['engines']:
+    if inputs['gen_data']:
+        # one catalog fetch (or cache hit) serves every engine
+        index = VoiceIndex(VoiceCatalog(client).voices())
+        for engine in inputs['engines']:
+            define_data(index, samples, engine, data)
 
-        if inputs['gen_data']:
-            define_data(client, inputs, engine, data)
+    jobs = plan_jobs(inputs, data, samples)
+    manifest = RunManifest(inputs['manifest_path']) if inputs.get('manifest_path') else None
+    if manifest is not None:
+        planned = len(jobs)
+        jobs = manifest.plan(jobs)
+        print(f'📋 {planned - len(jobs)} of {planned} files already done, {len(jobs)} to synthesize\n')
 
-    for engine in inputs['engines']:
+    backend = inputs.get('task_backend')
+    task_jobs = []
+    if backend is not None:
+        task_engines = inputs.get('task_engines', TASK_ENGINES)
+        as_task = [j['engine'] in task_engines or len(j['kwargs']['Text']) > MAX_CHUNK_CHARS for j in jobs]
+        task_jobs = [j for j, t in zip(jobs, as_task) if t]
+        jobs = [j for j, t in zip(jobs, as_task) if not t]
 
-        count = 0
-        for lan in data[engine]:
-            for voice in data[engine][lan]:
-                path_in = f'{inputs["languages_path"]}/{lan}.txt'
-                text = read_file_to_xml(path_in)
-                path = f'{inputs["audio_dest"]}/{engine}/{lan}-{voice["LanguageCode"]}-{voice["VoiceId"]}.{inputs["OutputFormat"]}'
-                print(f'synthesizing: {path}')
-                synthesize_speech_mp3(client, {
-                    'mp3_file_path': path,
-                    'kwargs': {
-                        'VoiceId': voice["VoiceId"],
-                        'LanguageCode': voice["LanguageCode"],
-                        'OutputFormat': inputs["OutputFormat"],
-                        'Text': text,
-                        'TextType': inputs['TextType'],
-                        'Engine': engine,
-                    }
-                })
-                count += 1
+    cache = inputs.get('cache')
+    workers = inputs.get('workers', MAX_WORKERS)
+    limits = inputs.get('engine_concurrency', ENGINE_CONCURRENCY)
+    # one semaphore per engine caps in-flight requests below the pool size
+    slots = {engine: threading.Semaphore(limits.get(engine, workers)) for engine in inputs['engines']}
+
+    counts = {engine: 0 for engine in inputs['engines']}
+    failed = 0
+    chars = 0
+    audio_bytes = 0
+    first_bytes = []
+    lock = threading.Lock()
+
+    def record(job, stats=None, error=None):
+        nonlocal failed, chars, audio_bytes
+        with lock:
+            if error is not None:
+                # keep going, the next run retries only the failed jobs
+                print(f'❌ failed: {job["mp3_file_path"]}: {error}')
+                failed += 1
+                if manifest is not None:
+                    manifest.mark(job, FAILED, error=str(error))
+                return
+            counts[job['engine']] += 1
+            chars += len(job['kwargs']['Text'])
+            audio_bytes += stats.bytes
+            if not stats.cached and stats.first_byte is not None:
+                first_bytes.append(stats.first_byte)
+            if manifest is not None:
+                manifest.mark(job, DONE, bytes=stats.bytes)
+
+    def synthesize_job(job):
+        with slots[job['engine']]:
+            print(f'synthesizing: {job["mp3_file_path"]}')
+            try:
+                stats = synthesize_speech_mp3(client, job, cache)
+            except Exception as e:
+                if manifest is None:
+                    raise
+                record(job, error=e)
+                return
+        record(job, stats)
+
+    def task_done(job, error):
+        if error is not None:
+            record(job, error=error)
+        else:
+            record(job, StreamStats(bytes=os.path.getsize(job['mp3_file_path'])))
+
+    started = time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=workers) as executor, ThreadPoolExecutor(max_workers=1) as scheduler:
+        if task_jobs:
+            print(f'📨 submitting {len(task_jobs)} synthesis tasks')
+            tasks = scheduler.submit(TaskScheduler(backend).run, task_jobs, task_done)
+        futures = [executor.submit(synthesize_job, job) for job in interleave_engines(jobs)]
+        for future in as_completed(futures):
+            future.result()
+        if task_jobs:
+            tasks.result()
+
+    elapsed = time.perf_counter() - started
+
+    for engine in inputs['engines']:
+        print(f'\nsynthesized {counts[engine]} audio files for engine: {engine}\n')
 
-        print(f'\nsynthesized {count} audio files for engine: {engine}\n\n')
+    total = sum(counts.values())
+    if elapsed > 0:
+        print(f'⏱️  {total} files in {elapsed:.1f}s '
+              f'({total / elapsed:.2f} files/s, {chars / elapsed:.0f} chars/s, {workers} workers)')
+        ttfb = f', avg time to first byte {sum(first_bytes) / len(first_bytes) * 1000:.0f}ms' if first_bytes else ''
+        print(f'📦 {audio_bytes / 1024 / 1024:.1f}MB of audio{ttfb}\n')
+    for name, limiter in default_controller().stats().items():
+        if limiter['throttled'] or limiter['retried']:
+            print(f'🚦 {name}: {limiter["throttled"]} throttled, {limiter["retried"]} retried, '
+                  f'settled at {limiter["rate"]} requests/s and {limiter["concurrency"]} in flight')
+    if cache is not None:
+        stats = cache.stats()
+        print(f'💾 cache: {stats["hits"]} hits, {stats["misses"]} misses, {stats["evictions"]} evictions\n')
+    if failed:
+        print(f'⚠️  {failed} files failed, run the script again to retry them\n')
 
 
 if __name__ == "__main__":
@@ -145,10 +283,24 @@ if __name__ == "__main__":
         'engine': 'standard',
         'engines': ENGINES,
         'audio_dest': AUDIO_OUTPUT,
+        # progress of the run, reruns skip files that are already done
+        'manifest_path': f'{AUDIO_OUTPUT}/manifest.json',
         'OutputFormat': 'mp3',
-        'TextType': 'ssml'
+        'TextType': 'ssml',
+        'workers': MAX_WORKERS,
+        'engine_concurrency': ENGINE_CONCURRENCY,
+        # set to None to always call Polly
+        'cache': SynthesisCache(),
     }
 
-    client = boto3.Session(region_name=DEMO_REGION).client('polly')
+    # boto3 clients are thread-safe, size the connection pool to match the workers
+    # throttling and transient errors are retried by common.throttle, botocore's own retries would hide them
+    client = boto3.Session(region_name=DEMO_REGION).client(
+        'polly', config=Config(max_pool_connections=MAX_WORKERS,
+                               retries={'mode': 'standard', 'total_max_attempts': 1}))
+    if TASK_BUCKET:
+        s3 = boto3.Session(region_name=DEMO_REGION).client('s3')
+        inputs['task_backend'] = S3TaskBackend(throttled(client, 'polly'), s3, TASK_BUCKET)
+        inputs['task_engines'] = TASK_ENGINES
     ensure_required_path(inputs)
     run(client, inputs)
@@ -0,0 +1,65 @@
+"""
+Run manifest for generate_samples.py.
+
+Records every planned output file with the hash of the request that produces it
+and whether it finished. A rerun only executes jobs that are missing, failed or
+stale (request changed or output file gone).
+"""
+
+import os
+import threading
+import time
+from pathlib import Path
+
+from common.fileio import atomic_write_json, read_json
+
+
+PENDING = 'pending'
+DONE = 'done'
+FAILED = 'failed'
+
+
+class RunManifest:
+    def __init__(self, path):
+        self.path = Path(path)
+        data = read_json(self.path, default={})
+        self.jobs = data.get('jobs', {})
+        self._lock = threading.Lock()
+
+    def needs_run(self, output_path, input_hash):
+        """True unless the job finished with the same input and its file still exists"""
+        entry = self.jobs.get(output_path)
+        if not entry or entry['state'] != DONE or entry['hash'] != input_hash:
+            return True
+        return not os.path.exists(output_path)
+
+    def plan(self, jobs):
+        """Record planned jobs and return the ones that still have to run"""
+        todo = []
+        with self._lock:
+            for job in jobs:
+                path, input_hash = job['mp3_file_path'], job['hash']
+                if self.needs_run(path, input_hash):
+                    self.jobs[path] = {'hash': input_hash, 'state': PENDING, 'updated_at': time.time()}
+                    todo.append(job)
+            self._save()
+        return todo
+
+    def mark(self, job, state, **extra):
+        with self._lock:
+            self.jobs[job['mp3_file_path']] = {
+                'hash': job['hash'],
+                'state': state,
+                'updated_at': time.time(),
+                **extra,
+            }
+            self._save()
+
+    def counts(self):
+        counts = {PENDING: 0, DONE: 0, FAILED: 0}
+        for entry in self.jobs.values():
+            counts[entry['state']] = counts.get(entry['state'], 0) + 1
+        return counts
+
+    def _save(self):
+        atomic_write_json(self.path, {'updated_at': time.time(), 'jobs': self.jobs})
@@ -0,0 +1,227 @@
+"""
+Asynchronous synthesis for generate_samples.py.
+
+Jobs are submitted with StartSpeechSynthesisTask so Polly renders them
+server-side, a single scheduler thread polls their status with exponential
+backoff, and finished outputs are downloaded in bulk on a small thread pool.
+The task API and the object store sit behind a backend, ``LocalTaskBackend``
+stands in for both when testing without AWS.
+"""
+
+import os
+import shutil
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import unquote, urlparse
+
+
+COMPLETED = 'completed'
+FAILED = 'failed'
+
+# Polly lists at most 100 tasks per page
+LIST_PAGE_SIZE = 100
+# status polls in a row that may fail before every outstanding job is given up
+POLL_ATTEMPTS = 5
+
+
+class S3TaskBackend:
+    """Polly synthesis tasks writing to an S3 bucket"""
+
+    def __init__(self, polly, s3, bucket, prefix='polly-samples/', delete_after_fetch=True):
+        self.polly = polly
+        self.s3 = s3
+        self.bucket = bucket
+        self.prefix = prefix
+        self.delete_after_fetch = delete_after_fetch
+        self._tasks = {}    # task_id -> (CreationTime, OutputUri) as Polly reported them
+        self._lock = threading.Lock()
+
+    def start(self, params):
+        response = self.polly.start_speech_synthesis_task(
+            OutputS3BucketName=self.bucket,
+            OutputS3KeyPrefix=self.prefix,
+            **params
+        )
+        task = response['SynthesisTask']
+        self._remember(task)
+        return task['TaskId']
+
+    def _remember(self, task):
+        with self._lock:
+            created, uri = self._tasks.get(task['TaskId'], (None, None))
+            self._tasks[task['TaskId']] = (task.get('CreationTime') or created, task.get('OutputUri') or uri)
+
+    def statuses(self, task_ids):
+        """Return {task_id: (status, reason)}, one list call covers up to 100 tasks"""
+        wanted = set(task_ids)
+        found = {}
+        with self._lock:
+            created = [self._tasks.get(task_id, (None, None))[0] for task_id in wanted]
+        # the list is newest first, pages older than every outstanding task can't hold one of them
+        oldest = min(created) if created and None not in created else None
+        kwargs = {'MaxResults': LIST_PAGE_SIZE}
+        while wanted - found.keys():
+            response = self.polly.list_speech_synthesis_tasks(**kwargs)
+            tasks = response['SynthesisTasks']
+            for task in tasks:
+                if task['TaskId'] in wanted:
+                    self._remember(task)
+                    found[task['TaskId']] = (task['TaskStatus'], task.get('TaskStatusReason'))
+            kwargs['NextToken'] = response.get('NextToken')
+            if not kwargs['NextToken']:
+                break
+            if oldest is not None and tasks and tasks[-1].get('CreationTime') and tasks[-1]['CreationTime'] < oldest:
+                break
+        # anything not listed (e.g. just created) is looked up directly
+        for task_id in wanted - found.keys():
+            task = self.polly.get_speech_synthesis_task(TaskId=task_id)['SynthesisTask']
+            self._remember(task)
+            found[task_id] = (task['TaskStatus'], task.get('TaskStatusReason'))
+        return found
+
+    def fetch(self, task_id, params, dest):
+        with self._lock:
+            uri = self._tasks.get(task_id, (None, None))[1]
+        if uri is None:
+            uri = self.polly.get_speech_synthesis_task(TaskId=task_id)['SynthesisTask']['OutputUri']
+        # Polly picks the extension (.ogg for ogg_vorbis, .marks for json), use its URI as is
+        bucket, key = parse_s3_uri(uri)
+        self.s3.download_file(bucket, key, str(dest))
+        if self.delete_after_fetch:
+            self.s3.delete_object(Bucket=bucket, Key=key)
+        with self._lock:
+            self._tasks.pop(task_id, None)
+
+
+def parse_s3_uri(uri):
+    """(bucket, key) of an s3:// URI or a path-style or virtual-hosted S3 HTTPS URL"""
+    parsed = urlparse(uri)
+    path = unquote(parsed.path).lstrip('/')
+    if parsed.scheme == 's3':
+        return parsed.netloc, path
+    host = parsed.netloc.split(':')[0]
+    if host.startswith('s3.') or host.startswith('s3-') or host == 's3.amazonaws.com':
+        bucket, _, key = path.partition('/')
+        return bucket, key
+    # virtual-hosted: <bucket>.s3.<region>.amazonaws.com/<key>
+    return host.split('.s3', 1)[0], path
+
+
+class LocalTaskBackend:
+    """Runs tasks with synthesize_speech on local threads and keeps outputs in a directory"""
+
+    def __init__(self, client, root, workers=16):
+        self.client = client
+        self.root = root
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        self.tasks = {}
+        os.makedirs(root, exist_ok=True)
+
+    def start(self, params):
+        task_id = uuid.uuid4().hex
+        path = os.path.join(self.root, f"{task_id}.{params['OutputFormat']}")
+        self.tasks[task_id] = self.executor.submit(self._synthesize, params, path)
+        return task_id
+
+    def _synthesize(self, params, path):
+        response = self.client.synthesize_speech(**params)
+        with open(path, 'wb') as f:
+            shutil.copyfileobj(response['AudioStream'], f)
+
+    def statuses(self, task_ids):
+        found = {}
+        for task_id in task_ids:
+            future = self.tasks[task_id]
+            if not future.done():
+                found[task_id] = ('inProgress', None)
+            elif future.exception() is not None:
+                found[task_id] = (FAILED, str(future.exception()))
+            else:
+                found[task_id] = (COMPLETED, None)
+        return found
+
+    def fetch(self, task_id, params, dest):
+        shutil.move(os.path.join(self.root, f"{task_id}.{params['OutputFormat']}"), dest)
+
+
+class TaskScheduler:
+    """Keeps up to max_in_flight tasks running server-side and collects their outputs"""
+
+    def __init__(self, backend, max_in_flight=100, poll_initial=1.0, poll_max=30.0,
+                 poll_factor=1.5, download_workers=8, poll_attempts=POLL_ATTEMPTS):
+        self.backend = backend
+        self.poll_attempts = poll_attempts
+        self.max_in_flight = max_in_flight
+        self.poll_initial = poll_initial
+        self.poll_max = poll_max
+        self.poll_factor = poll_factor
+        self.download_workers = download_workers
+
+    def run(self, jobs, on_done):
+        """Run every job, calling on_done(job, error) when its file is in place (error is None on success)
+
+        When polling fails poll_attempts times in a row, every job not finished
+        yet gets on_done(job, error) with the last error.
+        """
+        pending = deque(jobs)
+        in_flight = {}
+        delay = self.poll_initial
+        poll_errors = 0
+        lock = threading.Lock()
+
+        def download(task_id, job):
+            part_path = f"{job['mp3_file_path']}.part"
+            try:
+                self.backend.fetch(task_id, job['kwargs'], part_path)
+                os.replace(part_path, job['mp3_file_path'])
+            except Exception as e:
+                with lock:
+                    on_done(job, e)
+                return
+            with lock:
+                on_done(job, None)
+
+        with ThreadPoolExecutor(max_workers=self.download_workers) as downloads:
+            while pending or in_flight:
+                while pending and len(in_flight) < self.max_in_flight:
+                    job = pending.popleft()
+                    try:
+                        in_flight[self.backend.start(job['kwargs'])] = job
+                    except Exception as e:
+                        with lock:
+                            on_done(job, e)
+                if not in_flight:
+                    continue
+
+                time.sleep(delay)
+                try:
+                    statuses = self.backend.statuses(list(in_flight))
+                except Exception as e:
+                    poll_errors += 1
+                    if poll_errors < self.poll_attempts:
+                        delay = min(delay * self.poll_factor, self.poll_max)
+                        continue
+                    # the tasks may still finish server-side, but we can no longer tell
+                    outstanding = list(in_flight.values()) + list(pending)
+                    in_flight.clear()
+                    pending.clear()
+                    with lock:
+                        for job in outstanding:
+                            on_done(job, e)
+                    break
+                poll_errors = 0
+                finished = 0
+                for task_id, (status, reason) in statuses.items():
+                    if status == COMPLETED:
+                        downloads.submit(download, task_id, in_flight.pop(task_id))
+                        finished += 1
+                    elif status == FAILED:
+                        job = in_flight.pop(task_id)
+                        with lock:
+                            on_done(job, RuntimeError(reason or 'synthesis task failed'))
+                        finished += 1
+                # back off while nothing changes, poll quickly again once tasks start finishing
+                delay = self.poll_initial if finished else min(delay * self.poll_factor, self.poll_max)
@@ -0,0 +1,102 @@
+import asyncio
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from common.capture import DROP_NEWEST, DROP_OLDEST, CaptureRing, ring_for
+
+
+def chunk(i, size=4):
+    return bytes([i]) * size
+
+
+async def drain(ring):
+    """Bytes of every chunk left in ring, copied before the next get() reuses the slot"""
+    ring.close()
+    chunks = []
+    while (item := await ring.get()) is not None:
+        chunks.append(bytes(item[0]))
+    return chunks
+
+
+def test_drop_oldest_keeps_the_newest_chunks():
+    ring = CaptureRing(4, 3, DROP_OLDEST, late_after=None)
+    for i in range(5):
+        ring.write(chunk(i))
+    assert asyncio.run(drain(ring)) == [chunk(2), chunk(3), chunk(4)]
+    assert ring.stats() == {'captured': 5, 'dropped': 2, 'late': 0, 'device_overflows': 0,
+                            'depth': 0, 'max_depth_seen': 3, 'slots': 3}
+
+
+def test_drop_newest_keeps_what_was_captured():
+    ring = CaptureRing(4, 3, DROP_NEWEST, late_after=None)
+    for i in range(5):
+        ring.write(chunk(i), overflow=i == 4)
+    assert asyncio.run(drain(ring)) == [chunk(0), chunk(1), chunk(2)]
+    assert (ring.captured, ring.dropped, ring.device_overflows) == (5, 2, 1)
+
+
+def test_the_slot_being_read_is_not_overwritten():
+    async def main():
+        ring = CaptureRing(4, 2, DROP_OLDEST, late_after=None)
+        ring.write(chunk(0))
+        view, _ = await ring.get()
+        for i in range(1, 4):
+            ring.write(chunk(i))
+        held = bytes(view)
+        return held, await drain(ring)
+
+    held, rest = asyncio.run(main())
+    assert held == chunk(0)
+    assert rest == [chunk(3)]
+
+
+def test_long_blocks_are_truncated_to_the_slot():
+    ring = CaptureRing(4, 2, late_after=None)
+    ring.write(b'abcdefgh')
+    ring.write(b'xy')
+    assert asyncio.run(drain(ring)) == [b'abcd', b'xy']
+
+
+def test_late_chunks_are_counted():
+    ring = CaptureRing(4, 2, late_after=0.5)
+    ring.write(chunk(0), captured_at=time.perf_counter() - 1)
+    ring.write(chunk(1))
+    asyncio.run(drain(ring))
+    assert ring.late == 1
+
+
+def test_writes_from_another_thread_wake_the_consumer():
+    async def main():
+        ring = CaptureRing(4, 4, DROP_NEWEST, late_after=None, loop=asyncio.get_running_loop())
+
+        def audio_thread():
+            for i in range(20):
+                ring.write(chunk(i))
+                time.sleep(0.002)
+            ring.close()
+
+        thread = threading.Thread(target=audio_thread)
+        thread.start()
+        received = []
+        while (item := await asyncio.wait_for(ring.get(), 5)) is not None:
+            received.append(bytes(item[0]))
+        thread.join()
+        return ring, received
+
+    ring, received = asyncio.run(main())
+    assert received == [chunk(i) for i in range(20)]
+    assert ring.dropped == 0
+
+
+def test_invalid_arguments():
+    with pytest.raises(ValueError):
+        CaptureRing(4, 2, policy='drop_all')
+    with pytest.raises(ValueError):
+        CaptureRing(4, 1)
+    ring = ring_for(16000, 1, 1024, capacity=1.0)
+    assert (ring.chunk_bytes, ring.slots) == (2048, 16)
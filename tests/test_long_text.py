@@ -0,0 +1,59 @@
+import io
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from common.long_text import split_text, synthesize_long
+
+
+class FakePolly:
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.calls = 0
+
+    def synthesize_speech(self, **params):
+        self.calls += 1
+        time.sleep(self.delay)
+        return {'AudioStream': io.BytesIO(params['Text'].encode())}
+
+
+def test_markup_only_text_raises_a_clear_error(tmp_path):
+    text = '<speak>' + '<break time="1s"/>' * 200 + '</speak>'
+    assert split_text(text, 1000) == []
+    polly = FakePolly()
+    with pytest.raises(ValueError, match='nothing to synthesize'):
+        synthesize_long(polly, {'Text': text, 'TextType': 'ssml'}, tmp_path / 'out.mp3', max_chars=1000)
+    assert polly.calls == 0
+
+
+def test_chunks_are_joined_in_order(tmp_path):
+    text = ' '.join(f'Sentence {i}.' for i in range(100))
+    dest = tmp_path / 'out.mp3'
+    stats = synthesize_long(FakePolly(), {'Text': text, 'TextType': 'text'}, dest, max_chars=200, max_workers=1)
+    audio = dest.read_bytes().decode()
+    assert audio.replace(' ', '') == text.replace(' ', '')
+    assert stats.bytes == len(audio)
+
+
+def test_first_byte_is_timed_from_the_call(tmp_path):
+    text = ' '.join(f'Sentence {i}.' for i in range(100))
+    # includes the service latency of the first chunk and everything before its request
+    stats = synthesize_long(FakePolly(delay=0.05), {'Text': text, 'TextType': 'text'}, tmp_path / 'out.mp3',
+                            max_chars=200, max_workers=1)
+    assert 0.05 <= stats.first_byte <= stats.elapsed
+
+
+@pytest.mark.parametrize('tail', [
+    '<break time="3s"/>',
+    '<break time="3s"/><p>Tail here.</p>',
+    '<break time="3s"/><p>' + 'word ' * 60 + 'end.</p>',
+], ids=['at-the-end', 'before-a-sentence', 'before-an-oversized-sentence'])
+def test_markup_at_a_chunk_edge_is_kept(tail):
+    for sentences in range(5, 40):
+        text = '<speak><p>' + ' '.join(f'Sentence number {i}.' for i in range(sentences)) + '</p>' + tail + '</speak>'
+        chunks = split_text(text, 200)
+        assert all(len(chunk) <= 200 for chunk in chunks)
+        assert sum(chunk.count('<break time="3s"/>') for chunk in chunks) == 1, sentences
@@ -0,0 +1,81 @@
+import sys
+import threading
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent / 'text-translate-speech'))
+from modules.playback import MERGE, PlaybackQueue
+
+
+class Speaker:
+    """play() for a PlaybackQueue that records what it spoke and can be held up"""
+
+    def __init__(self, fail=False):
+        self.spoken = []
+        self.played = []
+        self.gate = threading.Event()
+        self.gate.set()
+        self.fail = fail
+
+    def play(self, text, stop):
+        self.gate.wait(5)
+        if self.fail:
+            raise RuntimeError('no sound card')
+        self.spoken.append(text)
+        return text
+
+    def on_played(self, first_seq, last_seq, result):
+        self.played.append((first_seq, last_seq, result))
+
+
+def test_out_of_order_put_and_merge():
+    speaker = Speaker()
+    speaker.gate.clear()
+    queue = PlaybackQueue(speaker.play, max_depth=2, policy=MERGE, on_played=speaker.on_played, log=lambda _: None)
+    seqs = [queue.reserve() for _ in range(6)]
+    queue.put(seqs[0], 's0')
+    while not queue._playing:
+        time.sleep(0.001)
+    # translations finish out of order while s0 is being spoken
+    for seq in (3, 1, 2, 5, 4):
+        queue.put(seqs[seq], f's{seq}')
+    speaker.gate.set()
+    assert queue.wait_idle(5)
+
+    assert speaker.spoken == ['s0', 's1 s2 s3 s4 s5']
+    assert [(first, last) for first, last, _ in speaker.played] == [(0, 0), (1, 5)]
+    assert queue.merged == 4
+    # merged sequence numbers are covered by the merged entry, nothing is left behind
+    assert queue._skipped == set()
+    queue.close()
+
+
+def test_skips_behind_the_play_position_are_pruned():
+    speaker = Speaker()
+    queue = PlaybackQueue(speaker.play, on_played=speaker.on_played)
+    seqs = [queue.reserve() for _ in range(3)]
+    queue.skip(seqs[1])
+    queue.put(seqs[0], 's0')
+    queue.put(seqs[2], 's2')
+    assert queue.wait_idle(5)
+    assert speaker.spoken == ['s0', 's2']
+    assert queue._skipped == set()
+    queue.close()
+
+
+def test_stale_and_failed_sentences_are_reported():
+    speaker = Speaker()
+    queue = PlaybackQueue(speaker.play, max_lag=1.0, on_played=speaker.on_played)
+    queue.put(queue.reserve(), 'late', created_at=time.monotonic() - 2)
+    assert queue.wait_idle(5)
+    assert speaker.played == [(0, 0, None)]
+    assert queue.stale == 1
+    queue.close()
+
+    failing = Speaker(fail=True)
+    queue = PlaybackQueue(failing.play, on_played=failing.on_played, log=lambda _: None)
+    queue.put(queue.reserve(), 'broken')
+    assert queue.wait_idle(5)
+    assert failing.played == [(0, 0, None)]
+    assert queue.played == 0
+    queue.close()
@@ -0,0 +1,102 @@
+import sys
+import threading
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip('boto3')
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+sys.path.append(str(Path(__file__).resolve().parent.parent / 'text-translate-speech'))
+from modules import speculation
+from modules.pipeline import Target
+from modules.speculation import Speculator, stable_prefix
+
+
+def partial(result_id, transcript, tokens, stable_count):
+    """A partial result whose first stable_count items (tokens) are stable"""
+    items = [SimpleNamespace(content=token, stable=i < stable_count) for i, token in enumerate(tokens)]
+    return SimpleNamespace(result_id=result_id, alternatives=[SimpleNamespace(transcript=transcript, items=items)])
+
+
+TOKENS = ['Hello', 'everyone', '.', 'Welcome', 'to', 'the', 'show', '.']
+TEXT = 'Hello everyone. Welcome to the show.'
+
+
+def test_stable_prefix_ends_at_the_last_stable_sentence_end():
+    assert stable_prefix(partial('r', TEXT, TOKENS, 2)) is None
+    assert stable_prefix(partial('r', TEXT, TOKENS, 3)) == 'Hello everyone.'
+    assert stable_prefix(partial('r', TEXT, TOKENS, 7)) == 'Hello everyone.'
+    assert stable_prefix(partial('r', TEXT, TOKENS, 8)) == TEXT
+
+
+def test_stable_prefix_without_spaces():
+    tokens = ['大家好', '，', '欢迎', '参加', '。', '今天', '的']
+    assert stable_prefix(partial('r', '大家好，欢迎参加。今天的', tokens, 6)) == '大家好，欢迎参加。'
+
+
+@pytest.fixture
+def speculator(monkeypatch):
+    translated = []
+    release = threading.Event()
+    release.set()
+
+    def translate(region, text, source, target):
+        release.wait(5)
+        translated.append(text)
+        return text.upper()
+
+    monkeypatch.setattr(speculation, 'translate_txt', translate)
+    monkeypatch.setattr(speculation, 'polly_prefetch', lambda *args: None)
+    spec = Speculator('us-east-1', 'en-US', [Target('fr-FR', 'Lea')], log=lambda _: None)
+    spec.translated, spec.release = translated, release
+    yield spec
+    spec.release.set()
+    spec.executor.shutdown(wait=True)
+
+
+def test_each_stable_sentence_is_speculated_once(speculator):
+    speculator.on_partial(partial('r1', TEXT, TOKENS, 3))
+    speculator.on_partial(partial('r1', TEXT, TOKENS, 5))     # nothing new ends a sentence
+    speculator.on_partial(partial('r1', TEXT, TOKENS, 8))
+    for _, futures in speculator.segments:
+        futures[0].result(5)
+    segments = speculator.take(TEXT)
+    assert [text for text, _ in segments] == ['Hello everyone.', 'Welcome to the show.']
+    assert [futures[0].result() for _, futures in segments] == ['HELLO EVERYONE.', 'WELCOME TO THE SHOW.']
+    assert speculator.reused == 1
+
+
+def test_the_rest_of_the_final_is_returned_unspeculated(speculator):
+    speculator.on_partial(partial('r1', TEXT, TOKENS, 3))
+    speculator.segments[0][1][0].result(5)
+    segments = speculator.take('Hello  everyone. Welcome to the show!')
+    assert [text for text, _ in segments] == ['Hello everyone.', 'Welcome to the show!']
+    assert segments[1][1] is None
+    assert segments[0][1][0].result() == 'HELLO EVERYONE.'
+
+
+def test_a_revised_final_discards_the_speculation(speculator):
+    speculator.on_partial(partial('r1', TEXT, TOKENS, 3))
+    assert speculator.take('Hello everybody. Welcome to the show.') is None
+    assert speculator.discarded == 1
+
+
+def test_a_new_result_discards_the_old_speculation(speculator):
+    speculator.on_partial(partial('r1', TEXT, TOKENS, 3))
+    speculator.on_partial(partial('r2', 'Good night.', ['Good', 'night', '.'], 3))
+    assert speculator.discarded == 1
+    assert [text for text, _ in speculator.take('Good night.')] == ['Good night.']
+
+
+def test_a_speculation_not_started_yet_is_translated_inline(speculator):
+    speculator.release.clear()
+    speculator.on_partial(partial('r1', TEXT, TOKENS, 3))
+    while not speculator.segments[0][1][0].running():
+        pass
+    speculator.on_partial(partial('r1', TEXT, TOKENS, 8))
+    segments = speculator.take(TEXT)
+    # the first sentence is running, the second still queued behind it
+    assert segments[0][1][0] is not None
+    assert segments[1][1] == [None]
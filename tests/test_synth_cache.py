@@ -0,0 +1,50 @@
+import io
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from common.synth_cache import SynthesisCache
+
+
+PARAMS = {'Text': 'hello', 'VoiceId': 'Joanna', 'Engine': 'neural', 'OutputFormat': 'mp3'}
+
+
+class FakePolly:
+    def __init__(self):
+        self.calls = 0
+
+    def synthesize_speech(self, **params):
+        self.calls += 1
+        return {'AudioStream': io.BytesIO(params['Text'].encode())}
+
+
+class EvictingCache(SynthesisCache):
+    """Another writer evicts the blob right after every lookup"""
+
+    def lookup(self, params):
+        path = super().lookup(params)
+        if path is not None:
+            path.unlink()
+        return path
+
+
+def test_hit_then_miss(tmp_path):
+    cache = SynthesisCache(tmp_path / 'cache')
+    polly = FakePolly()
+    cache.synthesize_to_file(polly, PARAMS, tmp_path / 'a.mp3')
+    stats = cache.synthesize_to_file(polly, PARAMS, tmp_path / 'b.mp3')
+    assert stats.cached
+    assert polly.calls == 1
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert (tmp_path / 'b.mp3').read_bytes() == b'hello'
+
+
+def test_blob_evicted_after_lookup_counts_as_a_miss(tmp_path):
+    cache = EvictingCache(tmp_path / 'cache')
+    cache.store(PARAMS, b'hello')
+    polly = FakePolly()
+    stats = cache.synthesize_to_file(polly, PARAMS, tmp_path / 'out.mp3')
+    assert not stats.cached
+    assert polly.calls == 1
+    assert (cache.hits, cache.misses) == (0, 1)
+    assert (tmp_path / 'out.mp3').read_bytes() == b'hello'
@@ -0,0 +1,133 @@
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip('botocore')
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from botocore.exceptions import ClientError, EndpointConnectionError
+from botocore.stub import Stubber
+
+from common import throttle
+from common.throttle import AdaptiveLimiter, Limit, RateController, TokenBucket, throttled
+
+
+def client_error(code, status=400):
+    return ClientError({'Error': {'Code': code, 'Message': code},
+                        'ResponseMetadata': {'HTTPStatusCode': status}}, 'SynthesizeSpeech')
+
+
+class Flaky:
+    """Raises the given errors in turn, then returns 'ok'"""
+
+    def __init__(self, *errors):
+        self.errors = list(errors)
+        self.calls = 0
+
+    def __call__(self, **kwargs):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return 'ok'
+
+
+def controller(attempts=6):
+    return RateController(limits={('polly', None): Limit(rate=1000, concurrency=8)},
+                          attempts=attempts, base_delay=0, max_delay=0)
+
+
+def test_token_bucket_allows_a_burst_then_paces():
+    bucket = TokenBucket(rate=10, burst=2)
+    assert bucket.take() == 0
+    assert bucket.take() == 0
+    assert bucket.take() == pytest.approx(0.1, abs=0.02)
+    assert bucket.saturated
+
+
+@pytest.mark.parametrize('error', [
+    client_error('ThrottlingException'),
+    client_error('ServiceUnavailableException', 503),
+    client_error('SomethingUnlisted', 502),
+    EndpointConnectionError(endpoint_url='https://polly.us-east-1.amazonaws.com'),
+], ids=['throttled', 'transient-code', 'bare-5xx', 'transport'])
+def test_retryable_errors_are_retried(error):
+    rc = controller()
+    fn = Flaky(error, error)
+    assert rc.call('polly', None, fn) == 'ok'
+    assert fn.calls == 3
+    assert rc.limiter('polly').retried == 2
+
+
+def test_non_transient_error_is_raised_at_once():
+    rc = controller()
+    fn = Flaky(client_error('ValidationException'))
+    with pytest.raises(ClientError):
+        rc.call('polly', None, fn)
+    assert fn.calls == 1
+    assert rc.limiter('polly').retried == 0
+
+
+def test_retries_give_up_after_the_last_attempt():
+    rc = controller(attempts=3)
+    fn = Flaky(*[client_error('ThrottlingException')] * 5)
+    with pytest.raises(ClientError):
+        rc.call('polly', None, fn)
+    assert fn.calls == 3
+
+
+def test_throttling_decreases_once_per_cooldown(monkeypatch):
+    limiter = AdaptiveLimiter(Limit(rate=100, concurrency=8))
+    limiter.on_throttled()
+    limiter.on_throttled()      # same burst, within the cooldown
+    assert limiter.throttled == 2
+    assert limiter.window == 4
+    assert limiter.bucket.rate == 50
+    assert limiter.max_rate == 100
+
+    monkeypatch.setattr(throttle, 'COOLDOWN', 0.0)
+    limiter.on_throttled()
+    assert limiter.window == 2
+    assert limiter.bucket.rate == 25
+
+
+def test_slot_keeps_in_flight_within_the_window():
+    limiter = AdaptiveLimiter(Limit(rate=1000, concurrency=2, max_concurrency=2))
+    in_flight, peak = 0, 0
+    lock = threading.Lock()
+
+    def work():
+        nonlocal in_flight, peak
+        with limiter.slot():
+            with lock:
+                in_flight += 1
+                peak = max(peak, in_flight)
+            time.sleep(0.01)
+            with lock:
+                in_flight -= 1
+
+    threads = [threading.Thread(target=work) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert peak <= 2
+    assert limiter.calls == 8
+    assert limiter.in_flight == 0
+
+
+def test_client_calls_and_paginators_go_through_the_controller():
+    boto3 = pytest.importorskip('boto3')
+    raw = boto3.client('polly', region_name='us-east-1', aws_access_key_id='x', aws_secret_access_key='x')
+    rc = controller()
+    client = throttled(raw, 'polly', rc)
+    voice = {'Id': 'Joanna', 'Name': 'Joanna', 'Gender': 'Female', 'LanguageCode': 'en-US',
+             'LanguageName': 'US English', 'SupportedEngines': ['neural']}
+    with Stubber(raw) as stub:
+        stub.add_response('describe_voices', {'Voices': [voice], 'NextToken': 'page2'}, {})
+        stub.add_response('describe_voices', {'Voices': [voice]}, {'NextToken': 'page2'})
+        pages = list(client.get_paginator('describe_voices').paginate())
+    assert len(pages) == 2
+    assert rc.limiter('polly').calls == 2
@@ -0,0 +1,24 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip('boto3')
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+sys.path.append(str(Path(__file__).resolve().parent.parent / 'text-translate-speech'))
+from modules import translate
+from modules.translate_cache import TranslationCache
+
+
+def test_segments_with_line_breaks_are_batched(monkeypatch):
+    requests = []
+
+    def request(region, text, source, target):
+        requests.append(text)
+        return '\n'.join(line.upper() for line in text.split('\n'))
+
+    monkeypatch.setattr(translate, '_cache', TranslationCache())
+    monkeypatch.setattr(translate, '_request', request)
+    assert translate.translate_batch('us-east-1', ['first\nline', 'second'], 'en', 'fr') == ['FIRST LINE', 'SECOND']
+    assert requests == ['first line\nsecond']
@@ -0,0 +1,57 @@
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent / 'text-translate-speech'))
+from modules.translate_cache import TranslationCache, normalize
+
+
+def test_normalize_collapses_whitespace_and_unicode_forms():
+    assert normalize('  hello \n  world\t') == 'hello world'
+    # full-width letters and the compatibility ligature fold into their plain forms
+    assert normalize('ｈｅｌｌｏ ﬁne') == 'hello fine'
+
+
+def test_trivial_variants_share_an_entry():
+    cache = TranslationCache()
+    cache.put('hello  world', 'en', 'fr', 'bonjour le monde')
+    assert cache.get(' hello\nworld ', 'en', 'fr') == 'bonjour le monde'
+    assert cache.get('hello world', 'en', 'de') is None
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_memory_lru_evicts_the_least_recently_used():
+    cache = TranslationCache(capacity=2)
+    cache.put('a', 'en', 'fr', 'A')
+    cache.put('b', 'en', 'fr', 'B')
+    assert cache.get('a', 'en', 'fr') == 'A'     # b is now the oldest
+    cache.put('c', 'en', 'fr', 'C')
+    assert cache.evictions == 1
+    assert cache.get('b', 'en', 'fr') is None
+    assert cache.get('a', 'en', 'fr') == 'A'
+    assert cache.get('c', 'en', 'fr') == 'C'
+
+
+def test_translations_persist_across_instances(tmp_path):
+    path = tmp_path / 'translations.sqlite3'
+    TranslationCache(path=path).put('good morning', 'en', 'ja', 'おはようございます')
+
+    cache = TranslationCache(path=path)
+    assert cache.get('good  morning', 'en', 'ja') == 'おはようございます'
+    assert cache.disk_hits == 1
+    # the disk hit is now in memory too
+    assert cache.get('good morning', 'en', 'ja') == 'おはようございます'
+    assert cache.hits == 1
+
+
+def test_disk_is_trimmed_to_the_most_recently_used(tmp_path):
+    path = tmp_path / 'translations.sqlite3'
+    cache = TranslationCache(capacity=1, path=path, disk_capacity=10)
+    for i in range(20):
+        cache.put(f'text {i}', 'en', 'fr', f'texte {i}')
+    cache.flush()
+
+    reopened = TranslationCache(path=path)
+    rows = reopened._db.execute('SELECT COUNT(*) FROM translations').fetchone()[0]
+    assert rows <= 10
+    assert reopened.get('text 19', 'en', 'fr') == 'texte 19'
+    assert reopened.get('text 0', 'en', 'fr') is None
@@ -0,0 +1,43 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+np = pytest.importorskip('numpy')
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from common.vad import COMPRESS, VoiceGate
+
+
+def _signal(gate, pattern, seed=0):
+    """16-bit PCM frames, loud for True and faint noise for False, each frame's index in its first sample"""
+    rng = np.random.default_rng(seed)
+    t = np.arange(gate.frame_samples)
+    frames = []
+    for i, speech in enumerate(pattern):
+        if speech:
+            frame = (8000 * np.sin(2 * np.pi * 440 * t / 16000)).astype(np.int16)
+        else:
+            frame = rng.integers(-10, 10, gate.frame_samples, dtype=np.int16)
+        frame[0] = i
+        frames.append(frame)
+    return np.concatenate(frames).tobytes()
+
+
+def _indices(gate, data):
+    frames = np.frombuffer(data, dtype=np.int16).reshape(-1, gate.frame_samples)
+    return frames[:, 0].tolist()
+
+
+def test_compress_keeps_frames_in_order():
+    gate = VoiceGate(silence=COMPRESS)
+    pattern = [False] * 100 + [True] * 40 + [False] * 100 + [True] * 40 + [False] * 20
+    data = _signal(gate, pattern)
+    chunk = gate.frame_bytes * 16
+    out = b''.join(gate.process(data[i:i + chunk]) for i in range(0, len(data), chunk))
+
+    sent = _indices(gate, out)
+    assert gate.onsets == 2
+    assert sent == sorted(set(sent)), 'frames sent out of order or twice'
+    # every speech frame gets through
+    assert {i for i, speech in enumerate(pattern) if speech} <= set(sent)
@@ -0,0 +1,98 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from common.voice_index import VoiceIndex
+
+
+# every (LanguageCode, LanguageName) Polly offers, with the sample file it belongs to
+POLLY_LANGUAGES = [
+    ('arb', 'Arabic', 'Arabic'),
+    ('ar-AE', 'Gulf Arabic', 'Arabic'),
+    ('ca-ES', 'Catalan', 'Catalan'),
+    ('cmn-CN', 'Chinese Mandarin', 'Chinese Mandarin'),
+    ('yue-CN', 'Chinese Cantonese', 'Cantonese'),
+    ('cs-CZ', 'Czech', 'Czech'),
+    ('cy-GB', 'Welsh', 'Welsh'),
+    ('da-DK', 'Danish', 'Danish'),
+    ('de-AT', 'Austrian German', 'German'),
+    ('de-CH', 'Swiss Standard German', 'German'),
+    ('de-DE', 'German', 'German'),
+    ('en-AU', 'Australian English', 'English'),
+    ('en-GB', 'British English', 'English'),
+    ('en-GB-WLS', 'Welsh English', 'English'),
+    ('en-IE', 'Irish English', 'English'),
+    ('en-IN', 'Indian English', 'English'),
+    ('en-NZ', 'New Zealand English', 'English'),
+    ('en-SG', 'Singaporean English', 'English'),
+    ('en-US', 'US English', 'English'),
+    ('en-ZA', 'South African English', 'English'),
+    ('es-ES', 'Castilian Spanish', 'Spanish'),
+    ('es-MX', 'Mexican Spanish', 'Spanish'),
+    ('es-US', 'US Spanish', 'Spanish'),
+    ('fi-FI', 'Finnish', 'Finnish'),
+    ('fr-BE', 'Belgian French', 'French'),
+    ('fr-CA', 'Canadian French', 'French'),
+    ('fr-FR', 'French', 'French'),
+    ('hi-IN', 'Hindi', 'Hindi'),
+    ('is-IS', 'Icelandic', 'Icelandic'),
+    ('it-IT', 'Italian', 'Italian'),
+    ('ja-JP', 'Japanese', 'Japanese'),
+    ('ko-KR', 'Korean', 'Korean'),
+    ('nb-NO', 'Norwegian', 'Norwegian'),
+    ('nl-BE', 'Belgian Dutch (Flemish)', 'Dutch'),
+    ('nl-NL', 'Dutch', 'Dutch'),
+    ('pl-PL', 'Polish', 'Polish'),
+    ('pt-BR', 'Brazilian Portuguese', 'Portuguese'),
+    ('pt-PT', 'Portuguese', 'Portuguese'),
+    ('ro-RO', 'Romanian', 'Romanian'),
+    ('ru-RU', 'Russian', 'Russian'),
+    ('sv-SE', 'Swedish', 'Swedish'),
+    ('tr-TR', 'Turkish', 'Turkish'),
+]
+
+
+def _voice(voice_id, language_name, language_code, engines=('standard', 'neural')):
+    return {'Id': voice_id, 'Name': voice_id, 'Gender': 'Female', 'LanguageCode': language_code,
+            'LanguageName': language_name, 'SupportedEngines': list(engines)}
+
+
+CATALOG = VoiceIndex([_voice(code, name, code) for code, name, _ in POLLY_LANGUAGES])
+
+
+def _ids(voices):
+    return [v.id for v in voices]
+
+
+@pytest.mark.parametrize('family', sorted({family for _, _, family in POLLY_LANGUAGES}))
+def test_every_polly_language_maps_to_its_family(family):
+    expected = [code for code, _, f in POLLY_LANGUAGES if f == family]
+    assert _ids(CATALOG.family(family)) == expected
+
+
+def test_every_sample_file_finds_voices():
+    samples = Path(__file__).resolve().parent.parent / 'polly-sample-audio' / 'languages'
+    for path in samples.glob('*.txt'):
+        assert CATALOG.family(path.stem), path.stem
+
+
+def test_family_does_not_match_a_variant_named_after_the_language():
+    assert _ids(CATALOG.family('Welsh')) == ['cy-GB']
+    assert CATALOG.family('Chinese') == ()
+
+
+def test_family_filters_by_engine_in_catalog_order():
+    index = VoiceIndex([
+        _voice('Joanna', 'US English', 'en-US'),
+        _voice('Geraint', 'Welsh English', 'en-GB-WLS', ('standard',)),
+        _voice('Amy', 'British English', 'en-GB', ('neural',)),
+    ])
+    assert _ids(index.family('English')) == ['Joanna', 'Geraint', 'Amy']
+    assert _ids(index.family('English', 'neural')) == ['Joanna', 'Amy']
+
+
+def test_an_unknown_language_is_its_own_family():
+    index = VoiceIndex([_voice('Kahless', 'Klingon', 'tlh-QO')])
+    assert _ids(index.family('Klingon')) == ['Kahless']
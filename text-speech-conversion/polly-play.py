@@ -1,29 +1,42 @@
 # The dependency of the project can be installed with pip:
-# `pip install pydub`
+# `pip install pydub sounddevice`
 import boto3
 from botocore.exceptions import BotoCoreError, ClientError
 from contextlib import closing
 import os
 import sys
+import time
+from pathlib import Path
 from tempfile import gettempdir
-from pydub import AudioSegment
-from pydub.playback import play
+
+# shared helpers live in the repository-level `common` package
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from common.clients import CLIENT_CONFIG
+from common.pcm_playback import SAMPLE_RATE, play_pcm_stream
+from common.throttle import throttled
 
 
 # Setup up demo region
 DEMO_REGION = 'cn-northwest-1'
 READ_CHUNK = 1024
 
+# True: request pcm and play it while it downloads (no temp file, no ffmpeg)
+# False: save an mp3 to a temp file and play it with pydub
+STREAM_PCM = True
+
 REPLYTXT="Amazon Polly 使用深度学习技术来合成听起来自然的人类语音，让您可以将文章转换为语音。"
 
 
-polly = boto3.client('polly', region_name=DEMO_REGION)
+# a throttled or transient failure is retried with backoff, only other errors end the script
+polly = throttled(boto3.client('polly', region_name=DEMO_REGION, config=CLIENT_CONFIG), 'polly')
 
+started = time.perf_counter()
 try:
     response = polly.synthesize_speech(
         Text=REPLYTXT, 
         # Support format: mp3, pcm, ogg_vorbis, json
-        OutputFormat='mp3',
+        OutputFormat='pcm' if STREAM_PCM else 'mp3',
+        **({'SampleRate': str(SAMPLE_RATE)} if STREAM_PCM else {}),
         VoiceId='Zhiyu',
         Engine='standard'
         # Engine='neural'
@@ -32,23 +45,32 @@ except (BotoCoreError, ClientError) as error:
     print(error)
     sys.exit(-1)
 
-# Access the audio stream from the response
-if "AudioStream" in response:
-        with closing(response["AudioStream"]) as stream:
-            output = os.path.join(gettempdir(), "polly-speech.mp3")
-            try:
-            # Open a file for writing the output as a binary stream
-                with open(output, "wb") as file:
-                    file.write(stream.read())
-            except IOError as error:
-            # Could not write to file, exit gracefully
-                print(error)
-                sys.exit(-1)
-else:
+if "AudioStream" not in response:
     # The response didn't contain audio data, exit gracefully
     print("Could not stream audio")
     sys.exit(-1)
 
+if STREAM_PCM:
+    # Samples go to the sound card as soon as the first chunk arrives
+    stats = play_pcm_stream(response["AudioStream"], started=started)
+    print(f'played {stats.bytes / (SAMPLE_RATE * 2):.1f}s of audio in {stats.elapsed:.1f}s')
+    sys.exit(0)
+
+from pydub import AudioSegment
+from pydub.playback import play
+
+# Access the audio stream from the response
+with closing(response["AudioStream"]) as stream:
+    output = os.path.join(gettempdir(), "polly-speech.mp3")
+    try:
+    # Open a file for writing the output as a binary stream
+        with open(output, "wb") as file:
+            file.write(stream.read())
+    except IOError as error:
+    # Could not write to file, exit gracefully
+        print(error)
+        sys.exit(-1)
+
 
 sound = AudioSegment.from_file(output, 'mp3')
 
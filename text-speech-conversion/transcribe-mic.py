@@ -1,13 +1,20 @@
-# This example uses the sounddevice library to get an audio stream from the microphone. 
+# This example uses the sounddevice library to get an audio stream from the microphone,
+# or streams WAV/PCM recordings given on the command line (`python transcribe-mic.py --help`).
 # The dependency of the project can be installed with pip:
 # `pip install amazon-transcribe sounddevice`
+import argparse
 import asyncio
-import os
-import sounddevice
+import sys
+from pathlib import Path
 from amazon_transcribe.client import TranscribeStreamingClient
 from amazon_transcribe.handlers import TranscriptResultStreamHandler
 from amazon_transcribe.model import TranscriptEvent
 
+# shared helpers live in the repository-level `common` package
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from common.audio_sources import MicSource, open_source
+from common.transcript_render import build_renderer
+
 
 # Setup up demo region
 DEMO_REGION = 'cn-northwest-1'
@@ -26,6 +33,14 @@ CHANNEL_NUMS = 1
 AUDIO_PATH = 'output-audio/test.mp3'
 BYTES_PER_SAMPLE = 2
 
+# Besides the terminal, transcripts can go to a JSON-lines log and an .srt/.vtt caption file
+TRANSCRIPT_JSONL = None     # e.g. 'output-transcripts/session.jsonl'
+CAPTION_FILE = None         # e.g. 'output-transcripts/session.srt'
+
+# Hold back silence instead of streaming it (needs numpy): None sends everything,
+# 'compress' sends pauses shortened, 'suppress' sends only speech
+VOICE_GATE = None
+
 
 """
 Here's an example of a custom event handler you can extend to process
@@ -33,54 +48,35 @@ the returned transcription results as needed.
 This handler will simply print the text out to your interpreter.
 """
 class MyEventHandler(TranscriptResultStreamHandler):
+    def __init__(self, transcript_result_stream, renderer):
+        super().__init__(transcript_result_stream)
+        self.renderer = renderer
+
     async def handle_transcript_event(self, transcript_event: TranscriptEvent):
         # This handler can be implemented to handle transcriptions as needed.        
         results = transcript_event.transcript.results
         for result in results:
+            if not result.alternatives:
+                continue
+            # the current segment is redrawn in place, each final ends with a mark
+            text = result.alternatives[0].transcript
             if result.is_partial:
-                for alt in result.alternatives:
-                    #'​clear​' for Linux&Mac
-                    os.system('cls')
-                    print(alt.transcript)
+                self.renderer.partial(text, result_id=result.result_id)
             else:
-                # add a mark for each segment end
-                print('🔚')
-
+                self.renderer.final(text, result_id=result.result_id,
+                                    start=result.start_time, end=result.end_time)
 
 
-async def mic_stream():
-    # This function wraps the raw input stream from the microphone forwarding
-    # the blocks to an asyncio.Queue.
-    loop = asyncio.get_event_loop()
-    input_queue = asyncio.Queue()
 
-    def callback(indata, frame_count, time_info, status):
-        loop.call_soon_threadsafe(input_queue.put_nowait, (bytes(indata), status))
-
-    stream = sounddevice.RawInputStream(
-        channels=CHANNEL_NUMS,
-        samplerate=SAMPLE_RATE,
-        blocksize=CHUNK_SIZE,
-        callback=callback,
-        dtype="int16",
-    )
-    # Initiate the audio stream and asynchronously yield the audio chunks
-    # as they become available.
-    with stream:
-        while True:
-            indata, status = await input_queue.get()
-            yield indata, status
-
-
-async def write_chunks(stream):
-    # This connects the raw audio chunks generator coming from the microphone
-    # and passes them along to the transcription stream.
-    async for chunk, status in mic_stream():
+async def write_chunks(stream, source):
+    # This connects the raw audio chunks coming from the microphone (or a
+    # recording) and passes them along to the transcription stream.
+    async for chunk, captured_at in source:
         await stream.input_stream.send_audio_event(audio_chunk=chunk)
     await stream.input_stream.end_stream()
 
 
-async def basic_transcribe():
+async def basic_transcribe(source, caption_file=CAPTION_FILE):
     client = TranscribeStreamingClient(region=DEMO_REGION)
 
     # Start transcription to generate async stream
@@ -91,10 +87,56 @@ async def basic_transcribe():
     )
 
     # Instantiate our handler and start processing events
-    handler = MyEventHandler(stream.output_stream)
-    await asyncio.gather(write_chunks(stream), handler.handle_events())
-
-
-loop = asyncio.get_event_loop()
-loop.run_until_complete(basic_transcribe())
-loop.close()
+    renderer = build_renderer(TRANSCRIPT_JSONL, caption_file, final_suffix=' 🔚')
+    handler = MyEventHandler(stream.output_stream, renderer)
+    try:
+        await asyncio.gather(write_chunks(stream, source), handler.handle_events())
+    finally:
+        renderer.close()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Live transcription with Amazon Transcribe')
+    parser.add_argument('inputs', nargs='*',
+                        help=f'{SAMPLE_RATE}Hz 16-bit mono WAV or raw PCM files to transcribe, '
+                             f'"-" for stdin (default: the microphone)')
+    parser.add_argument('--speed', type=float, default=None,
+                        help='pace for recordings: 1 is real time (the default for files), 4 four times '
+                             'faster, 0 as fast as the service accepts (the default for stdin)')
+    parser.add_argument('--captions', action='store_true',
+                        help='write an .srt file next to each input file')
+    parser.add_argument('--vad', choices=('compress', 'suppress'), default=VOICE_GATE,
+                        help='hold back silence: send pauses shortened or not at all (needs numpy)')
+    return parser.parse_args()
+
+
+async def transcribe_source(source, mode=None, caption_file=CAPTION_FILE):
+    if not mode:
+        await basic_transcribe(source, caption_file)
+        return
+    from common.vad import VoiceGate, gate_audio
+    gate = VoiceGate(SAMPLE_RATE, CHANNEL_NUMS, mode)
+    try:
+        await basic_transcribe(gate_audio(source, gate), caption_file)
+    finally:
+        stats = gate.stats()
+        print(f"🤫 voice gate: {stats['onsets']} speech onsets, {stats['saved']:.0%} of the audio not sent")
+
+
+async def main():
+    args = parse_args()
+    if not args.inputs:
+        await transcribe_source(MicSource(SAMPLE_RATE, CHANNEL_NUMS, CHUNK_SIZE), args.vad)
+        return
+    # recordings are transcribed one after another, each in its own stream
+    for spec in args.inputs:
+        print(f'📄 {"stdin" if spec == "-" else spec}')
+        speed = args.speed if args.speed is not None or spec == '-' else 1.0
+        source = open_source(spec, speed, sample_rate=SAMPLE_RATE, channels=CHANNEL_NUMS,
+                             chunk_frames=CHUNK_SIZE)
+        captions = Path(spec).with_suffix('.srt') if args.captions and spec != '-' else CAPTION_FILE
+        await transcribe_source(source, args.vad, captions)
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
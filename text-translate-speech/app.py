@@ -1,11 +1,19 @@
-import os
+import sys
 import asyncio
-import sounddevice
+from pathlib import Path
 from amazon_transcribe.handlers import TranscriptResultStreamHandler
 from amazon_transcribe.model import TranscriptEvent
 from amazon_transcribe.client import TranscribeStreamingClient
-from modules.polly import polly_play
-from modules.translate import translate_txt
+
+# shared helpers live in the repository-level `common` package
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from common.audio_sources import MicSource
+from common.clients import warm_up
+from common.transcript_render import build_renderer
+from modules.metrics import CaptureClock, LatencyRecorder
+from modules.pipeline import InterpretationPipeline
+from modules.speculation import Speculator
+from modules.translate import translation_stats
 
 
 # Setup up demo region
@@ -16,6 +24,34 @@ DEMO_REGION = 'ap-southeast-1'
 # es-ES, th-TH, de-DE, it-IT, fr-FR, ko-KR, hi-IN, en-AU, sv-SE, pt-BR, ja-JP, ca-ES, es-US, fr-CA, 
 SOURCE_LANGCODE = 'zh-CN'
 TARGET_LANGCODE = 'en-US'
+# Interpret into several languages at once, from one microphone and one transcription.
+# Each target has its own Polly voice and output device (a sounddevice name or index,
+# None for the default), e.g. with modules.pipeline.Target:
+# TARGETS = [Target('en-US', 'Joanna'), Target('ja-JP', 'Kazuha', device='USB Audio'),
+#            Target('fr-FR', 'Lea', device=3)]
+TARGETS = None      # None speaks TARGET_LANGCODE with the first voice for it in the catalog
+
+# Start translating and synthesizing each sentence as soon as it has stabilized in the
+# partial transcripts, instead of waiting for the final result
+SPECULATIVE = True
+
+# What to do when translations queue up faster than they can be spoken:
+# 'merge' (speak queued sentences together), 'drop_oldest', 'drop_newest' or 'block'
+PLAYBACK_POLICY = 'merge'
+# Short final segments that follow each other within this many seconds are translated
+# in one request, saving round trips and Translate TPS under bursty speech. 0 turns it off.
+TRANSLATE_BATCH_WINDOW = 0.0
+# Cut off the translation being spoken (and skip queued ones) when the speaker starts a new sentence
+BARGE_IN = False
+
+# Per-utterance stage timings, one JSON line per utterance plus p50/p95/p99 histograms
+# in Prometheus text format. Set either to None to turn it off.
+LATENCY_JSONL = 'output-metrics/latency.jsonl'
+LATENCY_PROM = 'output-metrics/latency.prom'
+
+# Besides the terminal, source transcripts can go to a JSON-lines log and an .srt/.vtt caption file
+TRANSCRIPT_JSONL = None     # e.g. 'output-transcripts/session.jsonl'
+CAPTION_FILE = None         # e.g. 'output-transcripts/session.srt'
 
 # Be sure to use the correct parameters for the audio stream that matches
 # the audio formats described for the source language you'll be using:
@@ -25,6 +61,13 @@ READ_CHUNK = 1024
 CHUNK_SIZE = 1024 * 4
 BYTES_PER_SAMPLE = 2
 CHANNEL_NUMS = 1
+# Captured audio waits in a fixed ring of this many seconds when sending falls behind;
+# once it is full the oldest ('drop_oldest') or the newest ('drop_newest') audio is dropped
+CAPTURE_SECONDS = 5.0
+CAPTURE_OVERFLOW = 'drop_oldest'
+# Hold back silence instead of streaming it to Transcribe (needs numpy): None sends
+# everything, 'compress' sends pauses shortened, 'suppress' sends only speech
+VOICE_GATE = None
 # AUDIO_PATH = 'output-audio/test.mp3'
 
 
@@ -34,59 +77,69 @@ the returned transcription results as needed.
 This handler will simply print the text out to your interpreter.
 """
 class MyEventHandler(TranscriptResultStreamHandler):
+    def __init__(self, transcript_result_stream, pipeline, speculator=None, recorder=None, clock=None,
+                 renderer=None):
+        super().__init__(transcript_result_stream)
+        self.pipeline = pipeline
+        self.renderer = renderer or build_renderer(final_suffix=' 🔚')
+        self.speculator = speculator
+        self.recorder = recorder
+        self.clock = clock
+        self.last_result_id = None
+
+    def _mark_audio(self, result_id, stage, offset):
+        # stages tied to a point in the audio are timed by when that audio was captured
+        captured_at = self.clock.time_at(offset)
+        if captured_at is not None:
+            self.recorder.mark(result_id, stage, captured_at)
+
     async def handle_transcript_event(self, transcript_event: TranscriptEvent):
         # This handler can be implemented to handle transcriptions as needed.        
         results = transcript_event.transcript.results
         for result in results:
+            new_result = result.result_id != self.last_result_id
+            if new_result and self.recorder is not None:
+                self._mark_audio(result.result_id, 'captured', result.start_time)
+                if result.is_partial:
+                    self.recorder.mark(result.result_id, 'first_partial')
+            self.last_result_id = result.result_id
             if result.is_partial:
-                for alt in result.alternatives:
-                    #'​clear​' for Linux&Mac
-                    os.system('cls')
-                    print(f'{alt.transcript} 🔚')
+                if BARGE_IN and new_result:
+                    # the speaker started a new sentence, stop reading out older ones
+                    self.pipeline.barge_in()
+                if result.alternatives:
+                    self.renderer.partial(result.alternatives[0].transcript, result_id=result.result_id)
+                if self.speculator is not None:
+                    self.speculator.on_partial(result)
             else:
-                # actions to perform when get a partial result 
-                print(f'translate from {SOURCE_LANGCODE} to {TARGET_LANGCODE}')
+                # hand the final segment to the translate/speak stage and return
+                # right away, so transcription keeps up while it is being spoken
+                if self.recorder is not None:
+                    self._mark_audio(result.result_id, 'speech_end', result.end_time)
+                    self.recorder.mark(result.result_id, 'final')
                 source_text = result.alternatives[0].transcript
-                # translate text content
-                target_text = translate_txt(DEMO_REGION, source_text, SOURCE_LANGCODE, TARGET_LANGCODE)
-                # read out the returned content
-                polly_play(DEMO_REGION, target_text)
-
-
-async def mic_stream():
-    # This function wraps the raw input stream from the microphone forwarding
-    # the blocks to an asyncio.Queue.
-    loop = asyncio.get_event_loop()
-    input_queue = asyncio.Queue()
-
-    def callback(indata, frame_count, time_info, status):
-        loop.call_soon_threadsafe(input_queue.put_nowait, (bytes(indata), status))
-
-    stream = sounddevice.RawInputStream(
-        channels=CHANNEL_NUMS,
-        samplerate=SAMPLE_RATE,
-        blocksize=CHUNK_SIZE,
-        callback=callback,
-        dtype="int16",
-    )
-    # Initiate the audio stream and asynchronously yield the audio chunks
-    # as they become available.
-    with stream:
-        print('🎙 Listening ...')
-        while True:
-            indata, status = await input_queue.get()
-            yield indata, status
-
-
-async def write_chunks(stream):
-    # This connects the raw audio chunks generator coming from the microphone
+                self.renderer.final(source_text, result_id=result.result_id,
+                                    start=result.start_time, end=result.end_time)
+                segments = self.speculator.take(source_text) if self.speculator else None
+                if segments is None:
+                    self.pipeline.submit(source_text, key=result.result_id)
+                else:
+                    # speculated sentences reuse their translations, only the rest is translated now
+                    for i, (text, speculation) in enumerate(segments):
+                        self.pipeline.submit(text, speculation, key=result.result_id if i == 0 else None)
+
+
+async def write_chunks(stream, source, clock=None):
+    # This connects the raw audio chunks coming from the microphone
     # and passes them along to the transcription stream.
-    async for chunk, status in mic_stream():
+    async for chunk, captured_at in source:
+        if clock is not None:
+            clock.chunk(len(chunk), captured_at)
         await stream.input_stream.send_audio_event(audio_chunk=chunk)
     await stream.input_stream.end_stream()
 
 
-async def transcribe_n_translate():
+async def transcribe_n_translate(pipeline, source, recorder=None, renderer=None):
     client = TranscribeStreamingClient(region=DEMO_REGION)
 
     # Start transcription to generate async stream   
@@ -113,21 +166,65 @@ async def transcribe_n_translate():
     '''
 
     # Instantiate our handler and start processing events
-    handler = MyEventHandler(stream.output_stream)
-    await asyncio.gather(write_chunks(stream), handler.handle_events())
+    renderer = renderer or build_renderer(TRANSCRIPT_JSONL, CAPTION_FILE, final_suffix=' 🔚')
+    speculator = (Speculator(DEMO_REGION, SOURCE_LANGCODE, pipeline.targets, recorder, renderer.message)
+                  if SPECULATIVE else None)
+    # maps Transcribe's audio offsets back to when that audio was captured
+    clock = CaptureClock(SAMPLE_RATE, BYTES_PER_SAMPLE, CHANNEL_NUMS)
+    handler = MyEventHandler(stream.output_stream, pipeline, speculator, recorder, clock, renderer)
+    try:
+        await asyncio.gather(write_chunks(stream, source, clock), handler.handle_events(), pipeline.run())
+    finally:
+        renderer.close()
 
 def main():
+    # build the Translate and Polly clients before the first sentence needs them
+    warm_up(DEMO_REGION, ['translate', 'polly'])
     print('🔛 Say something ...')
     loop = asyncio.new_event_loop()
     # loop.run_until_complete(transcribe_n_translate())
-    tasks = loop.create_task(transcribe_n_translate())
+    recorder = LatencyRecorder(LATENCY_JSONL, LATENCY_PROM)
+    # the lanes print through the renderer, so their messages don't garble the live partial
+    renderer = build_renderer(TRANSCRIPT_JSONL, CAPTION_FILE, final_suffix=' 🔚')
+    pipeline = InterpretationPipeline(DEMO_REGION, SOURCE_LANGCODE, TARGET_LANGCODE,
+                                      playback_policy=PLAYBACK_POLICY, recorder=recorder, targets=TARGETS,
+                                      batch_window=TRANSLATE_BATCH_WINDOW, log=renderer.message)
+    source = MicSource(SAMPLE_RATE, CHANNEL_NUMS, CHUNK_SIZE, CAPTURE_SECONDS, CAPTURE_OVERFLOW)
+    audio, gate = source, None
+    if VOICE_GATE:
+        from common.vad import VoiceGate, gate_audio
+        gate = VoiceGate(SAMPLE_RATE, CHANNEL_NUMS, VOICE_GATE)
+        audio = gate_audio(source, gate)
+    tasks = loop.create_task(transcribe_n_translate(pipeline, audio, recorder, renderer))
     try:
         loop.run_until_complete(tasks)
         loop.close()
     except KeyboardInterrupt:
         print('🛑 Stop listening.')
+        stats = translation_stats()
+        print(f"💾 translation cache: {stats['hits'] + stats['disk_hits']} hits, "
+              f"{stats['misses']} misses ({stats['hit_rate']:.0%})")
+        if stats['batches']:
+            print(f"📦 translate batches: {stats['batches']} requests for {stats['batched_segments']} segments, "
+                  f"{stats['batch_fallbacks']} split back one by one")
+        for language, metrics in pipeline.metrics()['targets'].items():
+            print(f"🔈 {language} playback: {metrics['playback_played']} played, {metrics['playback_merged']} merged, "
+                  f"{metrics['playback_dropped'] + metrics['dropped']} dropped, {metrics['playback_stale']} stale, "
+                  f"max queue depth {metrics['playback_max_depth_seen']}")
+        capture = source.stats()
+        print(f"🎙 capture: {capture['captured']} chunks, {capture['dropped']} dropped, {capture['late']} late, "
+              f"{capture['device_overflows']} device overflows, max {capture['max_depth_seen']}/{capture['slots']} buffered")
+        if gate is not None:
+            gated = gate.stats()
+            print(f"🤫 voice gate: {gated['onsets']} speech onsets, {gated['saved']:.0%} of the audio not sent")
+        for stage, summary in recorder.summary().items():
+            print(f"⏱  {stage:<22} p50 {summary['p50'] * 1000:6.0f}ms  p95 {summary['p95'] * 1000:6.0f}ms  "
+                  f"p99 {summary['p99'] * 1000:6.0f}ms  ({summary['count']})")
     except Exception as ex:
         print(str(ex))
+    finally:
+        pipeline.close()
+        recorder.close()
     
 if __name__ == '__main__':
     main()
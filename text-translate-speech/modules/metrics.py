@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Per-utterance stage timing for the interpreter.
+
+Every utterance (one Transcribe result id) collects ``time.perf_counter()``
+marks as it moves through the pipeline:
+
+    captured -> first_partial -> speech_end -> final -> translate_request ->
+    translate_response -> synthesis_request -> synthesis_first_byte ->
+    playback_start -> playback_end
+
+When its playback ends, the spans between marks go into per-stage histograms
+and the utterance is appended to a JSONL log. The histograms are also written as
+a Prometheus text file. Spans with a missing or earlier end mark are left out,
+e.g. translation finishes before the final transcript when it was speculated.
+"""
+import bisect
+import json
+import threading
+import time
+from collections import OrderedDict, deque
+from pathlib import Path
+
+from common.latency import Histogram, write_prometheus
+
+
+# (span name, start mark, end mark)
+SPANS = (
+    ('transcribe_partial', 'captured', 'first_partial'),
+    ('transcribe_final', 'speech_end', 'final'),
+    ('translate_wait', 'final', 'translate_request'),
+    ('translate', 'translate_request', 'translate_response'),
+    ('playback_wait', 'translate_response', 'synthesis_request'),
+    ('synthesis_first_byte', 'synthesis_request', 'synthesis_first_byte'),
+    ('playback_start', 'synthesis_first_byte', 'playback_start'),
+    ('playback', 'playback_start', 'playback_end'),
+    # what the listener notices: from the end of speech to hearing the translation
+    ('end_to_end', 'speech_end', 'playback_start'),
+)
+
+MAX_OPEN = 256          # utterances still in flight, older ones are forgotten
+PROM_EVERY = 5          # rewrite the Prometheus file every N finished utterances
+PROM_NAME = 'interpreter_stage_latency_seconds'
+
+
+class CaptureClock:
+    """Maps a position in the audio stream back to the moment it was captured
+
+    Transcribe reports result start and end times as offsets into the audio
+    sent so far, the clock remembers when each chunk was captured.
+    """
+
+    def __init__(self, sample_rate, bytes_per_sample=2, channels=1, window=4096):
+        self.bytes_per_second = sample_rate * bytes_per_sample * channels
+        self.sent = 0
+        self._ends = deque(maxlen=window)    # stream offset (s) at the end of each chunk
+        self._times = deque(maxlen=window)   # perf_counter when that chunk was captured
+        self._lock = threading.Lock()
+
+    def chunk(self, nbytes, captured_at=None):
+        with self._lock:
+            self.sent += nbytes
+            self._ends.append(self.sent / self.bytes_per_second)
+            self._times.append(time.perf_counter() if captured_at is None else captured_at)
+
+    def time_at(self, offset):
+        """perf_counter when the audio at offset seconds was captured, None if unknown"""
+        with self._lock:
+            if not self._ends or offset < self._ends[0] - 1.0:
+                return None
+            i = min(bisect.bisect_left(self._ends, offset), len(self._ends) - 1)
+            # a chunk arrives once it is full, earlier samples in it were captured before that
+            return self._times[i] - max(0.0, self._ends[i] - offset)
+
+
+class LatencyRecorder:
+    def __init__(self, jsonl_path=None, prom_path=None):
+        self.jsonl_path = Path(jsonl_path) if jsonl_path else None
+        self.prom_path = Path(prom_path) if prom_path else None
+        self.histograms = {name: Histogram() for name, _, _ in SPANS}
+        self.finished = 0
+        self.discarded = 0
+        self._open = OrderedDict()
+        self._lock = threading.Lock()
+        self._log = None
+        if self.jsonl_path is not None:
+            self.jsonl_path.parent.mkdir(parents=True, exist_ok=True)
+            self._log = open(self.jsonl_path, 'a', encoding='utf-8', buffering=1)
+
+    def mark(self, key, stage, at=None):
+        """Record that utterance key reached stage (now, or at the given perf_counter time)"""
+        if key is None:
+            return
+        at = time.perf_counter() if at is None else at
+        with self._lock:
+            marks = self._open.get(key)
+            if marks is None:
+                marks = self._open[key] = {}
+                if len(self._open) > MAX_OPEN:
+                    self._open.popitem(last=False)
+                    self.discarded += 1
+            marks[stage] = at
+
+    def discard(self, key):
+        """Forget an utterance that will never be played"""
+        with self._lock:
+            if self._open.pop(key, None) is not None:
+                self.discarded += 1
+
+    def finish(self, key, **fields):
+        """Close utterance key: fold its spans into the histograms and log it"""
+        with self._lock:
+            marks = self._open.pop(key, None)
+        if marks is None:
+            return
+        spans = {}
+        for name, start, end in SPANS:
+            if start in marks and end in marks and marks[end] >= marks[start]:
+                spans[name] = marks[end] - marks[start]
+                self.histograms[name].observe(spans[name])
+        with self._lock:
+            self.finished += 1
+            write_prom = self.prom_path is not None and self.finished % PROM_EVERY == 0
+            if self._log is not None:
+                origin = min(marks.values())
+                self._log.write(json.dumps({
+                    'utterance': key,
+                    'time': time.time(),
+                    'marks_ms': {k: round((v - origin) * 1000, 1) for k, v in sorted(marks.items(), key=lambda kv: kv[1])},
+                    'spans_ms': {k: round(v * 1000, 1) for k, v in spans.items()},
+                    **fields,
+                }, ensure_ascii=False) + '\n')
+        if write_prom:
+            self.write_prometheus()
+
+    def write_prometheus(self):
+        if self.prom_path is not None:
+            write_prometheus(self.prom_path, PROM_NAME, self.histograms,
+                             help_text='Interpreter latency per pipeline stage in seconds')
+
+    def summary(self):
+        return {name: hist.summary() for name, hist in self.histograms.items() if hist.count}
+
+    def close(self):
+        self.write_prometheus()
+        if self._log is not None:
+            self._log.close()
+            self._log = None
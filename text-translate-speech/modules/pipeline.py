@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+"""
+Translate-and-speak stage of the interpreter.
+
+translate_txt and polly_play are blocking calls. Running them inside the
+transcript handler stalls the event loop, and with it the microphone and
+transcription coroutines. Here final segments go through a bounded queue to a
+worker that translates on a thread pool, then on to an ordered playback queue
+with its own thread. The next sentence is translated while the previous one is
+still being spoken, and the loop stays free for capture.
+
+Every target language gets its own lane: translate queue, worker and playback
+queue, with its own voice and output device. A final segment is fanned out to
+all lanes at once and each lane speaks as soon as its translation is ready,
+so a slow language never holds up the others.
+
+With a ``batch_window``, short segments arriving within that many seconds of
+each other are translated in one request (modules.translate.translate_batch),
+which saves round trips and Translate TPS when someone speaks in short bursts.
+
+With a LatencyRecorder (modules.metrics), each segment's translate, synthesis
+and playback times are marked under the key it was submitted with. Only the
+first target is recorded, as the utterance marks are per key.
+
+Lanes and playback threads print status lines through ``log``, pass the
+transcript renderer's ``message`` so they don't break its in-place redraw.
+"""
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, replace
+from typing import Optional, Union
+
+from modules.playback import MERGE, PlaybackQueue
+from modules.polly import DEFAULT_ENGINE, default_voice, polly_play
+from modules.translate import translate_batch, translate_txt
+
+
+MAX_PENDING = 8
+# micro-batching: segments up to BATCH_SEGMENT_CHARS long that follow each other within
+# the batch window go to Translate as one request, up to these limits
+BATCH_SEGMENT_CHARS = 60
+BATCH_MAX_CHARS = 1000
+BATCH_MAX_SEGMENTS = 8
+
+
+@dataclass
+class Target:
+    """An output language, the Polly voice that speaks it and the sound device it plays on
+
+    Without a voice, the pipeline picks the catalog's first voice for the language and engine.
+    """
+    language: str
+    voice: Optional[str] = None
+    engine: str = DEFAULT_ENGINE
+    device: Optional[Union[int, str]] = None    # sounddevice name or index, None for the default
+
+
+class TargetLane:
+    """Translation and ordered playback of every segment for one target"""
+
+    def __init__(self, region, source_langcode, target, executor, max_pending=MAX_PENDING,
+                 playback_policy=MERGE, recorder=None, batch_window=0.0, log=print):
+        self.region = region
+        self.log = log
+        self.batch_window = batch_window
+        self.source_langcode = source_langcode
+        self.target = target
+        self.executor = executor
+        self.translate_queue = asyncio.Queue(maxsize=max_pending)
+        self.playback = PlaybackQueue(self._play, policy=playback_policy, on_played=self._on_played, log=log)
+        self.recorder = recorder
+        self.dropped = 0
+        self._keys = {}     # seq -> recorder key, in submission order
+
+    def submit(self, source_text, speculation=None, key=None):
+        if self.translate_queue.full():
+            # the speaker is far ahead of the output, the oldest sentence is the least useful
+            seq, _, _, _ = self.translate_queue.get_nowait()
+            self.translate_queue.task_done()
+            self.playback.skip(seq)
+            self.dropped += 1
+            self.log(f'⚠️  {self.target.language} interpreter is behind, dropped a sentence ({self.dropped} so far)')
+        # the sequence number fixes the playback order now, in the order segments were spoken
+        seq = self.playback.reserve()
+        if self.recorder is not None:
+            self._keys[seq] = key
+        self.translate_queue.put_nowait((seq, source_text, speculation, time.monotonic()))
+
+    def _mark(self, seq, stage):
+        if self.recorder is not None:
+            self.recorder.mark(self._keys.get(seq), stage)
+
+    def _play(self, text, stop):
+        started = time.perf_counter()
+        target = self.target
+        return started, polly_play(self.region, text, stop, started=started, voice=target.voice,
+                                   engine=target.engine, device=target.device, log=self.log)
+
+    def _on_played(self, first_seq, last_seq, result):
+        if self.recorder is None:
+            return
+        # None: the sentence went stale or failed to play, its keys are discarded
+        started, stats = result if result is not None else (None, None)
+        # playback is strictly ordered, nothing before last_seq is still to come
+        for seq in sorted(s for s in self._keys if s <= last_seq):
+            key = self._keys.pop(seq)
+            if seq < first_seq or stats is None:
+                self.recorder.discard(key)
+                continue
+            self.recorder.mark(key, 'synthesis_request', started)
+            if stats.first_byte is not None:
+                self.recorder.mark(key, 'synthesis_first_byte', started + stats.first_byte)
+            if stats.first_audio is not None:
+                self.recorder.mark(key, 'playback_start', started + stats.first_audio)
+            self.recorder.mark(key, 'playback_end', started + stats.elapsed)
+            self.recorder.finish(key, bytes=stats.bytes, merged=last_seq - first_seq, stopped=stats.stopped)
+
+    async def run(self):
+        while True:
+            item = await self.translate_queue.get()
+            batch, leftover = [item], None
+            try:
+                if self.batch_window and self._batchable(item):
+                    leftover = await self._collect(batch)
+                if len(batch) > 1:
+                    await self._translate_batch(batch)
+                else:
+                    await self._translate(*item)
+                if leftover is not None:
+                    await self._translate(*leftover)
+            finally:
+                for _ in range(len(batch) + (leftover is not None)):
+                    self.translate_queue.task_done()
+
+    def _batchable(self, item):
+        _, source_text, speculation, _ = item
+        return speculation is None and len(source_text) <= BATCH_SEGMENT_CHARS
+
+    async def _collect(self, batch):
+        """Add the short segments that arrive within the batch window to batch
+
+        Returns a segment that arrived in the window but can't be batched, if any.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.batch_window
+        chars = len(batch[0][1])
+        while len(batch) < BATCH_MAX_SEGMENTS and chars < BATCH_MAX_CHARS:
+            getter = asyncio.ensure_future(self.translate_queue.get())
+            done, _ = await asyncio.wait({getter}, timeout=max(deadline - loop.time(), 0))
+            if not done:
+                getter.cancel()
+                await asyncio.wait({getter})
+                if getter.cancelled():
+                    return None
+            # it may have taken a segment just before the cancel, that one must not be lost
+            item = getter.result()
+            if not self._batchable(item) or chars + len(item[1]) > BATCH_MAX_CHARS:
+                return item
+            batch.append(item)
+            chars += len(item[1])
+        return None
+
+    async def drain(self):
+        await self.translate_queue.join()
+        await asyncio.get_running_loop().run_in_executor(None, self.playback.wait_idle)
+
+    async def _translate(self, seq, source_text, speculation, created_at):
+        loop = asyncio.get_running_loop()
+        self.log(f'translate from {self.source_langcode} to {self.target.language}')
+        target_text = None
+        # a taken speculation is never cancelled later, so a CancelledError here is this
+        # lane being cancelled and must propagate
+        if speculation is not None and not speculation.cancelled():
+            try:
+                target_text = await asyncio.wrap_future(speculation)
+            except Exception:
+                target_text = None
+        try:
+            if target_text is None:
+                self._mark(seq, 'translate_request')
+                target_text = await loop.run_in_executor(
+                    self.executor, translate_txt,
+                    self.region, source_text, self.source_langcode, self.target.language)
+                self._mark(seq, 'translate_response')
+        except Exception as ex:
+            self.log(f'❌ translate to {self.target.language} failed: {ex}')
+            self.playback.skip(seq)
+            return
+        # put() may wait for room under the 'block' policy, keep that off the loop
+        await loop.run_in_executor(self.executor, self.playback.put, seq, target_text, created_at)
+
+    async def _translate_batch(self, batch):
+        loop = asyncio.get_running_loop()
+        self.log(f'translate {len(batch)} segments from {self.source_langcode} to {self.target.language} in one request')
+        for seq, _, _, _ in batch:
+            self._mark(seq, 'translate_request')
+        try:
+            translations = await loop.run_in_executor(
+                self.executor, translate_batch,
+                self.region, [text for _, text, _, _ in batch], self.source_langcode, self.target.language)
+        except Exception as ex:
+            self.log(f'❌ translate to {self.target.language} failed: {ex}')
+            for seq, _, _, _ in batch:
+                self.playback.skip(seq)
+            return
+        for (seq, _, _, created_at), target_text in zip(batch, translations):
+            self._mark(seq, 'translate_response')
+            await loop.run_in_executor(self.executor, self.playback.put, seq, target_text, created_at)
+
+    def metrics(self):
+        return {'translate_depth': self.translate_queue.qsize(), 'dropped': self.dropped,
+                **{f'playback_{k}': v for k, v in self.playback.metrics().items()}}
+
+
+class InterpretationPipeline:
+    def __init__(self, region, source_langcode, target_langcode=None, max_pending=MAX_PENDING,
+                 playback_policy=MERGE, recorder=None, targets=None, batch_window=0.0, log=print):
+        """Speak each segment in ``targets`` (Target instances), or just target_langcode
+
+        ``batch_window`` is how long (in seconds) a short segment waits for more
+        to translate together, 0 translates each segment on its own. Status
+        lines from the lanes go to ``log``.
+        """
+        self.region = region
+        self.source_langcode = source_langcode
+        self.targets = []
+        for target in targets or [Target(target_langcode)]:
+            if target.voice is None:
+                target = replace(target, voice=default_voice(region, target.language, target.engine))
+            self.targets.append(target)
+        self.target_langcode = self.targets[0].language
+        # two threads per lane: one translating, one handing over to its playback queue
+        self.executor = ThreadPoolExecutor(max_workers=2 * len(self.targets), thread_name_prefix='interpreter')
+        self.lanes = [TargetLane(region, source_langcode, target, self.executor, max_pending, playback_policy,
+                                 recorder if i == 0 else None, batch_window, log)
+                      for i, target in enumerate(self.targets)]
+        self.recorder = recorder
+
+    def submit(self, source_text, speculation=None, key=None):
+        """Queue a final transcript segment for every target without blocking the caller
+
+        ``speculation`` holds a future per target (in ``targets`` order) already
+        translating this text (see modules.speculation), their results are used
+        instead of new requests. ``key`` identifies the utterance to the latency recorder.
+        """
+        for i, lane in enumerate(self.lanes):
+            lane.submit(source_text, speculation[i] if speculation else None, key)
+
+    def barge_in(self):
+        for lane in self.lanes:
+            lane.playback.barge_in()
+
+    async def run(self):
+        await asyncio.gather(*(lane.run() for lane in self.lanes))
+
+    async def drain(self):
+        """Wait until every submitted segment has been spoken, skipped or dropped in every language"""
+        await asyncio.gather(*(lane.drain() for lane in self.lanes))
+
+    def metrics(self):
+        """Counters summed over the targets (maximums for depths), per target under 'targets'"""
+        per_target = {lane.target.language: lane.metrics() for lane in self.lanes}
+        total = {}
+        for metrics in per_target.values():
+            for name, value in metrics.items():
+                combine = max if 'depth' in name or name == 'playback_waiting_for' else sum
+                total[name] = combine((total.get(name, 0), value))
+        total['targets'] = per_target
+        return total
+
+    def close(self):
+        for lane in self.lanes:
+            lane.playback.close()
+        self.executor.shutdown(wait=False)
@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+"""
+Ordered, bounded audio output for the interpreter.
+
+Every final segment reserves a sequence number when it is submitted, and a
+dedicated playback thread speaks translations strictly in that order, whatever
+order they finish in. The queue holds at most ``max_depth`` translations. When
+it is full, the policy decides what happens:
+
+- ``block``: the producer waits for room
+- ``drop_oldest``: the oldest queued sentence is skipped
+- ``drop_newest``: the incoming sentence is skipped
+- ``merge``: the queued sentences and the new one are spoken as one utterance
+
+Sentences older than ``max_lag`` seconds when their turn comes are skipped too,
+and ``barge_in()`` discards everything pending and cuts off the current
+sentence, which bounds the lag behind the speaker.
+"""
+import heapq
+import threading
+import time
+
+
+BLOCK = 'block'
+DROP_OLDEST = 'drop_oldest'
+DROP_NEWEST = 'drop_newest'
+MERGE = 'merge'
+
+MAX_DEPTH = 4
+MAX_LAG = 15.0          # seconds from final transcript to playback start
+MERGE_MAX_CHARS = 600
+
+
+class PlaybackQueue:
+    def __init__(self, play, max_depth=MAX_DEPTH, policy=MERGE, max_lag=MAX_LAG,
+                 merge_max_chars=MERGE_MAX_CHARS, on_played=None, log=print):
+        """``play(text, stop_event)`` speaks one sentence and returns when done
+
+        ``on_played(first_seq, last_seq, result)`` is called with what play
+        returned, covering every sequence number merged into the sentence.
+        result is None when the sentence went stale or play raised.
+        Errors are reported through ``log``.
+        """
+        self.play = play
+        self.on_played = on_played
+        self.log = log
+        self.max_depth = max_depth
+        self.policy = policy
+        self.max_lag = max_lag
+        self.merge_max_chars = merge_max_chars
+
+        self._heap = []          # (seq, created_at, text)
+        self._skipped = set()    # reserved sequence numbers that will never be played
+        self._merged_upto = {}   # seq of a merged entry -> last seq folded into it
+        self._next_seq = 0
+        self._play_seq = 0
+        self._cond = threading.Condition()
+        self._stop_current = threading.Event()
+        self._playing = False
+        self._closed = False
+
+        self.played = 0
+        self.dropped = 0
+        self.merged = 0
+        self.stale = 0
+        self.barged = 0
+        self.max_depth_seen = 0
+
+        self._thread = threading.Thread(target=self._run, name='playback', daemon=True)
+        self._thread.start()
+
+    def reserve(self):
+        """Next sequence number, taken in the order segments are finalized"""
+        with self._cond:
+            seq = self._next_seq
+            self._next_seq += 1
+            return seq
+
+    def put(self, seq, text, created_at=None):
+        """Queue the translation for seq, applying the overflow policy when full"""
+        created_at = time.monotonic() if created_at is None else created_at
+        with self._cond:
+            if seq < self._play_seq:
+                # overtaken by a barge-in while it was being translated
+                self.dropped += 1
+                return
+            if len(self._heap) >= self.max_depth:
+                if self.policy == BLOCK:
+                    # a sentence due before everything queued is admitted, the queue may be waiting for it
+                    while (len(self._heap) >= self.max_depth and seq > self._heap[0][0]
+                           and not self._closed):
+                        self._cond.wait()
+                elif self.policy == DROP_NEWEST:
+                    self._skip(seq)
+                    self.dropped += 1
+                    return
+                elif self.policy == MERGE and self._merge(seq, text, created_at):
+                    return
+                else:
+                    oldest, _, _ = heapq.heappop(self._heap)
+                    # a merged entry takes the sentences folded into it along
+                    for dropped in range(oldest, self._merged_upto.pop(oldest, oldest) + 1):
+                        self._skip(dropped)
+                    self.dropped += 1
+            heapq.heappush(self._heap, (seq, created_at, text))
+            self.max_depth_seen = max(self.max_depth_seen, len(self._heap))
+            self._cond.notify_all()
+
+    def _merge(self, seq, text, created_at):
+        # merged entries keep their last sequence number in ``_merged_upto``, a
+        # merge is only possible if the queued sentences form one gapless run
+        pending = sorted(self._heap + [(seq, created_at, text)])
+        expected = pending[0][0]
+        for entry_seq, _, _ in pending:
+            if entry_seq != expected:
+                return False
+            expected = self._merged_upto.get(entry_seq, entry_seq) + 1
+        merged_text = ' '.join(t for _, _, t in pending)
+        if len(merged_text) > self.merge_max_chars:
+            return False
+        first_seq, first_created, _ = pending[0]
+        # the folded sequence numbers are covered by _merged_upto, playback jumps past them
+        for later_seq, _, _ in pending[1:]:
+            self._merged_upto.pop(later_seq, None)
+        self._merged_upto[first_seq] = expected - 1
+        self._heap = [(first_seq, first_created, merged_text)]
+        self.merged += len(pending) - 1
+        self._cond.notify_all()
+        return True
+
+    def skip(self, seq):
+        """Mark seq as never coming (translation failed or was dropped upstream)"""
+        with self._cond:
+            self._skip(seq)
+
+    def _skip(self, seq):
+        self._skipped.add(seq)
+        self._cond.notify_all()
+
+    def barge_in(self):
+        """Discard every pending sentence and stop the one being spoken"""
+        with self._cond:
+            self.barged += len(self._heap)
+            self._heap.clear()
+            self._skipped.clear()
+            self._merged_upto.clear()
+            self._play_seq = self._next_seq
+            self._stop_current.set()
+            self._cond.notify_all()
+
+    def _next_item(self):
+        with self._cond:
+            while not self._closed:
+                while self._play_seq in self._skipped:
+                    self._skipped.discard(self._play_seq)
+                    self._play_seq += 1
+                while self._heap and self._heap[0][0] < self._play_seq:
+                    heapq.heappop(self._heap)
+                    self.dropped += 1
+                if self._heap and self._heap[0][0] == self._play_seq:
+                    seq, created_at, text = heapq.heappop(self._heap)
+                    last_seq = self._merged_upto.pop(seq, seq)
+                    self._play_seq = last_seq + 1
+                    if self._skipped:
+                        # skips behind the play position can never be reached any more
+                        self._skipped = {s for s in self._skipped if s > last_seq}
+                    self._playing = True
+                    self._stop_current.clear()
+                    self._cond.notify_all()
+                    return seq, last_seq, created_at, text
+                self._cond.wait()
+            return None
+
+    def _run(self):
+        while True:
+            item = self._next_item()
+            if item is None:
+                return
+            seq, last_seq, created_at, text = item
+            try:
+                result = None
+                if time.monotonic() - created_at > self.max_lag:
+                    with self._cond:
+                        self.stale += 1
+                else:
+                    try:
+                        result = self.play(text, self._stop_current)
+                        self.played += 1
+                    except Exception as ex:
+                        self.log(f'❌ playback failed: {ex}')
+                # before going idle, so wait_idle() also covers the callback
+                if self.on_played is not None:
+                    self.on_played(seq, last_seq, result)
+            finally:
+                with self._cond:
+                    self._playing = False
+                    self._cond.notify_all()
+
+    def wait_idle(self, timeout=None):
+        """Block until every reserved sentence has been played or skipped"""
+        with self._cond:
+            return self._cond.wait_for(
+                lambda: self._closed or (not self._heap and not self._playing
+                                         and self._play_seq >= self._next_seq),
+                timeout)
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._stop_current.set()
+            self._cond.notify_all()
+
+    def metrics(self):
+        with self._cond:
+            return {
+                'depth': len(self._heap),
+                'max_depth_seen': self.max_depth_seen,
+                'waiting_for': self._play_seq,
+                'played': self.played,
+                'dropped': self.dropped,
+                'merged': self.merged,
+                'stale': self.stale,
+                'barged': self.barged,
+            }
@@ -1,54 +1,114 @@
 #!/usr/bin/env python3
-import boto3
 from botocore.exceptions import BotoCoreError, ClientError
-from contextlib import closing
-import os
-import sys
-from tempfile import gettempdir
-from pydub import AudioSegment
-from pydub.playback import play
+import threading
+import time
+from common.audio_stream import copy_stream
+from common.clients import get_client
+from common.pcm_playback import SAMPLE_RATE, play_pcm_stream
+from common.synth_cache import SynthesisCache
+from common.voice_catalog import VoiceCatalog
+from common.voice_index import VoiceIndex
 
 
 
 TEST_TXT="Amazon Polly 使用深度学习技术来合成听起来自然的人类语音，让您可以将文章转换为语音。"
 
-def polly_play(region, input_text): 
 
-    client = boto3.client('polly', region_name=region)
+# VoiceId = 'Zhiyu', Engine = 'standard'
+DEFAULT_VOICE = 'Joanna'
+DEFAULT_ENGINE = 'neural'
 
-    try:
-        response = client.synthesize_speech(
-            Text=input_text, 
-            # Support format: mp3, pcm, ogg_vorbis, json
-            OutputFormat='mp3',
-            # VoiceId='Zhiyu',
-            VoiceId='Joanna',
-            # Engine='standard'
-            Engine='neural'
-        )
-    except (BotoCoreError, ClientError) as error:
-        print(error)
-        sys.exit(-1)
+_indexes = {}   # region -> VoiceIndex
+_indexes_lock = threading.Lock()
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def _get_cache():
+    """The synthesis cache, opened on first use so importing this module touches no files"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                # repeated sentences are replayed from disk instead of being synthesized again
+                _cache = SynthesisCache()
+    return _cache
+
+
+def default_voice(region, language_code, engine=DEFAULT_ENGINE):
+    """First voice in the region's catalog that speaks language_code with engine"""
+    with _indexes_lock:
+        index = _indexes.get(region)
+        if index is None:
+            # the catalog is cached on disk, usually no describe_voices call at all
+            client = get_client('polly', region)
+            index = _indexes[region] = VoiceIndex(VoiceCatalog(client, region).voices())
+    voices = index.find(engine, language_code=language_code)
+    if not voices:
+        raise ValueError(f'no {engine} Polly voice speaks {language_code} in {region}, pick a voice for it')
+    return voices[0].id
+
+
+def _speech_params(input_text, voice=DEFAULT_VOICE, engine=DEFAULT_ENGINE):
+    return {
+        'Text': input_text,
+        # Support format: mp3, pcm, ogg_vorbis, json
+        # pcm goes straight to the sound card, no decoding (or ffmpeg) needed
+        'OutputFormat': 'pcm',
+        'SampleRate': str(SAMPLE_RATE),
+        'VoiceId': voice,
+        'Engine': engine
+    }
 
-    # Access the audio stream from the response
-    if "AudioStream" in response:
-        with closing(response["AudioStream"]) as stream:
-            output = os.path.join(gettempdir(), "polly-speech.mp3")
+
+def polly_prefetch(region, input_text, voice=DEFAULT_VOICE, engine=DEFAULT_ENGINE):
+    """Synthesize into the local cache without playing, so a later polly_play starts instantly"""
+    params = _speech_params(input_text, voice, engine)
+    cache = _get_cache()
+    if cache.lookup(params) is not None:
+        return
+    response = get_client('polly', region).synthesize_speech(**params)
+    with cache.writer(params) as blob:
+        copy_stream(response['AudioStream'], blob)
+
+
+def polly_play(region, input_text, stop=None, started=None, voice=DEFAULT_VOICE, engine=DEFAULT_ENGINE,
+               device=None, log=print):
+    """Speak input_text on device, returning the PlaybackStats (times relative to ``started``), None on failure"""
+
+    client = get_client('polly', region)
+
+    params = _speech_params(input_text, voice, engine)
+    started = time.perf_counter() if started is None else started
+
+    try:
+        cache = _get_cache()
+        cached = cache.lookup(params)
+        if cached is not None:
             try:
-            # Open a file for writing the output as a binary stream
-                with open(output, "wb") as file:
-                    file.write(stream.read())
-            except IOError as error:
-            # Could not write to file, exit gracefully
-                print(error)
-                sys.exit(-1)
-        sound = AudioSegment.from_file(output, 'mp3')
-        # return sound
-        # Need ffmpeg to support mp3 format
-        print('📢')
-        play(sound)
-
-    else:
-        # The response didn't contain audio data, exit gracefully
-        print("Could not stream audio")
-        sys.exit(-1)
+                blob = open(cached, 'rb')
+            except FileNotFoundError:
+                # evicted by a prefetch or speculation since the lookup, synthesize it again
+                cache.lost()
+            else:
+                with blob:
+                    return play_pcm_stream(blob, started=started, stop=stop, device=device, log=log)
+
+        response = client.synthesize_speech(**params)
+        # Play the audio stream while it downloads, keeping a copy for the next time
+        with cache.writer(params) as blob:
+            stats = play_pcm_stream(response['AudioStream'], started=started, tee=blob, stop=stop, device=device,
+                                    log=log)
+            if stats.stopped:
+                # interrupted, the copy is incomplete
+                blob.discard()
+        return stats
+    except (BotoCoreError, ClientError) as error:
+        # throttling was already retried (common.throttle), skip this sentence and keep interpreting
+        log(f'❌ speech synthesis failed: {error}')
+        return None
+    except KeyError:
+        # The response didn't contain audio data
+        log("Could not stream audio")
+        return None
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Speculative translation of stabilized partial transcripts.
+
+With partial results stabilization, Transcribe marks items that will not change
+any more as ``stable``. Stable items come at the start of a partial, and once
+they reach the end of a sentence that sentence will almost always appear
+unchanged in the final result. Translation and speech synthesis of each such
+sentence start right away, before the final arrives. If the final starts with
+the speculated sentences, the pipeline reuses that work and only translates
+the rest; otherwise it is cancelled or thrown away. Every target language is
+speculated at once.
+"""
+from concurrent.futures import ThreadPoolExecutor
+
+from modules.polly import polly_prefetch
+from modules.translate import translate_txt
+from modules.translate_cache import normalize
+
+
+SENTENCE_ENDS = ('.', '!', '?', '。', '！', '？')
+
+
+def stable_prefix(result):
+    """Longest stable start of a partial result that ends a sentence, None if there is none
+
+    A partial whose items are all stable is returned whole.
+    """
+    if not result.alternatives:
+        return None
+    alt = result.alternatives[0]
+    items = alt.items or []
+    if not items:
+        return None
+    transcript = alt.transcript
+    position, cut = 0, None
+    for item in items:
+        if not getattr(item, 'stable', False):
+            break
+        # items carry no offsets, find each one in the transcript in turn
+        found = transcript.find(item.content, position)
+        if found < 0:
+            return None
+        position = found + len(item.content)
+        if item.content.endswith(SENTENCE_ENDS):
+            cut = position
+    else:
+        return transcript
+    return transcript[:cut] if cut is not None else None
+
+
+class Speculator:
+    def __init__(self, region, source_langcode, targets, recorder=None, log=print):
+        """``targets`` are the pipeline's Target instances, only the first one is timed by recorder"""
+        self.region = region
+        self.log = log
+        self.recorder = recorder
+        self.source_langcode = source_langcode
+        self.targets = list(targets)
+        # one thread per target, the sentences of an utterance are prepared in order
+        self.executor = ThreadPoolExecutor(max_workers=len(self.targets), thread_name_prefix='speculate')
+        self.result_id = None
+        self.text = ''          # the speculated start of the current result
+        self.segments = []      # (sentence, futures per target) making up text
+        self.reused = 0
+        self.discarded = 0
+
+    def on_partial(self, result):
+        """Start translating and synthesizing each sentence of a partial result once it has stabilized"""
+        prefix = stable_prefix(result)
+        if not prefix:
+            return
+        if result.result_id != self.result_id or not prefix.startswith(self.text):
+            # a new utterance, or the stable text was revised after all
+            self._discard()
+            self.result_id = result.result_id
+        sentence = prefix[len(self.text):].strip()
+        if not sentence:
+            return
+        # only the utterance's first sentence is timed, that is when the listener first hears it
+        key = result.result_id if not self.segments else None
+        futures = [self.executor.submit(self._prepare, sentence, target, key if i == 0 else None)
+                   for i, target in enumerate(self.targets)]
+        self.segments.append((sentence, futures))
+        self.text = prefix
+
+    def _prepare(self, text, target, key=None):
+        if self.recorder is not None and key is not None:
+            self.recorder.mark(key, 'translate_request')
+        target_text = translate_txt(self.region, text, self.source_langcode, target.language)
+        if self.recorder is not None and key is not None:
+            self.recorder.mark(key, 'translate_response')
+        try:
+            # the audio lands in the synthesis cache, polly_play then starts without a round trip
+            polly_prefetch(self.region, target_text, target.voice, target.engine)
+        except Exception as ex:
+            self.log(f'⚠️  speculative synthesis failed: {ex}')
+        return target_text
+
+    def take(self, final_text):
+        """The segments of final_text as ``(text, futures)`` pairs if its start was speculated, else None
+
+        The speculated sentences come with their futures (one per target), the
+        rest of final_text, if any, comes last with None. A target whose
+        speculation hasn't started yet gets None instead of its future: it would
+        be queued behind a stale speculation that is still running, translating
+        inline is faster.
+        """
+        speculated, final = normalize(self.text), normalize(final_text)
+        if not self.segments or not final.startswith(speculated):
+            self._discard()
+            return None
+        segments = [(sentence, [None if future.cancel() else future for future in futures])
+                    for sentence, futures in self.segments]
+        rest = final[len(speculated):].strip()
+        if rest:
+            segments.append((rest, None))
+        self.result_id, self.text, self.segments = None, '', []
+        self.reused += 1
+        return segments
+
+    def _discard(self):
+        if self.segments:
+            # a speculation that already started just finishes into the caches unused
+            for _, futures in self.segments:
+                for future in futures:
+                    future.cancel()
+            self.discarded += 1
+        self.result_id, self.text, self.segments = None, '', []
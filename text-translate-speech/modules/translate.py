@@ -1,18 +1,93 @@
 #!/usr/bin/env python3
-import boto3
+import threading
 
+from common import CACHE_ROOT
+from common.clients import get_client
+from modules.translate_cache import TranslationCache
 
 
+_cache = None
+_cache_lock = threading.Lock()
+
+# Segments of a batch are joined by line breaks, which Translate keeps in place
+BATCH_DELIMITER = '\n'
+_batches = {'batches': 0, 'batched_segments': 0, 'batch_fallbacks': 0}
+# lanes translate batches on several threads at once
+_batches_lock = threading.Lock()
+
+
+def _get_cache():
+    """The translation cache, opened on first use so importing this module touches no files"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                # repeated phrases are answered locally, set path=None to keep the cache in memory only
+                _cache = TranslationCache(path=CACHE_ROOT / 'translations.sqlite3')
+    return _cache
 
 
 def translate_txt(region_name, first_lang_text, sourch_langcode, target_langcode):
-    client = boto3.client(service_name='translate', region_name=region_name, use_ssl=True)
+    cached = _get_cache().get(first_lang_text, sourch_langcode, target_langcode)
+    if cached is not None:
+        return cached
+
+    return _translate_uncached(region_name, first_lang_text, sourch_langcode, target_langcode)
+
+
+def _translate_uncached(region_name, text, sourch_langcode, target_langcode):
+    translated = _request(region_name, text, sourch_langcode, target_langcode)
+    _get_cache().put(text, sourch_langcode, target_langcode, translated)
+    return translated
+
+
+def _request(region_name, text, sourch_langcode, target_langcode):
+    client = get_client('translate', region_name)
 
     result = client.translate_text(
-        Text=first_lang_text, 
+        Text=text, 
         SourceLanguageCode=sourch_langcode, 
         TargetLanguageCode=target_langcode)
     # print('SourceLanguageCode: ' + result.get('SourceLanguageCode'))
     # print('TargetLanguageCode: ' + result.get('TargetLanguageCode'))
-
     return result.get('TranslatedText')
+
+
+def translate_batch(region_name, texts, sourch_langcode, target_langcode, delimiter=BATCH_DELIMITER):
+    """Translations of texts, in order, from a single request where possible
+
+    Cached segments are answered locally and the rest are joined with
+    delimiter into one request. If the translation doesn't split back into as
+    many segments, they are translated one by one instead.
+    """
+    cache = _get_cache()
+    results = [cache.get(text, sourch_langcode, target_langcode) for text in texts]
+    missing = [i for i, result in enumerate(results) if result is None]
+    # whitespace is collapsed before sending, only a delimiter left after that breaks the alignment
+    sent = {i: ' '.join(texts[i].split()) for i in missing}
+    joinable = [i for i in missing if sent[i] and delimiter not in sent[i]]
+    if len(joinable) > 1:
+        joined = delimiter.join(sent[i] for i in joinable)
+        parts = [part.strip() for part in _request(region_name, joined, sourch_langcode, target_langcode)
+                 .strip().split(delimiter)]
+        aligned = len(parts) == len(joinable) and all(parts)
+        with _batches_lock:
+            _batches['batches'] += 1
+            if aligned:
+                _batches['batched_segments'] += len(joinable)
+            else:
+                _batches['batch_fallbacks'] += 1
+        if aligned:
+            for i, translated in zip(joinable, parts):
+                cache.put(texts[i], sourch_langcode, target_langcode, translated)
+                results[i] = translated
+    for i, result in enumerate(results):
+        if result is None:
+            # the lookup above already counted this miss, don't go through the cache again
+            results[i] = _translate_uncached(region_name, texts[i], sourch_langcode, target_langcode)
+    return results
+
+
+def translation_stats():
+    with _batches_lock:
+        return {**_get_cache().stats(), **_batches}
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Memoization for translate_txt.
+
+Entries are keyed on (normalized text, source, target). An in-memory LRU
+answers repeated phrases without a network round trip. Behind it, an optional
+SQLite file keeps translations across restarts.
+"""
+import atexit
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from pathlib import Path
+
+
+MEMORY_ENTRIES = 2048
+DISK_ENTRIES = 100000
+# the table may grow this far past disk_capacity before the oldest rows are trimmed
+TRIM_SLACK = 0.05
+# disk hits refresh used_at in batches of this many
+TOUCH_BATCH = 32
+
+
+def normalize(text):
+    """Collapse whitespace and unify Unicode forms so trivial variants share an entry"""
+    return unicodedata.normalize('NFKC', ' '.join(text.split()))
+
+
+class TranslationCache:
+    def __init__(self, capacity=MEMORY_ENTRIES, path=None, disk_capacity=DISK_ENTRIES):
+        self.capacity = capacity
+        self.disk_capacity = disk_capacity
+        self._memory = OrderedDict()
+        # the memory lock is never held during SQLite I/O, memory hits don't wait for the disk
+        self._lock = threading.Lock()
+        self._db_lock = threading.Lock()
+        self._db = None
+        self._rows = 0
+        self._touched = {}      # (text, source, target) -> used_at not yet written
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        if path is not None:
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(str(path), check_same_thread=False)
+            self._db.execute(
+                'CREATE TABLE IF NOT EXISTS translations ('
+                ' source TEXT, target TEXT, text TEXT, translated TEXT, used_at REAL,'
+                ' PRIMARY KEY (source, target, text))')
+            self._db.execute('CREATE INDEX IF NOT EXISTS translations_used_at ON translations (used_at)')
+            self._db.commit()
+            self._rows = self._db.execute('SELECT COUNT(*) FROM translations').fetchone()[0]
+            atexit.register(self.flush)
+
+    def get(self, text, source, target):
+        key = (normalize(text), source, target)
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return self._memory[key]
+        row = None
+        if self._db is not None:
+            with self._db_lock:
+                row = self._db.execute(
+                    'SELECT translated FROM translations WHERE source=? AND target=? AND text=?',
+                    (source, target, key[0])).fetchone()
+                if row is not None:
+                    self._touched[key] = time.time()
+                    if len(self._touched) >= TOUCH_BATCH:
+                        self._write_touches()
+                        self._db.commit()
+        with self._lock:
+            if row is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+            self._remember(key, row[0])
+            return row[0]
+
+    def put(self, text, source, target, translated):
+        key = (normalize(text), source, target)
+        with self._lock:
+            self._remember(key, translated)
+        if self._db is None:
+            return
+        with self._db_lock:
+            self._touched.pop(key, None)
+            self._write_touches()
+            self._db.execute(
+                'INSERT OR REPLACE INTO translations VALUES (?, ?, ?, ?, ?)',
+                (source, target, key[0], translated, time.time()))
+            # counts replaced rows too, so a trim may come a little early, never late
+            self._rows += 1
+            if self._rows > self.disk_capacity * (1 + TRIM_SLACK):
+                self._db.execute(
+                    'DELETE FROM translations WHERE rowid IN (SELECT rowid FROM translations'
+                    ' ORDER BY used_at DESC LIMIT -1 OFFSET ?)', (self.disk_capacity,))
+                self._rows = self._db.execute('SELECT COUNT(*) FROM translations').fetchone()[0]
+            self._db.commit()
+
+    def flush(self):
+        """Write the pending used_at updates of disk hits"""
+        if self._db is None:
+            return
+        with self._db_lock:
+            if self._touched:
+                self._write_touches()
+                self._db.commit()
+
+    def _write_touches(self):
+        if self._touched:
+            self._db.executemany(
+                'UPDATE translations SET used_at=? WHERE text=? AND source=? AND target=?',
+                [(used_at, *key) for key, used_at in self._touched.items()])
+            self._touched.clear()
+
+    def _remember(self, key, translated):
+        self._memory[key] = translated
+        self._memory.move_to_end(key)
+        if len(self._memory) > self.capacity:
+            self._memory.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self):
+        lookups = self.hits + self.disk_hits + self.misses
+        return {
+            'hits': self.hits,
+            'disk_hits': self.disk_hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': round((self.hits + self.disk_hits) / lookups, 3) if lookups else 0.0,
+            'entries': len(self._memory),
+        }